@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Multi-Worker Statistics Backfill
+
+This script spreads a large statistics backfill over any number of worker
+processes through a shared SQLite work queue. A coordinator enqueues match
+IDs from the schedule; workers claim batches under a time-limited lease,
+fetch each match's statistics, write the batch to its own output file and
+mark the batch done. Workers renew their leases with a heartbeat while they
+work; leases that expire (a worker crashed or was stopped) are put back in
+the queue for the next claim, and a worker that lost its lease neither
+writes nor commits the match, so each match is committed exactly once.
+'collect' only reads a match from the result file it was committed in.
+A failed fetch is retried after an exponential backoff, as in refetch.py.
+
+Workers on several hosts can share one queue if the queue file and output
+directory live on shared storage with working file locks.
+
+Usage:
+    python backfill.py enqueue --from "2025-06-01 00:00" --to "2025-06-30 23:59" --tournament-id all
+    python backfill.py enqueue --matches-file h2hggl_data/completed_matches.json
+    python backfill.py work --batch-size 25          # start as many as you like
+    python backfill.py status
+    python backfill.py collect                       # update the ID and matchup indexes
+
+Requires:
+    - requests library for HTTP requests
+    - Valid API authentication (automatically refreshed)
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from data_io import add_compression_arguments, iter_match_statistics, iter_matches, with_compression_extension
+from fetch_completed_matches import KNOWN_TOURNAMENT_IDS, H2HMatchFetcher
+from fetch_match_stats import H2HMatchStatsFetcher, match_info_from_schedule
+from http_transport import add_transport_arguments
+from logging_utils import ProgressReporter, add_logging_arguments, setup_logging_from_args
+from match_ids import DEFAULT_ID_INDEX_FILE, MatchIdIndex
+from match_metrics import enrich_batch
+from matchup_index import DEFAULT_INDEX_FILE, update_matchup_index
+from refetch import DEFAULT_BASE_DELAY, DEFAULT_MAX_DELAY, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_FILE = 'h2hggl_data/backfill/queue.db'
+DEFAULT_RESULTS_DIR = 'h2hggl_data/backfill'
+
+# Task states
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    match_id      TEXT PRIMARY KEY,
+    payload       TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    worker        TEXT,
+    lease_expires REAL,
+    not_before    REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    last_error    TEXT,
+    result_file   TEXT,
+    enqueued_at   REAL NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+"""
+
+
+class WorkQueue:
+    """SQLite-backed queue of match IDs with leases.
+
+    Every operation opens its own short connection, so one instance can be
+    used from the worker thread and its heartbeat thread alike.
+    """
+
+    def __init__(self, queue_file: str = DEFAULT_QUEUE_FILE, busy_timeout: float = 60):
+        self.queue_file = queue_file
+        self.busy_timeout = busy_timeout
+
+        queue_dir = os.path.dirname(queue_file)
+        if queue_dir:
+            os.makedirs(queue_dir, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.executescript(_SCHEMA)
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(tasks)')}
+            if 'not_before' not in columns:
+                # Queues from before failed fetches were retried with a backoff
+                connection.execute('ALTER TABLE tasks ADD COLUMN not_before REAL')
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+        return sqlite3.connect(self.queue_file, timeout=self.busy_timeout, isolation_level=None)
+
+    def enqueue(self, matches: Iterable[Dict]) -> int:
+        """Add schedule rows to the queue; already queued match IDs are left alone."""
+        now = time.time()
+        rows = [
+            (str(match['matchId']), json.dumps(match, ensure_ascii=False), now, now)
+            for match in matches if match.get('matchId') is not None
+        ]
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            before = connection.total_changes
+            connection.executemany(
+                'INSERT OR IGNORE INTO tasks (match_id, payload, enqueued_at, updated_at) VALUES (?, ?, ?, ?)',
+                rows
+            )
+            added = connection.total_changes - before
+            connection.execute('COMMIT')
+        return added
+
+    def claim(self, worker: str, batch_size: int, lease_seconds: float) -> List[Dict]:
+        """Lease up to batch_size due pending matches to a worker, re-queueing expired leases first."""
+        now = time.time()
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            expired = connection.execute(
+                'UPDATE tasks SET status = ?, worker = NULL, lease_expires = NULL, updated_at = ? '
+                'WHERE status = ? AND lease_expires < ?',
+                (PENDING, now, LEASED, now)
+            ).rowcount
+            if expired:
+                logger.info("Re-queued %d matches with expired leases", expired)
+
+            rows = connection.execute(
+                'SELECT match_id, payload, attempts FROM tasks WHERE status = ? AND (not_before IS NULL OR not_before <= ?) '
+                'ORDER BY enqueued_at, match_id LIMIT ?',
+                (PENDING, now, batch_size)
+            ).fetchall()
+            connection.executemany(
+                'UPDATE tasks SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? '
+                'WHERE match_id = ?',
+                [(LEASED, worker, now + lease_seconds, now, match_id) for match_id, _, _ in rows]
+            )
+            connection.execute('COMMIT')
+
+        return [
+            {'match_id': match_id, 'match': json.loads(payload), 'attempts': attempts + 1}
+            for match_id, payload, attempts in rows
+        ]
+
+    def heartbeat(self, worker: str, match_ids: List[str], lease_seconds: float) -> int:
+        """Extend a worker's leases. Returns how many are still held."""
+        now = time.time()
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            held = sum(
+                connection.execute(
+                    'UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE match_id = ? AND status = ? AND worker = ?',
+                    (now + lease_seconds, now, match_id, LEASED, worker)
+                ).rowcount
+                for match_id in match_ids
+            )
+            connection.execute('COMMIT')
+        return held
+
+    def held(self, worker: str, match_ids: List[str]) -> List[str]:
+        """The subset of match_ids whose leases the worker still holds."""
+        now = time.time()
+        with closing(self._connect()) as connection:
+            return [
+                match_id for match_id in match_ids
+                if connection.execute(
+                    'SELECT 1 FROM tasks WHERE match_id = ? AND status = ? AND worker = ? AND lease_expires >= ?',
+                    (match_id, LEASED, worker, now)
+                ).fetchone()
+            ]
+
+    def complete(self, worker: str, match_ids: List[str], result_file: str) -> List[str]:
+        """Mark matches done if the worker still holds their leases. Returns the ones committed."""
+        now = time.time()
+        committed = []
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            for match_id in match_ids:
+                updated = connection.execute(
+                    'UPDATE tasks SET status = ?, result_file = ?, lease_expires = NULL, last_error = NULL, updated_at = ? '
+                    'WHERE match_id = ? AND status = ? AND worker = ?',
+                    (DONE, result_file, now, match_id, LEASED, worker)
+                ).rowcount
+                if updated:
+                    committed.append(match_id)
+            connection.execute('COMMIT')
+        return committed
+
+    def fail(self, worker: str, match_id: str, error: str, max_attempts: int,
+             base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY) -> None:
+        """Release a match after a failed fetch; it is retried after a backoff until max_attempts is reached."""
+        now = time.time()
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT attempts FROM tasks WHERE match_id = ? AND status = ? AND worker = ?',
+                (match_id, LEASED, worker)
+            ).fetchone()
+            if row is not None:
+                attempts = row[0]
+                connection.execute(
+                    'UPDATE tasks SET status = ?, worker = NULL, lease_expires = NULL, not_before = ?, '
+                    'last_error = ?, updated_at = ? WHERE match_id = ?',
+                    (FAILED if attempts >= max_attempts else PENDING,
+                     now + backoff_delay(attempts, base_delay, max_delay), error, now, match_id)
+                )
+            connection.execute('COMMIT')
+
+    def retry_failed(self) -> int:
+        """Put every failed match back in the queue with a fresh attempt count."""
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            count = connection.execute(
+                'UPDATE tasks SET status = ?, attempts = 0, not_before = NULL, updated_at = ? WHERE status = ?',
+                (PENDING, time.time(), FAILED)
+            ).rowcount
+            connection.execute('COMMIT')
+        return count
+
+    def counts(self) -> Dict[str, int]:
+        """Number of matches in each state."""
+        with closing(self._connect()) as connection:
+            rows = connection.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def workers(self) -> Dict[str, int]:
+        """Active leases per worker."""
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                'SELECT worker, COUNT(*) FROM tasks WHERE status = ? AND lease_expires >= ? GROUP BY worker',
+                (LEASED, time.time())
+            ).fetchall()
+        return dict(rows)
+
+    def result_files(self) -> Dict[str, Set[str]]:
+        """Output files holding committed results, with the match IDs committed from each."""
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                'SELECT result_file, match_id FROM tasks WHERE status = ? ORDER BY result_file', (DONE,)
+            ).fetchall()
+        committed: Dict[str, Set[str]] = {}
+        for result_file, match_id in rows:
+            committed.setdefault(result_file, set()).add(match_id)
+        return committed
+
+
+class _Heartbeat(threading.Thread):
+    """Renews a batch's leases in the background until stopped."""
+
+    def __init__(self, queue: WorkQueue, worker: str, match_ids: List[str], lease_seconds: float):
+        super().__init__(name='heartbeat', daemon=True)
+        self.queue = queue
+        self.worker = worker
+        self.match_ids = match_ids
+        self.lease_seconds = lease_seconds
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                held = self.queue.heartbeat(self.worker, self.match_ids, self.lease_seconds)
+            except sqlite3.Error as e:
+                logger.warning("Heartbeat failed: %s", e)
+                continue
+            if held < len(self.match_ids):
+                logger.warning("Lost %d of %d leases in the current batch", len(self.match_ids) - held, len(self.match_ids))
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+def default_worker_id() -> str:
+    """A worker name unique across hosts sharing the queue."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_worker(queue: WorkQueue, fetcher: H2HMatchStatsFetcher, worker: str,
+               results_dir: str = DEFAULT_RESULTS_DIR,
+               batch_size: int = 25, lease_seconds: float = 300, max_attempts: int = 3,
+               base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+               poll_interval: float = 10, compress: Optional[str] = None,
+               compress_level: Optional[int] = None, verbose: bool = False) -> Dict[str, int]:
+    """Claim and process batches until the queue has no pending or leased matches left."""
+    totals = {'batches': 0, 'committed': 0, 'failed': 0, 'lost': 0}
+    counts = queue.counts()
+    progress = ProgressReporter(total=counts[PENDING] + counts[LEASED], label=f"Backfill ({worker})", unit="matches")
+
+    while True:
+        tasks = queue.claim(worker, batch_size, lease_seconds)
+        if not tasks:
+            counts = queue.counts()
+            if not counts[PENDING] and not counts[LEASED]:
+                break
+            # Other workers hold the remaining leases, or failed matches are backing off
+            logger.debug("No due matches; %d pending, %d leased by other workers",
+                         counts[PENDING], counts[LEASED])
+            time.sleep(poll_interval)
+            continue
+
+        match_ids = [task['match_id'] for task in tasks]
+        heartbeat = _Heartbeat(queue, worker, match_ids, lease_seconds)
+        heartbeat.start()
+        try:
+            batch_stats = {}
+            for task in tasks:
+                stats = fetcher.fetch_match_stats(task['match_id'], verbose=verbose)
+                if stats:
+                    batch_stats[task['match_id']] = {
+                        'match_info': match_info_from_schedule(task['match']),
+                        'statistics': stats
+                    }
+                else:
+                    queue.fail(worker, task['match_id'], 'no statistics returned', max_attempts,
+                               base_delay, max_delay)
+                    totals['failed'] += 1
+                progress.update()
+
+            # Matches re-leased to another worker are that worker's to write
+            held = set(queue.held(worker, list(batch_stats))) if batch_stats else set()
+            if len(held) < len(batch_stats):
+                logger.warning("%d matches were re-leased to another worker and are not written here",
+                               len(batch_stats) - len(held))
+                totals['lost'] += len(batch_stats) - len(held)
+                batch_stats = {match_id: record for match_id, record in batch_stats.items() if match_id in held}
+
+            if batch_stats:
+                with fetcher.profiler.phase('enrich'):
+                    enrich_batch(batch_stats)
+
+                stamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+                result_file = with_compression_extension(
+                    os.path.join(results_dir, f"stats_{worker}_{stamp}.json"), compress
+                )
+                # Write under a temporary name so a crash never leaves a partial result file behind
+                temp_file = os.path.join(results_dir, f".tmp-{os.path.basename(result_file)}")
+                fetcher.save_stats_to_file(batch_stats, temp_file, compress=compress, compress_level=compress_level)
+                os.replace(temp_file, result_file)
+
+                committed = queue.complete(worker, list(batch_stats), result_file)
+                totals['committed'] += len(committed)
+                totals['lost'] += len(batch_stats) - len(committed)
+                if len(committed) < len(batch_stats):
+                    # collect skips them: only the file a match was committed in is read for it
+                    logger.warning(
+                        "%d matches in %s were re-leased to another worker and not committed here",
+                        len(batch_stats) - len(committed), result_file
+                    )
+            totals['batches'] += 1
+        finally:
+            heartbeat.stop()
+
+    progress.close()
+    return totals
+
+
+def _load_schedule(args) -> List[Dict]:
+    """Schedule rows for 'enqueue', from a matches file or the /schedule endpoint."""
+    if args.matches_file:
+        return list(iter_matches(args.matches_file))
+
+    if any(value.lower() == 'all' for value in args.tournament_id):
+        tournament_ids = list(KNOWN_TOURNAMENT_IDS)
+    else:
+        tournament_ids = list(dict.fromkeys(int(value) for value in args.tournament_id))
+
+    fetcher = H2HMatchFetcher(transport=args.transport)
+    if args.auth_token:
+        fetcher.set_auth_token(args.auth_token)
+    matches_by_tournament = fetcher.fetch_tournaments(
+        from_date=args.from_date, to_date=args.to_date, tournament_ids=tournament_ids,
+        max_workers=args.max_workers, verbose=args.verbose
+    )
+    return [match for matches in matches_by_tournament.values() for match in matches]
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(
+        description='Backfill match statistics with several workers sharing a work queue',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python backfill.py enqueue --from "2025-06-01 00:00" --to "2025-06-30 23:59" --tournament-id all
+  python backfill.py enqueue --matches-file h2hggl_data/completed_matches.json
+  python backfill.py work --batch-size 25 --lease 300
+  python backfill.py status
+  python backfill.py collect
+        """
+    )
+
+    parser.add_argument(
+        'command',
+        choices=['enqueue', 'work', 'status', 'collect', 'retry-failed'],
+        help='enqueue: add matches; work: run a worker; status: show progress; '
+             'collect: update the ID and matchup indexes from results; retry-failed: re-queue failed matches'
+    )
+
+    parser.add_argument(
+        '--queue',
+        default=DEFAULT_QUEUE_FILE,
+        help=f'Shared queue database (default: {DEFAULT_QUEUE_FILE})'
+    )
+
+    # enqueue
+    parser.add_argument('--matches-file', help='enqueue: schedule file from fetch_completed_matches.py')
+    parser.add_argument(
+        '--from',
+        dest='from_date',
+        default=(datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d %H:%M"),
+        help='enqueue: start date and time (format: "YYYY-MM-DD HH:MM", default: 30 days ago)'
+    )
+    parser.add_argument(
+        '--to',
+        dest='to_date',
+        default=datetime.now().strftime("%Y-%m-%d %H:%M"),
+        help='enqueue: end date and time (format: "YYYY-MM-DD HH:MM", default: current date/time)'
+    )
+    parser.add_argument('--tournament-id', nargs='+', default=['1'],
+                        help='enqueue: one or more tournament IDs, or "all" (default: 1)')
+    parser.add_argument('--max-workers', type=int, default=4,
+                        help='enqueue: tournaments fetched concurrently (default: 4)')
+    parser.add_argument('--refetch', action='store_true',
+                        help='enqueue: include matches whose statistics are already stored')
+    parser.add_argument('--id-index', default=DEFAULT_ID_INDEX_FILE,
+                        help=f'Match ID index (default: {DEFAULT_ID_INDEX_FILE})')
+    parser.add_argument('--matchup-index', default=DEFAULT_INDEX_FILE,
+                        help=f'collect: head-to-head index (default: {DEFAULT_INDEX_FILE})')
+
+    # work
+    parser.add_argument('--worker-id', default=default_worker_id(),
+                        help='work: worker name (default: <hostname>-<pid>)')
+    parser.add_argument('--batch-size', type=int, default=25, help='work: matches claimed per batch (default: 25)')
+    parser.add_argument('--lease', type=float, default=300,
+                        help='work: lease length in seconds, renewed by a heartbeat (default: 300)')
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help='work: attempts before a match is marked failed (default: 3)')
+    parser.add_argument('--base-delay', type=float, default=DEFAULT_BASE_DELAY,
+                        help=f'work: seconds before retrying a failed match, doubled each time (default: {DEFAULT_BASE_DELAY})')
+    parser.add_argument('--max-delay', type=float, default=DEFAULT_MAX_DELAY,
+                        help=f'work: longest wait between attempts in seconds (default: {DEFAULT_MAX_DELAY})')
+    parser.add_argument('--poll-interval', type=float, default=10,
+                        help='work: seconds to wait while other workers hold the remaining leases (default: 10)')
+    parser.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR,
+                        help=f'work: directory for per-batch result files (default: {DEFAULT_RESULTS_DIR})')
+
+    parser.add_argument(
+        '--auth-token',
+        help='API authentication token (default: cached token from auth_token.json, refreshed if missing or expired)'
+    )
+
+    add_transport_arguments(parser)
+
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        help='Enable verbose output'
+    )
+
+    add_logging_arguments(parser)
+    add_compression_arguments(parser)
+
+    return parser.parse_args()
+
+
+def main():
+    """Main function to execute a backfill command."""
+
+    args = parse_arguments()
+    setup_logging_from_args(args)
+
+    queue = WorkQueue(args.queue)
+
+    try:
+        if args.command == 'enqueue':
+            matches = _load_schedule(args)
+            if not args.refetch:
+                id_index = MatchIdIndex.load(args.id_index)
+                unstored = [match for match in matches
+                            if not (id_index.resolve(match.get('matchId')) or {}).get('stats_file')]
+                if len(unstored) < len(matches):
+                    logger.info("Skipping %d matches whose statistics are already stored", len(matches) - len(unstored))
+                matches = unstored
+            added = queue.enqueue(matches)
+            logger.info("Enqueued %d new matches (%d already queued)", added, len(matches) - added)
+
+        elif args.command == 'work':
+            fetcher = H2HMatchStatsFetcher(transport=args.transport)
+            if args.auth_token:
+                fetcher.set_auth_token(args.auth_token)
+            totals = run_worker(
+                queue, fetcher, args.worker_id, results_dir=args.results_dir,
+                batch_size=args.batch_size, lease_seconds=args.lease, max_attempts=args.max_attempts,
+                base_delay=args.base_delay, max_delay=args.max_delay, poll_interval=args.poll_interval, compress=args.compress,
+                compress_level=args.compress_level, verbose=args.verbose
+            )
+            logger.info(
+                "\nWorker %s finished:\n"
+                "  Batches: %d\n"
+                "  Committed: %d\n"
+                "  Failed fetches: %d\n"
+                "  Lost leases: %d",
+                args.worker_id, totals['batches'], totals['committed'], totals['failed'], totals['lost'],
+                extra={'fields': {'event': 'worker_finished', 'worker': args.worker_id, **totals}}
+            )
+
+        elif args.command == 'status':
+            counts = queue.counts()
+            workers = queue.workers()
+            logger.info(
+                "Queue %s:\n"
+                "  Pending: %d\n"
+                "  Leased: %d\n"
+                "  Done: %d\n"
+                "  Failed: %d",
+                args.queue, counts[PENDING], counts[LEASED], counts[DONE], counts[FAILED],
+                extra={'fields': {'event': 'queue_status', **counts, 'workers': workers}}
+            )
+            for worker, leased in sorted(workers.items()):
+                logger.info("  %s: %d leased", worker, leased)
+
+        elif args.command == 'retry-failed':
+            logger.info("Re-queued %d failed matches", queue.retry_failed())
+
+        else:
+            committed = {path: match_ids for path, match_ids in queue.result_files().items()
+                         if os.path.exists(path)}
+            id_index = MatchIdIndex.load(args.id_index)
+            records = []
+            for path, match_ids in committed.items():
+                # A file can also hold matches whose lease was lost before commit; skip those
+                for match_id, record in iter_match_statistics(path):
+                    if match_id not in match_ids:
+                        continue
+                    id_index.add_statistics(record.get('statistics') or {}, stats_file=path,
+                                            stats_key=match_id, requested_id=match_id)
+                    records.append(record.get('match_info', {}))
+            id_index.save(args.id_index)
+
+            added = update_matchup_index(records, args.matchup_index)
+            logger.info("Collected %d result files (%d new head-to-head matches)", len(committed), added)
+
+    except KeyboardInterrupt:
+        logger.warning("\nOperation cancelled by user.")
+    except (sqlite3.Error, ValueError, OSError) as e:
+        logger.error("Error: %s", e, exc_info=args.verbose)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Hot Path Micro-Benchmarks
+
+This script measures the CPU-bound steps of a fetch run in isolation, on
+synthetic datasets of 1k, 10k and 100k matches built from the fixtures in
+h2hggl_data/:
+
+    response_json     response.json() on statistics bodies, per transport
+    match_info_loop   the match_info/statistics records built by
+                      fetch_stats_from_matches_file
+    stat_categories   the startswith scan in demo_match_stats.py
+    save_matches      save_matches_to_file (write_json, indent=2)
+    save_stats        save_stats_to_file (write_json, indent=2)
+
+Each case is timed over several runs (median and min), then run once more
+under tracemalloc to record its peak allocation and the memory and blocks
+still held by its result. The save benchmarks write to os.devnull, so
+they measure encoding and write calls rather than the disk.
+
+Results can be saved as a baseline and later runs compared against it;
+a case whose best time or peak allocation grew by more than --threshold
+(default 25%) is reported as a regression and the exit status is 1.
+Best times are compared rather than medians because they are far less
+sensitive to other load on the machine. Even so, single cases on a busy
+machine vary by tens of percent between identical runs, so a slowdown
+only counts when it is also outside the baseline's spread (the best time
+is slower than the baseline's slowest run), a case that looks slower is
+timed a second time before it is reported, and saving or comparing always
+times each case at least 5 times.
+
+Usage:
+    python benchmark_hotpaths.py
+    python benchmark_hotpaths.py --sizes 1000 10000 --save-baseline benchmark_baseline.json
+    python benchmark_hotpaths.py --sizes 1000 10000 --compare benchmark_baseline.json
+    python benchmark_hotpaths.py --benchmark save_stats response_json --repeat 10
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+from demo_match_stats import available_stat_categories
+from fetch_completed_matches import H2HMatchFetcher
+from fetch_match_stats import H2HMatchStatsFetcher, match_info_from_schedule
+from http_transport import Headers, Response
+
+FIXTURES = (
+    os.path.join(REPO_DIR, 'h2hggl_data', 'demo_match_statistics.json'),
+    os.path.join(REPO_DIR, 'h2hggl_data', 'match_stats_NB052120625.json'),
+)
+DEFAULT_SIZES = [1000, 10000, 100000]
+BASELINE_VERSION = 1
+
+# Peaks below this are allocator noise and are not compared
+_MIN_COMPARED_PEAK = 64 * 1024
+# Timed runs per case when saving or comparing a baseline, whatever --repeat and --max-time say
+MIN_COMPARED_RUNS = 5
+DEFAULT_THRESHOLD = 0.25
+
+
+class Dataset:
+    """Synthetic schedule rows and statistics payloads for a number of matches.
+
+    Statistics reuse the fixture period dicts, so 100k matches fit in
+    memory while still encoding to full-size output.
+    """
+
+    def __init__(self, size: int):
+        templates, team_names = load_fixtures()
+        start = datetime(2025, 6, 1, 4, 0)
+
+        self.size = size
+        self.bodies = [json.dumps(template).encode('utf-8') for template in templates]
+        self.matches: List[Dict] = []
+        self.statistics: List[Dict] = []
+        for i in range(size):
+            home, away = team_names[i % len(team_names)], team_names[(i * 7 + 3) % len(team_names)]
+            self.matches.append({
+                'matchId': str(300000 + i),
+                'homeTeamName': home,
+                'awayTeamName': away,
+                'homeParticipantName': f'P{i % 40}',
+                'awayParticipantName': f'Q{i % 37}',
+                'homeScore': 40 + i % 37,
+                'awayScore': 40 + (i * 13) % 41,
+                'startDate': (start + timedelta(minutes=8 * i)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'tournamentId': 1 + i % 3,
+                'tournamentName': 'Ebasketball H2H GG League',
+            })
+            self.statistics.append(dict(templates[i % len(templates)]))
+
+    def stats_records(self) -> Dict[str, Dict]:
+        return {match['matchId']: {'match_info': match_info_from_schedule(match), 'statistics': stats}
+                for match, stats in zip(self.matches, self.statistics)}
+
+
+def load_fixtures():
+    """Statistics payloads and team names from the bundled fixture files."""
+    templates, team_names = [], set()
+    for path in FIXTURES:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if 'matches_statistics' in data:
+            for record in data['matches_statistics'].values():
+                templates.append(record['statistics'])
+                match_info = record.get('match_info') or {}
+                team_names.update(name for name in (match_info.get('homeTeamName'), match_info.get('awayTeamName'))
+                                  if name)
+        else:
+            templates.append(data['statistics'])
+    return templates, sorted(team_names) or ['Home', 'Away']
+
+
+def _requests_response(body: bytes):
+    import requests
+    response = requests.models.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = 'application/json'
+    response._content = body
+    return response
+
+
+def _http_response(body: bytes) -> Response:
+    return Response('http://benchmark/match/stats', 200, 'OK',
+                    Headers({'Content-Type': 'application/json'}), body)
+
+
+def bench_response_json(data: Dataset, transport: str) -> Callable:
+    make_response = _requests_response if transport == 'requests' else _http_response
+    bodies = data.bodies
+
+    def run():
+        for i in range(data.size):
+            make_response(bodies[i % len(bodies)]).json()
+    return run
+
+
+def bench_match_info_loop(data: Dataset) -> Callable:
+    def run():
+        all_stats = {}
+        for match, stats in zip(data.matches, data.statistics):
+            match_id_str = str(match.get('matchId'))
+            all_stats[match_id_str] = {
+                'match_info': match_info_from_schedule(match),
+                'statistics': stats
+            }
+        return all_stats
+    return run
+
+
+def bench_stat_categories(data: Dataset) -> Callable:
+    def run():
+        for stats in data.statistics:
+            if 'endMatch' in stats:
+                available_stat_categories(stats['endMatch'])
+    return run
+
+
+def bench_save_matches(data: Dataset) -> Callable:
+    fetcher = H2HMatchFetcher(transport='http')
+    return lambda: fetcher.save_matches_to_file(data.matches, os.devnull)
+
+
+def bench_save_stats(data: Dataset) -> Callable:
+    fetcher = H2HMatchStatsFetcher(transport='http')
+    records = data.stats_records()
+    return lambda: fetcher.save_stats_to_file(records, os.devnull)
+
+
+BENCHMARKS = {
+    'response_json': bench_response_json,
+    'match_info_loop': bench_match_info_loop,
+    'stat_categories': bench_stat_categories,
+    'save_matches': bench_save_matches,
+    'save_stats': bench_save_stats,
+}
+
+
+def available_transports() -> List[str]:
+    try:
+        import requests  # noqa: F401
+    except ImportError:
+        return ['http']
+    return ['requests', 'http']
+
+
+def benchmark_cases(names: List[str]) -> Dict[str, Callable[[Dataset], Callable]]:
+    """Map case names (response_json split per transport) to their setup functions."""
+    cases = {}
+    for name in names:
+        if name == 'response_json':
+            for transport in available_transports():
+                cases[f'response_json[{transport}]'] = lambda data, transport=transport: bench_response_json(data, transport)
+        else:
+            cases[name] = BENCHMARKS[name]
+    return cases
+
+
+def measure(run: Callable, repeat: int, max_time: float, trace_memory: bool = True, min_runs: int = 1) -> Dict:
+    """Time run() up to repeat times (stopping after max_time seconds once min_runs are done), then trace it once."""
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max(repeat, min_runs):
+        gc.collect()
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+        del result
+        if len(timings) >= min_runs and time.perf_counter() - started > max_time:
+            break
+
+    measurement = {
+        'runs': len(timings),
+        'median_ms': statistics.median(timings) * 1000,
+        'min_ms': min(timings) * 1000,
+        'max_ms': max(timings) * 1000,
+    }
+    if trace_memory:
+        gc.collect()
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        result = run()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        gc.collect()
+        measurement.update({
+            'peak_bytes': peak - before,
+            'retained_bytes': current - before,
+            'retained_blocks': sys.getallocatedblocks() - blocks_before,
+        })
+        del result
+    return measurement
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Annotate results with their change against the baseline; return the regressed cases."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        result['time_change'] = result['min_ms'] / base['min_ms'] - 1 if base['min_ms'] else 0.0
+        # Slower by more than the threshold, and not within the spread of the baseline's own runs
+        regressed = result['time_change'] > threshold and result['min_ms'] > base.get('max_ms', base['min_ms'])
+        if 'peak_bytes' in result and base.get('peak_bytes', 0) >= _MIN_COMPARED_PEAK:
+            result['peak_change'] = result['peak_bytes'] / base['peak_bytes'] - 1
+            regressed = regressed or result['peak_change'] > threshold
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def _format_bytes(value: Optional[int]) -> str:
+    if value is None:
+        return '-'
+    return f'{value / (1024 * 1024):.1f} MiB'
+
+
+def _format_change(result: Dict, key: str) -> str:
+    return f"{result[key] * 100:+.0f}%" if key in result else ''
+
+
+def print_row(key: str, result: Dict, size: int) -> None:
+    per_match_us = result['median_ms'] * 1000 / size
+    print(f"{key:<34} {result['median_ms']:>10.1f} {result['min_ms']:>10.1f} {per_match_us:>9.2f} "
+          f"{_format_bytes(result.get('peak_bytes')):>11} {_format_bytes(result.get('retained_bytes')):>11} "
+          f"{_format_change(result, 'time_change'):>7} {_format_change(result, 'peak_change'):>7}")
+
+
+def load_baseline(path: str) -> Dict[str, Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != BASELINE_VERSION:
+        raise ValueError(f"Baseline '{path}' has an unknown format")
+    if data.get('python') != platform.python_version():
+        print(f"Note: baseline was recorded with Python {data.get('python')}, "
+              f"this is {platform.python_version()}")
+    return data['results']
+
+
+def save_baseline(path: str, results: Dict[str, Dict]) -> None:
+    data = {
+        'version': BASELINE_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    """Run the hot path benchmarks."""
+    parser = argparse.ArgumentParser(
+        description='Micro-benchmark parsing, transformation and serialization hot paths',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python benchmark_hotpaths.py
+  python benchmark_hotpaths.py --sizes 1000 10000 --save-baseline benchmark_baseline.json
+  python benchmark_hotpaths.py --sizes 1000 10000 --compare benchmark_baseline.json
+  python benchmark_hotpaths.py --benchmark save_stats response_json --repeat 10
+        """
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Synthetic dataset sizes in matches (default: 1000 10000 100000)')
+    parser.add_argument('--benchmark', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS),
+                        help='Benchmarks to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case (default: 5)')
+    parser.add_argument('--max-time', type=float, default=10,
+                        help='Stop repeating a case after this many seconds, with at least one run (default: 10)')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc run')
+    parser.add_argument('--save-baseline', metavar='FILE', help='Save the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='Compare against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Relative slowdown or peak growth reported as a regression (default: {DEFAULT_THRESHOLD})')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        try:
+            baseline = load_baseline(args.compare)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: cannot read baseline: {e}")
+            return 1
+
+    min_runs = MIN_COMPARED_RUNS if args.compare or args.save_baseline else 1
+    if args.repeat < min_runs:
+        print(f"Note: timing each case {min_runs} times; fewer runs are too noisy to compare")
+
+    cases = benchmark_cases(args.benchmark)
+    results: Dict[str, Dict] = {}
+    regressions: List[str] = []
+    print(f"{'case':<34} {'median ms':>10} {'min ms':>10} {'us/match':>9} {'peak':>11} {'retained':>11} "
+          f"{'time':>7} {'peak':>7}")
+    for size in args.sizes:
+        data = Dataset(size)
+        for name, setup in cases.items():
+            key = f'{name}@{size}'
+            result = measure(setup(data), args.repeat, args.max_time, trace_memory=not args.no_memory,
+                             min_runs=min_runs)
+            if compare({key: dict(result)}, baseline, args.threshold):
+                # Time a suspected regression again and keep the better best time, so one slow phase isn't reported
+                retry = measure(setup(data), args.repeat, args.max_time, trace_memory=False, min_runs=min_runs)
+                if retry['min_ms'] < result['min_ms']:
+                    result.update({name: retry[name] for name in ('median_ms', 'min_ms', 'max_ms')})
+                result['runs'] += retry['runs']
+            result['size'] = size
+            results[key] = result
+            regressions += compare({key: result}, baseline, args.threshold)
+            print_row(key, result, size)
+        del data
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.compare:
+        missing = sorted(set(baseline) - set(results))
+        if missing:
+            print(f"\nNot run this time: {', '.join(missing)}")
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold * 100:.0f}%: "
+                  f"{', '.join(regressions)}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold * 100:.0f}% against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
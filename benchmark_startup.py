@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - CLI Startup Benchmark
+
+This script measures how long each command line entry point takes to get
+going, which matters for cron and watch jobs that start a fresh process
+for every poll. For each script and HTTP transport it reports:
+
+    interpreter   bare "python -c pass" startup, the floor for any run
+    first call    Python time from the script starting to its first API
+                  request (imports, argument parsing, token check, setup)
+    total         wall time of the whole process up to that request
+
+Runs use a temporary working directory holding a valid cached token, and
+the first API request is intercepted, so no network access is needed.
+
+The 100 ms target for the first call is only met with the standard-library
+transport (--transport http or H2HGGL_TRANSPORT=http). Importing requests,
+the default transport, costs more than that on its own, so its runs are
+expected to show up as over budget.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --repeat 20 --transport http
+    python benchmark_startup.py --importtime fetch_match_stats.py
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Script and arguments that run up to one API request
+SCENARIOS = {
+    'fetch_match_stats.py': ['--match-id', 'NB001010125', '--no-matchup-index'],
+    'fetch_completed_matches.py': ['--no-matchup-index', '--no-id-index'],
+    'fetch_league_data.py': ['--standings', '--no-cache'],
+}
+
+# Run inside the child: time from here to the first session.get(), then stop
+_DRIVER = r"""
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {repo_dir!r})
+sys.argv = {argv!r}
+
+import http_transport
+_create_session = http_transport.create_session
+
+def create_session(transport=None):
+    session = _create_session(transport)
+    def first_request(*args, **kwargs):
+        sys.stdout.write('FIRST_CALL_MS=%.3f\n' % ((time.perf_counter() - start) * 1000))
+        sys.stdout.flush()
+        import os
+        os._exit(0)
+    session.get = first_request
+    return session
+
+http_transport.create_session = create_session
+
+import runpy
+runpy.run_path({script!r}, run_name='__main__')
+"""
+
+
+def _write_token(directory: str) -> None:
+    """Save an unsigned JWT that expires in a day, as fetch_auth_token.py would."""
+    def encode(data: Dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+    token = f"{encode({'alg': 'none'})}.{encode({'exp': int(time.time()) + 86400})}.benchmark"
+    with open(os.path.join(directory, 'auth_token.json'), 'w', encoding='utf-8') as f:
+        json.dump({'token': token}, f)
+
+
+def _run(command: List[str], cwd: str) -> subprocess.CompletedProcess:
+    return subprocess.run(command, cwd=cwd, capture_output=True, text=True, timeout=120)
+
+
+def measure_interpreter(repeat: int, cwd: str) -> List[float]:
+    """Wall times of a bare interpreter start, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _run([sys.executable, '-c', 'pass'], cwd)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def measure_scenario(script: str, arguments: List[str], transport: str, repeat: int,
+                     cwd: str) -> Dict[str, List[float]]:
+    """Time a script up to its first API request."""
+    script_path = os.path.join(REPO_DIR, script)
+    argv = [script_path] + arguments + ['--transport', transport, '--quiet', '--no-progress']
+    driver = _DRIVER.format(repo_dir=REPO_DIR, argv=argv, script=script_path)
+
+    first_call, total = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = _run([sys.executable, '-c', driver], cwd)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        marker = next((line for line in result.stdout.splitlines() if line.startswith('FIRST_CALL_MS=')), None)
+        if marker is None:
+            raise RuntimeError(f"{script} exited before making a request:\n{result.stdout}{result.stderr}")
+        first_call.append(float(marker.split('=', 1)[1]))
+        total.append(elapsed)
+    return {'first_call': first_call, 'total': total}
+
+
+def show_importtime(script: str, top: int, cwd: str) -> None:
+    """Print the modules that take longest to import for a script."""
+    module = os.path.splitext(os.path.basename(script))[0]
+    result = _run([sys.executable, '-X', 'importtime', '-c', f'import sys; sys.path.insert(0, {REPO_DIR!r}); import {module}'], cwd)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        rows.append((int(cumulative_us), int(self_us), name))
+
+    print(f"Slowest imports for {script} (cumulative ms, self ms):")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+
+def main():
+    """Run the startup benchmark."""
+    parser = argparse.ArgumentParser(
+        description='Measure CLI startup time up to the first API request',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python benchmark_startup.py
+  python benchmark_startup.py --repeat 20 --transport http
+  python benchmark_startup.py --importtime fetch_match_stats.py
+        """
+    )
+    parser.add_argument('--repeat', type=int, default=10, help='Runs per measurement (default: 10)')
+    parser.add_argument('--transport', nargs='+', choices=['requests', 'http'], default=['requests', 'http'],
+                        help='Transports to measure (default: both)')
+    parser.add_argument('--script', nargs='+', choices=sorted(SCENARIOS), default=sorted(SCENARIOS),
+                        help='Scripts to measure (default: all)')
+    parser.add_argument('--budget', type=float, default=100,
+                        help='Flag runs whose first call takes longer than this many ms (default: 100)')
+    parser.add_argument('--importtime', metavar='SCRIPT', help='Show the slowest imports of a script instead')
+    parser.add_argument('--top', type=int, default=15, help='Modules shown with --importtime (default: 15)')
+    parser.add_argument('--output', help='Also save the results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='h2hggl_startup_') as cwd:
+        _write_token(cwd)
+
+        if args.importtime:
+            show_importtime(args.importtime, args.top, cwd)
+            return 0
+
+        interpreter = statistics.median(measure_interpreter(args.repeat, cwd))
+        print(f"Interpreter startup: {interpreter:.1f} ms (median of {args.repeat})")
+        print()
+        print(f"{'script':<28} {'transport':<10} {'first call':>11} {'min':>8} {'total':>9}")
+
+        results = {'interpreter_ms': interpreter, 'runs': []}
+        over_budget = 0
+        for script in args.script:
+            for transport in args.transport:
+                timings = measure_scenario(script, SCENARIOS[script], transport, args.repeat, cwd)
+                first_call = statistics.median(timings['first_call'])
+                flag = '  over budget' if first_call > args.budget else ''
+                over_budget += bool(flag)
+                print(f"{script:<28} {transport:<10} {first_call:>8.1f} ms {min(timings['first_call']):>5.1f} ms "
+                      f"{statistics.median(timings['total']):>6.1f} ms{flag}")
+                results['runs'].append({
+                    'script': script,
+                    'transport': transport,
+                    'first_call_ms': first_call,
+                    'first_call_min_ms': min(timings['first_call']),
+                    'total_ms': statistics.median(timings['total']),
+                })
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if over_budget:
+        print(f"\n{over_budget} run(s) took longer than {args.budget:.0f} ms to reach the first API call")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Output Compaction
+
+This script merges any number of completed matches and statistics output
+files (plain, .gz or .zst; batch, per-tournament or single-match files)
+into one consolidated schedule file and one consolidated statistics file.
+Matches are de-duplicated by matchId; when a match appears in several
+files, the copy with the newest fetched_at wins (ties go to the file
+listed last).
+
+Inputs are streamed once. Each record is spilled to one of --buckets
+temporary files chosen by a hash of its matchId, so all copies of a match
+land in the same bucket. Buckets are then de-duplicated one at a time,
+sorted by startDate, and merged into the output, so memory holds one
+bucket rather than the whole history.
+
+Every output record carries its own fetched_at, so compacted files can be
+compacted again together with newer runs.
+
+Usage:
+    python compact_data.py h2hggl_data/completed_matches*.json h2hggl_data/*_statistics.json
+    python compact_data.py h2hggl_data/*.json* --matches-output h2hggl_data/all_matches.json.gz
+    python compact_data.py h2hggl_data/*.json --buckets 256
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import os
+import sys
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from data_io import add_compression_arguments, iter_file_records, with_compression_extension, write_json_stream
+from logging_utils import ProgressReporter, add_logging_arguments, setup_logging_from_args
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MATCHES_OUTPUT = 'h2hggl_data/compacted/completed_matches.json'
+DEFAULT_STATS_OUTPUT = 'h2hggl_data/compacted/match_statistics.json'
+DEFAULT_BUCKETS = 64
+
+# Record kinds, each merged into its own output
+_KINDS = ('matches', 'statistics')
+
+
+def _sort_key(kind: str, record: Dict) -> str:
+    if kind == 'matches':
+        return record.get('startDate') or ''
+    return (record.get('match_info') or {}).get('startDate') or ''
+
+
+class Compactor:
+    """Single-pass, hash-bucketed merge of output files."""
+
+    def __init__(self, work_dir: str, buckets: int = DEFAULT_BUCKETS):
+        self.work_dir = work_dir
+        self.buckets = buckets
+        self._spill = {kind: [None] * buckets for kind in _KINDS}
+        self._order = 0
+        self.stats = {'files': 0, 'records': 0, 'matches': 0, 'statistics': 0, 'duplicates': 0}
+
+    def _bucket_path(self, kind: str, bucket: int) -> str:
+        return os.path.join(self.work_dir, f'{kind}-{bucket:04d}.jsonl')
+
+    def _spill_file(self, kind: str, bucket: int):
+        handles = self._spill[kind]
+        if handles[bucket] is None:
+            handles[bucket] = open(self._bucket_path(kind, bucket), 'w', encoding='utf-8')
+        return handles[bucket]
+
+    def add_file(self, path: str) -> int:
+        """Spill every record of an input file into its bucket. Returns the record count."""
+        count = 0
+        for kind, match_id, fetched_at, record in iter_file_records(path):
+            bucket = zlib.crc32(match_id.encode('utf-8')) % self.buckets
+            self._order += 1
+            # Spilled as [match_id, fetched_at, input order, sort key, record]
+            line = json.dumps([match_id, fetched_at, self._order, _sort_key(kind, record), record],
+                              ensure_ascii=False)
+            f = self._spill_file(kind, bucket)
+            f.write(line)
+            f.write('\n')
+            count += 1
+        self.stats['files'] += 1
+        self.stats['records'] += count
+        return count
+
+    def _close_spill(self) -> None:
+        for handles in self._spill.values():
+            for i, handle in enumerate(handles):
+                if handle is not None:
+                    handle.close()
+                    handles[i] = None
+
+    def _dedupe_bucket(self, kind: str, bucket: int) -> Optional[Tuple[str, int, str]]:
+        """Keep the newest copy of each match in a bucket and rewrite it sorted.
+
+        Returns the sorted file, its match count and its newest fetched_at.
+        """
+        path = self._bucket_path(kind, bucket)
+        if not os.path.exists(path):
+            return None
+
+        newest: Dict[str, list] = {}
+        total = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                total += 1
+                current = newest.get(entry[0])
+                if current is None or (entry[1], entry[2]) > (current[1], current[2]):
+                    newest[entry[0]] = entry
+        self.stats['duplicates'] += total - len(newest)
+
+        sorted_path = f'{path}.sorted'
+        with open(sorted_path, 'w', encoding='utf-8') as f:
+            for entry in sorted(newest.values(), key=lambda entry: (entry[3], entry[0])):
+                f.write(json.dumps(entry, ensure_ascii=False))
+                f.write('\n')
+        os.remove(path)
+        return sorted_path, len(newest), max(entry[1] for entry in newest.values())
+
+    @staticmethod
+    def _read_sorted(path: str) -> Iterator[Tuple[Tuple[str, str], list]]:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                yield (entry[3], entry[0]), entry
+
+    def _merged(self, paths: List[str]) -> Iterator[Tuple[str, Dict]]:
+        """Merge sorted buckets by startDate, yielding (match_id, record) with fetched_at attached."""
+        for _, (match_id, fetched_at, _, _, record) in heapq.merge(*(self._read_sorted(path) for path in paths)):
+            record['fetched_at'] = fetched_at
+            yield match_id, record
+
+    def write(self, kind: str, output: str, compress: Optional[str] = None,
+              level: Optional[int] = None, sources: Optional[List[str]] = None) -> int:
+        """De-duplicate and write one kind of record. Returns the number of matches written."""
+        self._close_spill()
+        buckets = [result for result in (self._dedupe_bucket(kind, bucket) for bucket in range(self.buckets))
+                   if result]
+        if not buckets:
+            return 0
+
+        paths = [path for path, _, _ in buckets]
+        metadata = {
+            'total_matches': sum(count for _, count, _ in buckets),
+            'fetched_at': max(fetched_at for _, _, fetched_at in buckets),
+            'compacted_at': datetime.now().isoformat(),
+            'sources': sources or [],
+        }
+        records = self._merged(paths)
+        try:
+            if kind == 'matches':
+                count = write_json_stream(output, metadata, 'matches', (record for _, record in records),
+                                          compress=compress, level=level)
+            else:
+                count = write_json_stream(output, metadata, 'matches_statistics', records, mapping=True,
+                                          compress=compress, level=level)
+        finally:
+            for path in paths:
+                os.remove(path)
+        self.stats[kind] = count
+        return count
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(
+        description='Merge output files into one de-duplicated schedule and statistics dataset',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python compact_data.py h2hggl_data/completed_matches*.json h2hggl_data/*_statistics.json
+  python compact_data.py h2hggl_data/*.json* --matches-output h2hggl_data/all_matches.json.gz
+  python compact_data.py h2hggl_data/compacted/*.json h2hggl_data/completed_matches.json
+        """
+    )
+
+    parser.add_argument('files', nargs='+', metavar='FILE',
+                        help='Completed matches or statistics files to merge (later files win ties)')
+    parser.add_argument(
+        '--matches-output',
+        default=DEFAULT_MATCHES_OUTPUT,
+        help=f'Consolidated schedule file (default: {DEFAULT_MATCHES_OUTPUT})'
+    )
+    parser.add_argument(
+        '--stats-output',
+        default=DEFAULT_STATS_OUTPUT,
+        help=f'Consolidated statistics file (default: {DEFAULT_STATS_OUTPUT})'
+    )
+    parser.add_argument(
+        '--buckets',
+        type=int,
+        default=DEFAULT_BUCKETS,
+        help=f'Hash buckets to spill records into; memory holds one bucket at a time (default: {DEFAULT_BUCKETS})'
+    )
+
+    add_compression_arguments(parser)
+
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+
+    add_logging_arguments(parser)
+
+    return parser.parse_args()
+
+
+def main():
+    """Main function to compact output files."""
+
+    args = parse_arguments()
+    setup_logging_from_args(args)
+
+    missing = [path for path in args.files if not os.path.isfile(path)]
+    if missing:
+        logger.error("Error: Input file(s) not found: %s", ', '.join(missing))
+        return 1
+
+    work_parent = os.path.dirname(args.matches_output) or '.'
+    os.makedirs(work_parent, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix='.compact-', dir=work_parent) as work_dir:
+        compactor = Compactor(work_dir, buckets=max(args.buckets, 1))
+        progress = ProgressReporter(total=len(args.files), label="Reading", unit="files")
+        for path in args.files:
+            try:
+                count = compactor.add_file(path)
+            except (OSError, ValueError, RuntimeError) as e:
+                logger.error("Error reading '%s': %s", path, e)
+                return 1
+            logger.debug("%s: %d records", path, count)
+            progress.update()
+        progress.close()
+
+        outputs = {'matches': with_compression_extension(args.matches_output, args.compress),
+                   'statistics': with_compression_extension(args.stats_output, args.compress)}
+        for kind, output in outputs.items():
+            count = compactor.write(kind, output, compress=args.compress, level=args.compress_level,
+                                    sources=args.files)
+            if count:
+                logger.info(
+                    "Saved %d %s to %s", count, 'matches' if kind == 'matches' else 'match statistics', output,
+                    extra={'fields': {'event': 'saved', 'kind': kind, 'count': count, 'path': output}}
+                )
+
+    stats = compactor.stats
+    logger.info(
+        "\nSummary:\n"
+        "  Files read: %d\n"
+        "  Records read: %d\n"
+        "  Duplicates dropped: %d\n"
+        "  Matches written: %d\n"
+        "  Statistics written: %d",
+        stats['files'], stats['records'], stats['duplicates'], stats['matches'], stats['statistics'],
+        extra={'fields': {'event': 'summary', **stats}}
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
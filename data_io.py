@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Output File I/O
+
+This module reads and writes the JSON output files, optionally compressed
+with gzip or zstd. Compression is chosen from the file extension (.gz,
+.zst) or explicitly, and is applied as a stream while the JSON is encoded,
+so the full document text is never held in memory.
+
+Readers detect compression from the file's magic bytes and decode the
+top-level 'matches' array or 'matches_statistics' object incrementally,
+one item at a time, without inflating the whole file first.
+
+Usage:
+    write_json(output_data, 'h2hggl_data/completed_matches.json.gz')
+    for match in iter_matches('h2hggl_data/completed_matches.json.gz'):
+        ...
+    for match_id, record in iter_match_statistics('h2hggl_data/all_stats.json.zst'):
+        ...
+    write_json_stream('h2hggl_data/merged.json.gz', metadata, 'matches', match_generator)
+
+zstd support requires the optional zstandard package (pip install zstandard).
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+
+COMPRESSION_EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+DEFAULT_LEVELS = {
+    'gzip': 6,
+    'zstd': 3,
+}
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Encoded JSON is buffered up to this many characters between writes
+WRITE_BUFFER_SIZE = 1 << 20
+READ_CHUNK_SIZE = 1 << 16
+
+
+def compression_from_path(path: str) -> Optional[str]:
+    """Return the compression implied by a file extension, if any."""
+    for compression, extension in COMPRESSION_EXTENSIONS.items():
+        if path.endswith(extension):
+            return compression
+    return None
+
+
+def strip_compression_extension(path: str) -> str:
+    """Remove a trailing .gz/.zst extension from a path."""
+    compression = compression_from_path(path)
+    if compression:
+        return path[:-len(COMPRESSION_EXTENSIONS[compression])]
+    return path
+
+
+def with_compression_extension(path: str, compress: Optional[str]) -> str:
+    """Append the extension for the requested compression unless already present."""
+    if not compress or compress == 'none':
+        return path
+    extension = COMPRESSION_EXTENSIONS[compress]
+    return path if path.endswith(extension) else f"{path}{extension}"
+
+
+def _require_zstandard():
+    """Import the optional zstandard package on first use."""
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd compression requires the zstandard library. Install with: pip install zstandard")
+    return zstandard
+
+
+def open_output(path: str, compress: Optional[str] = None, level: Optional[int] = None):
+    """Open a text stream for writing, compressing by extension or explicit choice."""
+    compress = compress if compress and compress != 'none' else compression_from_path(path)
+
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if compress == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8',
+                         compresslevel=level if level is not None else DEFAULT_LEVELS['gzip'])
+    if compress == 'zstd':
+        zstandard = _require_zstandard()
+        compressor = zstandard.ZstdCompressor(level=level if level is not None else DEFAULT_LEVELS['zstd'])
+        raw = open(path, 'wb')
+        return io.TextIOWrapper(compressor.stream_writer(raw, closefd=True), encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def open_input(path: str):
+    """Open a text stream for reading, detecting gzip/zstd from the magic bytes."""
+    raw = open(path, 'rb')
+    magic = raw.read(4)
+    raw.seek(0)
+
+    if magic.startswith(_GZIP_MAGIC):
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding='utf-8')
+    if magic.startswith(_ZSTD_MAGIC):
+        zstandard = _require_zstandard()
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(io.BufferedReader(reader), encoding='utf-8')
+    return io.TextIOWrapper(raw, encoding='utf-8')
+
+
+def write_json(data, path: str, compress: Optional[str] = None, level: Optional[int] = None,
+               indent: Optional[int] = 2, profiler=None) -> None:
+    """Encode data as JSON straight into a (possibly compressed) file.
+
+    Encoded chunks are buffered and flushed in large blocks. If a profiler
+    is given, encoding is timed as 'serialize' and flushing as 'write'.
+    """
+    encoder = json.JSONEncoder(indent=indent, ensure_ascii=False,
+                               separators=None if indent is not None else (',', ':'))
+
+    serialize_phase = profiler.phase('serialize') if profiler else None
+    with open_output(path, compress, level) as f:
+        buffer = []
+        buffered = 0
+        if serialize_phase:
+            serialize_phase.__enter__()
+        try:
+            for chunk in encoder.iterencode(data):
+                buffer.append(chunk)
+                buffered += len(chunk)
+                if buffered >= WRITE_BUFFER_SIZE:
+                    _flush(f, buffer, profiler)
+                    buffer = []
+                    buffered = 0
+            _flush(f, buffer, profiler)
+        finally:
+            if serialize_phase:
+                serialize_phase.__exit__(None, None, None)
+
+
+def write_json_stream(path: str, metadata: Dict, key: str, items: Iterable, mapping: bool = False,
+                      compress: Optional[str] = None, level: Optional[int] = None) -> int:
+    """Write {'metadata': ..., key: [...]} with items encoded one at a time, one per line.
+
+    With mapping=True items are (key, value) pairs written as an object
+    instead of an array. The file is written under a temporary name and
+    moved into place when complete. Returns the number of items written.
+    """
+    compress = compress if compress and compress != 'none' else compression_from_path(path)
+    tmp_path = f"{path}.tmp"
+    count = 0
+    try:
+        with open_output(tmp_path, compress, level) as f:
+            f.write('{"metadata": ')
+            f.write(json.dumps(metadata, ensure_ascii=False))
+            f.write(f', {json.dumps(key)}: {"{" if mapping else "["}\n')
+            buffer = []
+            buffered = 0
+            for item in items:
+                if mapping:
+                    item_key, value = item
+                    line = f'{json.dumps(str(item_key))}: {json.dumps(value, ensure_ascii=False)}'
+                else:
+                    line = json.dumps(item, ensure_ascii=False)
+                if count:
+                    buffer.append(',\n')
+                buffer.append(line)
+                buffered += len(line)
+                count += 1
+                if buffered >= WRITE_BUFFER_SIZE:
+                    _flush(f, buffer, None)
+                    buffer = []
+                    buffered = 0
+            _flush(f, buffer, None)
+            f.write('\n}}\n' if mapping else '\n]}\n')
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def _flush(f, buffer, profiler) -> None:
+    if not buffer:
+        return
+    if profiler:
+        with profiler.phase('write'):
+            f.write(''.join(buffer))
+    else:
+        f.write(''.join(buffer))
+
+
+def add_compression_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the shared output compression options to a CLI argument parser."""
+    parser.add_argument(
+        '--compress',
+        choices=['none', 'gzip', 'zstd'],
+        help='Compress output files (default: chosen by the .gz/.zst output extension)'
+    )
+
+    parser.add_argument(
+        '--compress-level',
+        type=int,
+        help='Compression level (default: gzip 6, zstd 3)'
+    )
+
+
+def load_json(path: str):
+    """Load a whole (possibly compressed) JSON file."""
+    with open_input(path) as f:
+        return json.load(f)
+
+
+class _StreamDecoder:
+    """Incremental decoder for the top level of a JSON document."""
+
+    _WHITESPACE = ' \t\n\r'
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: Optional[int] = None) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(size or READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self._WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed JSON: expected '{char}', found '{found or 'EOF'}'")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        read_size = READ_CHUNK_SIZE
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A value ending exactly at the buffer edge may be a truncated number
+                if end < len(self.buffer) or self.eof or self.buffer[self.pos] in '{["':
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self._fill(read_size):
+                continue
+            read_size = min(read_size * 2, 1 << 24)
+
+    def iter_object(self) -> Iterator[Tuple[str, object]]:
+        """Yield (key, value) pairs of the object starting at the cursor."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key, self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Malformed JSON: unexpected '{separator or 'EOF'}' in object")
+
+    def iter_object_keys(self) -> Iterator[str]:
+        """Yield the keys of the object at the cursor; the caller consumes each value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Malformed JSON: unexpected '{separator or 'EOF'}' in object")
+
+    def iter_array(self) -> Iterator[object]:
+        """Yield the items of the array starting at the cursor."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Malformed JSON: unexpected '{separator or 'EOF'}' in array")
+
+
+def iter_sections(path: str, keys: Tuple[str, ...], metadata: Optional[Dict] = None) -> Iterator[Tuple[str, object]]:
+    """Stream (section, item) pairs from any of several top-level keys in one pass.
+
+    Array sections yield items; object sections yield (key, value) pairs.
+    Other top-level values are decoded whole and, if a metadata dict is
+    passed, stored in it.
+    """
+    with open_input(path) as f:
+        decoder = _StreamDecoder(f)
+        for top_key in decoder.iter_object_keys():
+            if top_key not in keys:
+                value = decoder.value()
+                if metadata is not None:
+                    metadata[top_key] = value
+                continue
+
+            items = decoder.iter_array() if decoder.peek() == '[' else decoder.iter_object()
+            for item in items:
+                yield top_key, item
+
+
+def iter_top_level(path: str, key: str, metadata: Optional[Dict] = None) -> Iterator:
+    """Stream the items of one top-level array or object in an output file."""
+    for _, item in iter_sections(path, (key,), metadata):
+        yield item
+
+
+def iter_matches(path: str) -> Iterator[Dict]:
+    """Stream schedule rows from a completed matches file."""
+    return iter_top_level(path, 'matches')
+
+
+def iter_match_statistics(path: str) -> Iterator[Tuple[str, Dict]]:
+    """Stream (match_id, record) pairs from a match statistics file."""
+    return iter_top_level(path, 'matches_statistics')
+
+
+def _file_fetched_at(path: str, metadata: Dict) -> str:
+    """A file's fetched_at, falling back to its modification time."""
+    fetched_at = (metadata.get('metadata') or {}).get('fetched_at')
+    if fetched_at:
+        return fetched_at
+    return datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+
+
+def _stats_match_id(stats_key: Optional[str], record: Dict) -> Optional[str]:
+    """The matchId a statistics record belongs to, whatever key it was stored under."""
+    # match_ids reads files through this module
+    from match_ids import ids_from_statistics
+
+    match_info = record.get('match_info') or {}
+    if match_info.get('matchId') not in (None, '', 'None'):
+        return str(match_info['matchId'])
+    return ids_from_statistics(record.get('statistics'))['match_id'] or stats_key
+
+
+def iter_file_records(path: str) -> Iterator[Tuple[str, str, str, Dict]]:
+    """Yield (kind, match_id, fetched_at, record) for every match in an output file.
+
+    Reads batch, per-tournament, single-match and compacted files. Records
+    written by an earlier compaction carry their own fetched_at, which
+    takes precedence over the file's.
+    """
+    metadata: Dict = {}
+    for section, item in iter_sections(path, ('matches', 'matches_statistics'), metadata):
+        file_fetched_at = _file_fetched_at(path, metadata)
+        if section == 'matches':
+            if item.get('matchId') in (None, ''):
+                continue
+            yield 'matches', str(item['matchId']), item.get('fetched_at') or file_fetched_at, item
+        else:
+            stats_key, record = item
+            match_id = _stats_match_id(stats_key, record)
+            if match_id:
+                yield 'statistics', match_id, record.get('fetched_at') or file_fetched_at, record
+
+    # Single-match statistics files hold the match at the top level
+    if 'statistics' in metadata:
+        record = {key: metadata[key] for key in ('statistics', 'derived') if key in metadata}
+        match_id = _stats_match_id((metadata.get('metadata') or {}).get('match_id'), record)
+        if match_id:
+            yield 'statistics', match_id, _file_fetched_at(path, metadata), record
@@ -12,8 +12,33 @@ Usage:
 
 import argparse
 import json
+import logging
+import os
 import sys
+from itertools import islice
+from data_io import add_compression_arguments, iter_matches, strip_compression_extension, with_compression_extension
 from fetch_match_stats import H2HMatchStatsFetcher
+from logging_utils import ProgressReporter, add_logging_arguments, setup_logging_from_args
+from match_metrics import enrich_batch
+from profiling import PhaseProfiler
+
+logger = logging.getLogger(__name__)
+
+STAT_CATEGORIES = [
+    'Points', 'FieldGoals', 'FreeThrows', '3Pointers',
+    'Rebounds', 'Assists', 'Steals', 'Blocks', 'Turnovers'
+]
+
+
+def available_stat_categories(end_match: dict) -> list:
+    """Return the STAT_CATEGORIES with at least one home*/away* key in a period's statistics."""
+    available_stats = []
+    for category in STAT_CATEGORIES:
+        home_key = f'home{category}'
+        away_key = f'away{category}'
+        if any(key.startswith(home_key) or key.startswith(away_key) for key in end_match.keys()):
+            available_stats.append(category)
+    return available_stats
 
 
 def main():
@@ -45,39 +70,63 @@ def main():
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
-        help='Enable verbose output'
+        help='Enable verbose output (per-match lines)'
+    )
+    
+    add_logging_arguments(parser)
+    add_compression_arguments(parser)
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Time each pipeline phase and write a profile report'
+    )
+    
+    parser.add_argument(
+        '--profile-cprofile',
+        action='store_true',
+        help='Also run cProfile inside each phase (implies --profile)'
+    )
+    
+    parser.add_argument(
+        '--profile-output',
+        help='Profile report path (default: <output>_profile.txt)'
     )
     
     args = parser.parse_args()
+    args.output = with_compression_extension(args.output, args.compress)
+    setup_logging_from_args(args)
+    
+    profiler = PhaseProfiler(
+        enabled=args.profile or args.profile_cprofile,
+        use_cprofile=args.profile_cprofile
+    )
     
     try:
-        # Load the completed matches file
-        with open(args.matches_file, 'r', encoding='utf-8') as f:
-            matches_data = json.load(f)
+        # Stream only the first N matches from the completed matches file
+        with profiler.phase('load'):
+            subset_matches = list(islice(iter_matches(args.matches_file), args.count))
         
-        matches = matches_data.get('matches', [])
-        if not matches:
-            print(f"No matches found in {args.matches_file}")
+        if not subset_matches:
+            logger.warning("No matches found in %s", args.matches_file)
             return
         
-        # Take only the first N matches
-        subset_matches = matches[:args.count]
-        
-        print(f"Processing {len(subset_matches)} matches from {args.matches_file}")
+        logger.info("Processing %d matches from %s", len(subset_matches), args.matches_file)
         
         # Initialize the fetcher
-        fetcher = H2HMatchStatsFetcher()
-        fetcher.set_auth_token('test')  # Will trigger auto-refresh
+        fetcher = H2HMatchStatsFetcher(profiler=profiler)
         
         all_stats = {}
         successful_fetches = 0
         failed_fetches = 0
+        progress = ProgressReporter(total=len(subset_matches), label="Fetching stats", unit="matches")
         
         for i, match in enumerate(subset_matches, 1):
             match_id = match.get('matchId')
             if not match_id:
-                print(f"Match {i}: No match ID found, skipping...")
+                logger.warning("Match %d: No match ID found, skipping...", i)
                 failed_fetches += 1
+                progress.update()
                 continue
             
             match_id_str = str(match_id)
@@ -86,24 +135,26 @@ def main():
             home_score = match.get('homeScore', 'N/A')
             away_score = match.get('awayScore', 'N/A')
             
-            print(f"Match {i}/{len(subset_matches)}: {home_team} vs {away_team} ({home_score}-{away_score}) [ID: {match_id_str}]")
+            logger.debug("Match %d/%d: %s vs %s (%s-%s) [ID: %s]",
+                         i, len(subset_matches), home_team, away_team, home_score, away_score, match_id_str)
             
             stats = fetcher.fetch_match_stats(match_id_str, verbose=args.verbose)
             
             if stats:
-                all_stats[match_id_str] = {
-                    'match_info': {
-                        'matchId': match_id_str,
-                        'homeTeamName': home_team,
-                        'awayTeamName': away_team,
-                        'homeScore': home_score,
-                        'awayScore': away_score,
-                        'startDate': match.get('startDate'),
-                        'tournamentName': match.get('tournamentName'),
-                        'result': match.get('result')
-                    },
-                    'statistics': stats
-                }
+                with profiler.phase('transform'):
+                    all_stats[match_id_str] = {
+                        'match_info': {
+                            'matchId': match_id_str,
+                            'homeTeamName': home_team,
+                            'awayTeamName': away_team,
+                            'homeScore': home_score,
+                            'awayScore': away_score,
+                            'startDate': match.get('startDate'),
+                            'tournamentName': match.get('tournamentName'),
+                            'result': match.get('result')
+                        },
+                        'statistics': stats
+                    }
                 successful_fetches += 1
                 
                 # Show some key stats
@@ -113,55 +164,55 @@ def main():
                     away_fg_pct = end_stats.get('awayFieldGoalsPercent', 'N/A')
                     home_assists = end_stats.get('homeAssists', 'N/A')
                     away_assists = end_stats.get('awayAssists', 'N/A')
-                    print(f"  → FG%: {home_fg_pct}% vs {away_fg_pct}%, Assists: {home_assists} vs {away_assists}")
+                    logger.debug("  → FG%%: %s%% vs %s%%, Assists: %s vs %s",
+                                 home_fg_pct, away_fg_pct, home_assists, away_assists)
             else:
                 failed_fetches += 1
-                print(f"  → Failed to fetch statistics")
+                logger.debug("  → Failed to fetch statistics")
+            progress.update()
+        
+        progress.close()
         
         # Save results
         if all_stats:
-            fetcher.save_stats_to_file(all_stats, args.output)
+            with profiler.phase('enrich'):
+                enrich_batch(all_stats)
+            fetcher.save_stats_to_file(all_stats, args.output,
+                                       compress=args.compress, compress_level=args.compress_level)
         
-        print(f"\nDemo Results:")
-        print(f"  Successful: {successful_fetches}")
-        print(f"  Failed: {failed_fetches}")
-        print(f"  Total processed: {len(subset_matches)}")
+        logger.info(
+            "\nDemo Results:\n"
+            "  Successful: %d\n"
+            "  Failed: %d\n"
+            "  Total processed: %d",
+            successful_fetches, failed_fetches, len(subset_matches)
+        )
         
         if successful_fetches > 0:
-            print(f"  Output file: {args.output}")
+            logger.info("  Output file: %s", args.output)
             
             # Show sample statistics structure
             sample_match_id = list(all_stats.keys())[0]
             sample_stats = all_stats[sample_match_id]['statistics']
             periods = [key for key in sample_stats.keys() if key != 'metadata']
-            print(f"  Available periods: {', '.join(periods)}")
+            logger.info("  Available periods: %s", ', '.join(periods))
             
             if 'endMatch' in sample_stats:
-                end_match = sample_stats['endMatch']
-                stat_categories = [
-                    'Points', 'FieldGoals', 'FreeThrows', '3Pointers', 
-                    'Rebounds', 'Assists', 'Steals', 'Blocks', 'Turnovers'
-                ]
-                available_stats = []
-                for category in stat_categories:
-                    home_key = f'home{category}'
-                    away_key = f'away{category}'
-                    if any(key.startswith(home_key) or key.startswith(away_key) for key in end_match.keys()):
-                        available_stats.append(category)
-                
-                print(f"  Available stat categories: {', '.join(available_stats)}")
+                available_stats = available_stat_categories(sample_stats['endMatch'])
+                logger.info("  Available stat categories: %s", ', '.join(available_stats))
     
     except FileNotFoundError:
-        print(f"Error: Matches file '{args.matches_file}' not found.")
+        logger.error("Error: Matches file '%s' not found.", args.matches_file)
     except json.JSONDecodeError as e:
-        print(f"Error parsing matches file '{args.matches_file}': {e}")
+        logger.error("Error parsing matches file '%s': %s", args.matches_file, e)
     except KeyboardInterrupt:
-        print("\nOperation cancelled by user.")
+        logger.warning("\nOperation cancelled by user.")
     except Exception as e:
-        print(f"Unexpected error: {e}")
-        if args.verbose:
-            import traceback
-            traceback.print_exc()
+        logger.error("Unexpected error: %s", e, exc_info=args.verbose)
+    finally:
+        if profiler.enabled:
+            profile_output = args.profile_output or f"{os.path.splitext(strip_compression_extension(args.output))[0]}_profile.txt"
+            profiler.save_report(profile_output)
 
 
 if __name__ == '__main__':
@@ -60,16 +60,29 @@ def main():
         "--verbose"
     ])
     
-    # Example 4: Using a custom authentication token
-    print("\n4. Using a custom authentication token:")
+    # Example 4: Several tournaments in one run (shared session and token)
+    print("\n4. Several tournaments in one run:")
+    run_command([
+        sys.executable, "fetch_completed_matches.py",
+        "--tournament-id", "1", "2",
+        "--split-output",
+        "--output", "h2hggl_data/tournament_matches.json",
+        "--verbose"
+    ])
+    
+    # Example 5: Using a custom authentication token
+    print("\n5. Using a custom authentication token:")
     run_command([
         sys.executable, "fetch_completed_matches.py",
         "--auth-token", "your_custom_token_here",
         "--verbose"
     ])
     
-    # Example 5: Show help
-    print("\n5. Help information:")
+    # Many fetches at once: run_jobs.py runs a JSON/YAML job list in one process
+    # with one session, token and cache instead of one subprocess per fetch
+    
+    # Example 6: Show help
+    print("\n6. Help information:")
     run_command([sys.executable, "fetch_completed_matches.py", "--help"])
     
     print("\n" + "="*60)
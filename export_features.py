@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Feature Matrix Export
+
+This script turns match statistics files into a dense float32 matrix for
+model training: one row per match, one column per numeric home*/away*
+field of every period (quarter1-4, endMatch), followed by label columns
+(label_home_win, label_home_score, label_away_score, label_margin).
+
+Output, for --output h2hggl_data/features/matches.f32:
+
+    matches.f32        raw little-endian float32, row-major, rows x columns
+    matches.f32.json   manifest: columns, rows, dtype, shape
+    matches.f32.ids    matchId of each row, one per line
+
+The matrix file has no header, so it maps straight into memory:
+
+    manifest = json.load(open('matches.f32.json'))
+    X = numpy.memmap('matches.f32', dtype='<f4', mode='r', shape=tuple(manifest['shape']))
+
+Inputs are streamed and written in chunks of --chunk-size rows. The
+first chunk fixes the columns: every stat field present in it, numeric
+or null. Null and missing values are NaN. Runs append to an existing
+matrix (its column set is kept; fields it lacks are NaN) and skip
+matches already exported, so new matches never require a rebuild. A
+record with fields outside the column set is logged as a warning; use
+--rebuild to start over with fresh columns.
+
+Usage:
+    python export_features.py h2hggl_data/completed_matches_statistics.json
+    python export_features.py h2hggl_data/*_statistics.json --output h2hggl_data/features/matches.f32
+    python export_features.py h2hggl_data/compacted/match_statistics.json --rebuild
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from data_io import iter_match_statistics
+from logging_utils import ProgressReporter, add_logging_arguments, setup_logging_from_args
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEATURES_FILE = 'h2hggl_data/features/matches.f32'
+MANIFEST_VERSION = 1
+DEFAULT_CHUNK_SIZE = 2048
+
+PERIODS = ('quarter1', 'quarter2', 'quarter3', 'quarter4', 'endMatch')
+LABEL_COLUMNS = ('label_home_win', 'label_home_score', 'label_away_score', 'label_margin')
+
+# Numeric fields that identify rather than measure
+_EXCLUDED_SUFFIXES = ('Id', 'Name')
+
+_NAN = float('nan')
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def feature_fields(statistics: Dict) -> List[str]:
+    """Return the 'period.field' names of every home*/away* stat in a record that is numeric or null."""
+    fields = []
+    for period in PERIODS:
+        values = (statistics or {}).get(period) or {}
+        for field, value in values.items():
+            if not field.startswith(('home', 'away')) or field.endswith(_EXCLUDED_SUFFIXES):
+                continue
+            # A null stat still names a column; its value is encoded as NaN
+            if value is None or _is_number(value):
+                fields.append(f'{period}.{field}')
+    return fields
+
+
+def labels(record: Dict) -> Tuple[float, float, float, float]:
+    """(home win 1/0.5/0, home score, away score, margin) from match_info, or the endMatch period."""
+    match_info = record.get('match_info') or {}
+    end_match = (record.get('statistics') or {}).get('endMatch') or {}
+    home_score = match_info.get('homeScore')
+    if home_score is None:
+        home_score = end_match.get('homePoints')
+    away_score = match_info.get('awayScore')
+    if away_score is None:
+        away_score = end_match.get('awayPoints')
+    try:
+        home_score, away_score = float(home_score), float(away_score)
+    except (TypeError, ValueError):
+        return _NAN, _NAN, _NAN, _NAN
+
+    result = match_info.get('result')
+    if result == 'home_win' or (result is None and home_score > away_score):
+        home_win = 1.0
+    elif result == 'away_win' or (result is None and home_score < away_score):
+        home_win = 0.0
+    else:
+        home_win = 0.5
+    return home_win, home_score, away_score, home_score - away_score
+
+
+class FeatureMatrix:
+    """Appendable float32 matrix file with a JSON manifest and a row ID file."""
+
+    def __init__(self, path: str = DEFAULT_FEATURES_FILE):
+        self.path = path
+        self.manifest_path = f'{path}.json'
+        self.ids_path = f'{path}.ids'
+        self.columns: List[str] = []
+        self.rows = 0
+        self._column_index: Dict[str, int] = {}
+        self._period_fields: List[Tuple[str, str, int]] = []
+        # Fields seen in records but missing from the column set, warned about once each
+        self._unknown_fields: set = set()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        if manifest.get('version') != MANIFEST_VERSION or manifest.get('dtype') != '<f4':
+            raise ValueError(f"Feature manifest '{self.manifest_path}' has an unknown format; use --rebuild")
+        self._set_columns(manifest['columns'])
+        self.rows = manifest['rows']
+        self._truncate_to_manifest()
+
+    def _set_columns(self, columns: List[str]) -> None:
+        self.columns = list(columns)
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+        self._period_fields = [(name.partition('.')[0], name.partition('.')[2], i)
+                               for i, name in enumerate(self.columns) if '.' in name]
+
+    def _truncate_to_manifest(self) -> None:
+        """Drop rows an interrupted run wrote after the manifest was last saved."""
+        expected = self.rows * len(self.columns) * 4
+        if os.path.exists(self.path) and os.path.getsize(self.path) > expected:
+            with open(self.path, 'r+b') as f:
+                f.truncate(expected)
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, 'r', encoding='utf-8') as f:
+                ids = f.read().splitlines()
+            if len(ids) > self.rows:
+                with open(self.ids_path, 'w', encoding='utf-8') as f:
+                    f.writelines(f'{match_id}\n' for match_id in ids[:self.rows])
+
+    def exported_ids(self) -> set:
+        if not os.path.exists(self.ids_path):
+            return set()
+        with open(self.ids_path, 'r', encoding='utf-8') as f:
+            return set(f.read().splitlines())
+
+    def reset(self) -> None:
+        for path in (self.path, self.ids_path, self.manifest_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.columns, self.rows = [], 0
+        self._set_columns([])
+
+    def _save_manifest(self) -> None:
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'dtype': '<f4',
+            'order': 'C',
+            'rows': self.rows,
+            'shape': [self.rows, len(self.columns)],
+            'columns': self.columns,
+            'label_columns': list(LABEL_COLUMNS),
+            'ids_file': os.path.basename(self.ids_path),
+            'updated_at': datetime.now().isoformat(),
+        }
+        tmp_path = f'{self.manifest_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _check_fields(self, match_id: str, statistics: Dict) -> None:
+        unknown = [field for field in feature_fields(statistics)
+                   if field not in self._column_index and field not in self._unknown_fields]
+        if unknown:
+            self._unknown_fields.update(unknown)
+            logger.warning("Match %s has %d field(s) outside the matrix columns, which are not exported: %s "
+                           "(use --rebuild to add them)", match_id, len(unknown), ', '.join(unknown))
+
+    def _encode(self, record: Dict) -> array:
+        row = array('f', [_NAN]) * len(self.columns)
+        statistics = record.get('statistics') or {}
+        for period, field, index in self._period_fields:
+            value = (statistics.get(period) or {}).get(field)
+            if _is_number(value):
+                row[index] = value
+        for name, value in zip(LABEL_COLUMNS, labels(record)):
+            row[self._column_index[name]] = value
+        return row
+
+    def append(self, records: Iterable[Tuple[str, Dict]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+               progress: Optional[ProgressReporter] = None) -> int:
+        """Append (match_id, record) pairs not exported yet. Returns the number of rows added."""
+        seen = self.exported_ids()
+        records = iter(records)
+        added = 0
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        while True:
+            chunk = []
+            for match_id, record in records:
+                if progress:
+                    progress.update()
+                if match_id in seen or not record.get('statistics'):
+                    continue
+                seen.add(match_id)
+                chunk.append((match_id, record))
+                if len(chunk) >= chunk_size:
+                    break
+            if not chunk:
+                break
+
+            if not self.columns:
+                # The first chunk fixes the column set for every later append
+                fields = dict.fromkeys(field for _, record in chunk for field in feature_fields(record['statistics']))
+                self._set_columns(sorted(fields, key=_column_order) + list(LABEL_COLUMNS))
+
+            block = array('f')
+            for match_id, record in chunk:
+                self._check_fields(match_id, record['statistics'])
+                block.extend(self._encode(record))
+            if sys.byteorder == 'big':
+                block.byteswap()
+
+            with open(self.path, 'ab') as f:
+                block.tofile(f)
+            with open(self.ids_path, 'a', encoding='utf-8') as f:
+                f.writelines(f'{match_id}\n' for match_id, _ in chunk)
+            self.rows += len(chunk)
+            added += len(chunk)
+            self._save_manifest()
+
+        return added
+
+    def read_rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[array]:
+        """Yield rows [start, stop) as float32 arrays without loading the whole file."""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        width = len(self.columns)
+        with open(self.path, 'rb') as f:
+            f.seek(start * width * 4)
+            for _ in range(start, stop):
+                row = array('f')
+                row.fromfile(f, width)
+                if sys.byteorder == 'big':
+                    row.byteswap()
+                yield row
+
+
+def _column_order(name: str) -> Tuple[int, str]:
+    period, _, field = name.partition('.')
+    return PERIODS.index(period), field
+
+
+def iter_statistics_records(paths: List[str]) -> Iterator[Tuple[str, Dict]]:
+    """Stream (match_id, record) pairs from batch statistics files."""
+    for path in paths:
+        for match_id, record in iter_match_statistics(path):
+            match_info = record.get('match_info') or {}
+            yield str(match_info.get('matchId') or match_id), record
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(
+        description='Export match statistics to a memory-mappable float32 feature matrix',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python export_features.py h2hggl_data/completed_matches_statistics.json
+  python export_features.py h2hggl_data/*_statistics.json --output h2hggl_data/features/matches.f32
+  python export_features.py h2hggl_data/compacted/match_statistics.json --rebuild
+        """
+    )
+
+    parser.add_argument('files', nargs='+', metavar='FILE', help='Match statistics files (plain, .gz or .zst)')
+    parser.add_argument(
+        '--output',
+        default=DEFAULT_FEATURES_FILE,
+        help=f'Matrix file; the manifest and row IDs are written next to it (default: {DEFAULT_FEATURES_FILE})'
+    )
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Rows encoded and written per chunk (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Discard the existing matrix and choose columns afresh')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+
+    add_logging_arguments(parser)
+
+    return parser.parse_args()
+
+
+def main():
+    """Main function to export the feature matrix."""
+
+    args = parse_arguments()
+    setup_logging_from_args(args)
+
+    try:
+        matrix = FeatureMatrix(args.output)
+    except (ValueError, KeyError) as e:
+        logger.error("Error: %s", e)
+        return 1
+    if args.rebuild:
+        matrix.reset()
+
+    rows_before = matrix.rows
+    progress = ProgressReporter(label="Exporting", unit="matches")
+    try:
+        added = matrix.append(iter_statistics_records(args.files), chunk_size=max(args.chunk_size, 1),
+                              progress=progress)
+    except FileNotFoundError as e:
+        logger.error("Error: Statistics file '%s' not found.", e.filename)
+        return 1
+    except (OSError, ValueError) as e:
+        logger.error("Error reading statistics: %s", e)
+        return 1
+    finally:
+        progress.close()
+
+    logger.info(
+        "\nSummary:\n"
+        "  Rows added: %d\n"
+        "  Rows total: %d (was %d)\n"
+        "  Columns: %d (%d labels)\n"
+        "  Matrix file: %s",
+        added, matrix.rows, rows_before, len(matrix.columns), len(LABEL_COLUMNS), args.output,
+        extra={'fields': {
+            'event': 'summary',
+            'added': added,
+            'rows': matrix.rows,
+            'columns': len(matrix.columns),
+            'path': args.output
+        }}
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,6 +9,7 @@ Usage:
     python fetch_auth_token.py
     python fetch_auth_token.py --headless
     python fetch_auth_token.py --output custom_token.json
+    python fetch_auth_token.py --headless --if-expired
 
 Requires:
     - selenium library for browser automation
@@ -21,18 +22,7 @@ import time
 from pathlib import Path
 from typing import Optional
 
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.options import Options
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.common.exceptions import TimeoutException, WebDriverException
-except ImportError:
-    print("Error: selenium library not found. Install with: pip install selenium")
-    print("Also ensure Chrome/Chromium browser is installed")
-    exit(1)
+from token_cache import load_cached_token
 
 
 class H2HTokenFetcher:
@@ -46,6 +36,16 @@ class H2HTokenFetcher:
     
     def fetch_token(self) -> Optional[str]:
         """Navigate to H2HGGL website and extract auth token from local storage."""
+        # selenium takes a long time to import, so load it only when a browser is needed
+        try:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+            from selenium.common.exceptions import TimeoutException, WebDriverException
+        except ImportError:
+            print("Error: selenium library not found. Install with: pip install selenium")
+            print("Also ensure Chrome/Chromium browser is installed")
+            exit(1)
+        
         driver = None
         try:
             # Setup Chrome options
@@ -149,9 +149,18 @@ def main():
         default="auth_token.json",
         help="Output file for the token (default: auth_token.json)"
     )
+    parser.add_argument(
+        "--if-expired",
+        action="store_true",
+        help="Only start the browser if the saved token is missing or about to expire"
+    )
     
     args = parser.parse_args()
     
+    if args.if_expired and load_cached_token(args.output):
+        print(f"Saved token in {args.output} is still valid")
+        return 0
+    
     # Create fetcher and get token
     fetcher = H2HTokenFetcher(headless=args.headless, timeout=args.timeout * 1000)
     token = fetcher.fetch_token()
@@ -9,6 +9,8 @@ Usage:
     python fetch_completed_matches.py
     python fetch_completed_matches.py --from "2025-04-29 04:00" --to "2025-04-30 03:59"
     python fetch_completed_matches.py --tournament-id 1 --output matches.json
+    python fetch_completed_matches.py --tournament-id 1 2 --split-output
+    python fetch_completed_matches.py --tournament-id all
 
 Requires:
     - requests library for HTTP requests
@@ -17,26 +19,52 @@ Requires:
 
 import argparse
 import json
+import logging
 import os
-import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Union
 from urllib.parse import quote
 
-try:
-    import requests
-except ImportError:
-    print("Error: requests library not found. Install with: pip install requests")
-    sys.exit(1)
+from data_io import add_compression_arguments, strip_compression_extension, with_compression_extension, write_json
+from form_stats import DEFAULT_FORM_DB, update_form
+from http_transport import add_transport_arguments, create_session, set_pool_size
+from logging_utils import ProgressReporter, add_logging_arguments, setup_logging_from_args
+from match_ids import DEFAULT_ID_INDEX_FILE, MatchIdIndex
+from matchup_index import DEFAULT_INDEX_FILE, update_matchup_index
+from memory_trace import MemoryTracer, add_memory_arguments, memory_tracer_from_args
+from partitions import DEFAULT_PARTITION_DIR, update_partitions
+from profiling import PhaseProfiler
+from ratings import DEFAULT_RATINGS_DIR, update_ratings
+from rollups import DEFAULT_ROLLUP_DB, update_rollups
+from token_cache import TokenManager
+
+logger = logging.getLogger(__name__)
+
+# Tournaments fetched by "--tournament-id all"
+KNOWN_TOURNAMENT_IDS = [1, 2]
 
 
 class H2HMatchFetcher:
     """Fetches completed match data from H2H GG League API."""
     
-    def __init__(self, base_url: str = "https://api-sis-stats.hudstats.com/v1"):
+    def __init__(self, base_url: str = "https://api-sis-stats.hudstats.com/v1",
+                 profiler: Optional[PhaseProfiler] = None,
+                 transport: Optional[str] = None,
+                 memory: Optional[MemoryTracer] = None,
+                 session=None,
+                 tokens: Optional[TokenManager] = None):
         self.base_url = base_url
-        self.session = requests.Session()
+        # An existing session shares its connection pool with other clients
+        self.session = session if session is not None else create_session(transport)
+        self.profiler = profiler or PhaseProfiler()
+        self.memory = memory or MemoryTracer()
+        
+        # Resolved on the first request; shared with other clients so a 401 is refreshed once
+        self.tokens = tokens or TokenManager(self.refresh_auth_token)
+        # Tournaments whose fetch raised in the last fetch_tournaments call
+        self.failed_tournaments: List[int] = []
         
         # Set default headers
         self.session.headers.update({
@@ -47,13 +75,20 @@ class H2HMatchFetcher:
     
     def set_auth_token(self, token: str) -> None:
         """Set authentication token if required."""
-        self.session.headers.update({'Authorization': f'Bearer {token}'})
+        self.tokens.set(token)
     
     def refresh_auth_token(self, verbose: bool = False) -> Optional[str]:
         """Fetch a new authentication token using the token fetcher script."""
+        with self.profiler.phase('auth'):
+            return self._run_token_fetcher(verbose)
+    
+    def _run_token_fetcher(self, verbose: bool = False) -> Optional[str]:
+        """Run the token fetcher script and read the token it saved."""
+        # Only needed when the token has to be refreshed
+        import subprocess
+        
         try:
-            if verbose:
-                print("Attempting to fetch new authentication token...")
+            logger.debug("Attempting to fetch new authentication token...")
             
             # Run the token fetcher script
             result = subprocess.run(
@@ -71,30 +106,24 @@ class H2HMatchFetcher:
                     
                     new_token = token_data.get('token')
                     if new_token:
-                        if verbose:
-                            print("Successfully fetched new token")
+                        logger.debug("Successfully fetched new token")
                         return new_token
                     else:
-                        if verbose:
-                            print("Token file exists but no token found")
+                        logger.debug("Token file exists but no token found")
                         return None
                         
                 except (FileNotFoundError, json.JSONDecodeError) as e:
-                    if verbose:
-                        print(f"Error reading token file: {e}")
+                    logger.debug("Error reading token file: %s", e)
                     return None
             else:
-                if verbose:
-                    print(f"Token fetcher script failed: {result.stderr}")
+                logger.debug("Token fetcher script failed: %s", result.stderr)
                 return None
                 
         except subprocess.TimeoutExpired:
-            if verbose:
-                print("Token fetcher script timed out")
+            logger.debug("Token fetcher script timed out")
             return None
         except Exception as e:
-            if verbose:
-                print(f"Error running token fetcher: {e}")
+            logger.debug("Error running token fetcher: %s", e)
             return None
     
     def format_datetime(self, dt_str: str) -> str:
@@ -135,100 +164,162 @@ class H2HMatchFetcher:
         }
         
         try:
-            if verbose:
-                print(f"Fetching page {page} from {from_date} to {to_date}...")
-            else:
-                print(f"Fetching page {page} from {from_date} to {to_date}...")
+            logger.debug("Fetching page %d from %s to %s...", page, from_date, to_date)
             
-            response = self.session.get(url, params=params, timeout=30)
+            token_used = self.tokens.get()
+            with self.profiler.phase('pagination'):
+                response = self.session.get(url, params=params, timeout=30,
+                                            headers={'Authorization': f'Bearer {token_used}'})
             
             # Check for authentication errors
             if response.status_code == 401:
-                error_text = response.text.lower()
-                auth_error_detected = (
-                    'unauthenticated' in error_text or 
-                    'authentication' in error_text or
-                    'api key' in error_text or
-                    'authentication token' in error_text
-                )
-                
-                if auth_error_detected and retry_on_auth_fail:
-                    print("Authentication failed. Attempting to fetch new token...")
-                    
-                    # Try to get a new token
-                    new_token = self.refresh_auth_token(verbose=verbose)
+                if retry_on_auth_fail and self.tokens.refresh_after_rejection(token_used, response.text):
+                    logger.info("Retrying request with new token...")
                     
-                    if new_token:
-                        # Update the session with the new token
-                        self.set_auth_token(new_token)
-                        print("Retrying request with new token...")
-                        
-                        # Retry the request with the new token (no retry to avoid infinite loop)
-                        return self.fetch_matches_page(
-                            from_date, to_date, tournament_id, page, page_size, 
-                            verbose, retry_on_auth_fail=False
-                        )
-                    else:
-                        print("Failed to obtain new authentication token.")
-                        print("Error: Authentication required. The API returned 'Unauthenticated'.")
-                        print("Please check if you need to provide an API key or authentication token.")
-                        return None
-                else:
-                    print("Error: Authentication required. The API returned 'Unauthenticated'.")
-                    print("Please check if you need to provide an API key or authentication token.")
-                    return None
+                    # Retry the request with the new token (no retry to avoid infinite loop)
+                    return self.fetch_matches_page(
+                        from_date, to_date, tournament_id, page, page_size, 
+                        verbose, retry_on_auth_fail=False
+                    )
+                logger.error("Error: Authentication required. The API returned 'Unauthenticated'.")
+                logger.error("Please check if you need to provide an API key or authentication token.")
+                return None
             
             response.raise_for_status()
-            return response.json()
+            with self.profiler.phase('decode'):
+                return response.json()
             
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching data: {e}")
+        except OSError as e:
+            logger.error("Error fetching data: %s", e)
             return None
         except json.JSONDecodeError as e:
-            print(f"Error parsing JSON response: {e}")
+            logger.error("Error parsing JSON response: %s", e)
             return None
     
-    def fetch_all_matches(self, 
-                         from_date: str, 
-                         to_date: str, 
-                         tournament_id: int = 1,
-                         verbose: bool = False) -> List[Dict]:
-        """Fetch all completed matches within the date range."""
+    def iter_pages(self,
+                   from_date: str,
+                   to_date: str,
+                   tournament_id: int = 1,
+                   verbose: bool = False) -> Iterator[Dict]:
+        """Yield each non-empty page response in turn, fetching the next page only when asked for it."""
         
-        all_matches = []
         page = 1
-        
         while True:
             data = self.fetch_matches_page(from_date, to_date, tournament_id, page, verbose=verbose)
             
             if not data or 'data' not in data:
-                break
+                return
             
             matches = data['data']
             if not matches:
-                break
-            
-            all_matches.extend(matches)
+                return
             
             # Check if we have more pages
             last_page = data.get('lastPage', 1)
             current_page = data.get('currentPage', page)
             total = data.get('total', 0)
             
-            print(f"Fetched {len(matches)} matches from page {current_page}/{last_page} (total: {total})")
+            logger.debug(
+                "Fetched %d matches from page %d/%d (total: %d)",
+                len(matches), current_page, last_page, total,
+                extra={'fields': {
+                    'event': 'page_fetched',
+                    'tournament_id': tournament_id,
+                    'page': current_page,
+                    'last_page': last_page,
+                    'count': len(matches),
+                    'total': total
+                }}
+            )
+            yield data
             
             if current_page >= last_page:
-                break
+                return
             
             page += 1
+    
+    def fetch_all_matches(self, 
+                         from_date: str, 
+                         to_date: str, 
+                         tournament_id: int = 1,
+                         verbose: bool = False,
+                         progress: Optional[ProgressReporter] = None) -> List[Dict]:
+        """Fetch all completed matches within the date range."""
+        
+        all_matches = []
+        owns_progress = progress is None
+        if owns_progress:
+            progress = ProgressReporter(label=f"Fetching pages (tournament {tournament_id})", unit="pages")
+        
+        for data in self.iter_pages(from_date, to_date, tournament_id, verbose=verbose):
+            all_matches.extend(data['data'])
+            self.memory.items(len(data['data']))
+            
+            if owns_progress:
+                progress.set_total(data.get('lastPage', 1))
+            progress.update()
         
+        if owns_progress:
+            progress.close()
         return all_matches
     
-    def save_matches_to_file(self, matches: List[Dict], output_file: str) -> None:
-        """Save matches data to a JSON file."""
+    def fetch_tournaments(self,
+                          from_date: str,
+                          to_date: str,
+                          tournament_ids: List[int],
+                          max_workers: int = 4,
+                          verbose: bool = False) -> Dict[int, List[Dict]]:
+        """Fetch completed matches for several tournaments concurrently.
+        
+        All tournaments share this fetcher's session (connection pool) and
+        authentication token. Each returned match carries its tournamentId.
+        """
+        
+        max_workers = max(1, min(max_workers, len(tournament_ids)))
+        
+        # Let every worker keep its own pooled connection to the API host
+        set_pool_size(self.session, max_workers)
         
-        # Ensure the output directory exists
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        progress = ProgressReporter(label=f"Fetching pages ({len(tournament_ids)} tournaments)", unit="pages")
+        results: Dict[int, List[Dict]] = {}
+        self.failed_tournaments = []
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tournament') as executor:
+            futures = {
+                executor.submit(
+                    self.fetch_all_matches, from_date, to_date, tournament_id, verbose, progress
+                ): tournament_id
+                for tournament_id in tournament_ids
+            }
+            
+            for future in as_completed(futures):
+                tournament_id = futures[future]
+                try:
+                    matches = future.result()
+                except Exception as e:
+                    logger.error("Error fetching tournament %s: %s", tournament_id, e)
+                    self.failed_tournaments.append(tournament_id)
+                    matches = []
+                
+                for match in matches:
+                    match.setdefault('tournamentId', tournament_id)
+                
+                results[tournament_id] = matches
+                logger.debug(
+                    "Tournament %s: %d matches", tournament_id, len(matches),
+                    extra={'fields': {'event': 'tournament_fetched', 'tournament_id': tournament_id, 'count': len(matches)}}
+                )
+        
+        progress.close()
+        
+        # Preserve the requested tournament order
+        return {tournament_id: results.get(tournament_id, []) for tournament_id in tournament_ids}
+    
+    def save_matches_to_file(self, matches: List[Dict], output_file: str,
+                             tournament_ids: Optional[List[int]] = None,
+                             compress: Optional[str] = None,
+                             compress_level: Optional[int] = None) -> None:
+        """Save matches data to a JSON file, compressed by extension or explicit choice."""
         
         # Prepare the data structure
         output_data = {
@@ -239,15 +330,20 @@ class H2HMatchFetcher:
             },
             'matches': matches
         }
+        if tournament_ids is not None:
+            output_data['metadata']['tournament_ids'] = tournament_ids
         
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, indent=2, ensure_ascii=False)
+            write_json(output_data, output_file, compress=compress, level=compress_level,
+                       profiler=self.profiler)
             
-            print(f"Successfully saved {len(matches)} matches to {output_file}")
+            logger.info(
+                "Successfully saved %d matches to %s", len(matches), output_file,
+                extra={'fields': {'event': 'saved', 'count': len(matches), 'path': output_file}}
+            )
             
         except IOError as e:
-            print(f"Error saving file: {e}")
+            logger.error("Error saving file: %s", e)
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -261,6 +357,8 @@ Examples:
   python fetch_completed_matches.py
   python fetch_completed_matches.py --from "2025-04-29 04:00" --to "2025-04-30 03:59"
   python fetch_completed_matches.py --tournament-id 2 --output custom_matches.json
+  python fetch_completed_matches.py --tournament-id 1 2 --split-output
+  python fetch_completed_matches.py --tournament-id all --max-workers 4
   python fetch_completed_matches.py --auth-token "your-api-token"
         """
     )
@@ -283,9 +381,22 @@ Examples:
     # Tournament and output arguments
     parser.add_argument(
         '--tournament-id', 
-        type=int, 
-        default=1,
-        help='Tournament ID (default: 1)'
+        nargs='+',
+        default=['1'],
+        help='One or more tournament IDs, or "all" for every known tournament (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--split-output',
+        action='store_true',
+        help='With several tournaments, write one file per tournament instead of a combined file'
+    )
+    
+    parser.add_argument(
+        '--max-workers',
+        type=int,
+        default=4,
+        help='Tournaments fetched concurrently (default: 4)'
     )
     
     parser.add_argument(
@@ -294,82 +405,308 @@ Examples:
         help='Output file path (default: h2hggl_data/completed_matches.json)'
     )
     
+    parser.add_argument(
+        '--matchup-index',
+        default=DEFAULT_INDEX_FILE,
+        help=f'Head-to-head index updated with fetched matches (default: {DEFAULT_INDEX_FILE})'
+    )
+    
+    parser.add_argument(
+        '--no-matchup-index',
+        action='store_true',
+        help='Do not update the head-to-head index'
+    )
+    
+    parser.add_argument(
+        '--id-index',
+        default=DEFAULT_ID_INDEX_FILE,
+        help=f'Match code/matchId/fixtureId index updated with fetched matches (default: {DEFAULT_ID_INDEX_FILE})'
+    )
+    
+    parser.add_argument(
+        '--no-id-index',
+        action='store_true',
+        help='Do not update the match ID index'
+    )
+    
+    parser.add_argument(
+        '--partition-dir',
+        default=DEFAULT_PARTITION_DIR,
+        help=f'League-day/tournament partitions updated with fetched matches (default: {DEFAULT_PARTITION_DIR})'
+    )
+    
+    parser.add_argument(
+        '--no-partitions',
+        action='store_true',
+        help='Do not update the partitioned store'
+    )
+    
+    parser.add_argument(
+        '--form-db',
+        default=DEFAULT_FORM_DB,
+        help=f'Rolling form/streak database updated with fetched matches (default: {DEFAULT_FORM_DB})'
+    )
+    
+    parser.add_argument(
+        '--no-form',
+        action='store_true',
+        help='Do not update the rolling form statistics'
+    )
+    
+    parser.add_argument(
+        '--rollup-db',
+        default=DEFAULT_ROLLUP_DB,
+        help=f'Daily team/tournament rollup database updated with fetched matches (default: {DEFAULT_ROLLUP_DB})'
+    )
+    
+    parser.add_argument(
+        '--no-rollups',
+        action='store_true',
+        help='Do not update the daily rollups'
+    )
+    
+    parser.add_argument(
+        '--ratings-dir',
+        default=DEFAULT_RATINGS_DIR,
+        help=f'Team and player ratings updated with fetched matches (default: {DEFAULT_RATINGS_DIR})'
+    )
+    
+    parser.add_argument(
+        '--no-ratings',
+        action='store_true',
+        help='Do not update the ratings'
+    )
+    
     # Authentication
     parser.add_argument(
         '--auth-token',
-        default='test',
-        help='API authentication token (default: test token to trigger auth refresh)'
+        help='API authentication token (default: cached token from auth_token.json, refreshed if missing or expired)'
     )
     
+    add_transport_arguments(parser)
+    
     # Verbose output
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
-        help='Enable verbose output'
+        help='Enable verbose output (per-page lines)'
     )
     
-    return parser.parse_args()
+    add_logging_arguments(parser)
+    add_compression_arguments(parser)
+    
+    # Profiling
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Time each pipeline phase and write a profile report'
+    )
+    
+    parser.add_argument(
+        '--profile-cprofile',
+        action='store_true',
+        help='Also run cProfile inside each phase (implies --profile)'
+    )
+    
+    parser.add_argument(
+        '--profile-output',
+        help='Profile report path (default: <output>_profile.txt)'
+    )
+    
+    add_memory_arguments(parser)
+    
+    args = parser.parse_args()
+    args.output = with_compression_extension(args.output, args.compress)
+    
+    # Resolve the tournament list
+    if any(value.lower() == 'all' for value in args.tournament_id):
+        args.tournament_ids = list(KNOWN_TOURNAMENT_IDS)
+    else:
+        try:
+            args.tournament_ids = list(dict.fromkeys(int(value) for value in args.tournament_id))
+        except ValueError:
+            parser.error('--tournament-id expects integer IDs or "all"')
+    
+    return args
+
+
+def tournament_output_path(output_file: str, tournament_id: Union[int, str]) -> str:
+    """Derive the per-tournament output path for --split-output."""
+    compressed = output_file[len(strip_compression_extension(output_file)):]
+    base, ext = os.path.splitext(strip_compression_extension(output_file))
+    return f"{base}_tournament_{tournament_id}{ext or '.json'}{compressed}"
 
 
 def main():
     """Main function to execute the match fetching process."""
     
     args = parse_arguments()
+    setup_logging_from_args(args)
     
-    if args.verbose:
-        print(f"Fetching matches from {args.from_date} to {args.to_date}")
-        print(f"Tournament ID: {args.tournament_id}")
-        print(f"Output file: {args.output}")
+    logger.debug("Fetching matches from %s to %s", args.from_date, args.to_date)
+    logger.debug("Tournament ID(s): %s", ', '.join(str(t) for t in args.tournament_ids))
+    logger.debug("Output file: %s", args.output)
     
     # Initialize the fetcher
-    fetcher = H2HMatchFetcher()
+    profiler = PhaseProfiler(
+        enabled=args.profile or args.profile_cprofile,
+        use_cprofile=args.profile_cprofile
+    )
+    memory = memory_tracer_from_args(args)
+    fetcher = H2HMatchFetcher(profiler=profiler, transport=args.transport, memory=memory)
     
-    # Set authentication token (now has default value)
-    fetcher.set_auth_token(args.auth_token)
-    if args.verbose:
-        print("Authentication token set")
+    # Set authentication token (explicit, cached, or freshly fetched)
+    if args.auth_token:
+        fetcher.set_auth_token(args.auth_token)
+    logger.debug("Authentication token set")
     
     # Fetch all matches
     try:
-        matches = fetcher.fetch_all_matches(
-            from_date=args.from_date,
-            to_date=args.to_date,
-            tournament_id=args.tournament_id,
-            verbose=args.verbose
-        )
+        if len(args.tournament_ids) == 1:
+            matches_by_tournament = {
+                args.tournament_ids[0]: fetcher.fetch_all_matches(
+                    from_date=args.from_date,
+                    to_date=args.to_date,
+                    tournament_id=args.tournament_ids[0],
+                    verbose=args.verbose
+                )
+            }
+        else:
+            matches_by_tournament = fetcher.fetch_tournaments(
+                from_date=args.from_date,
+                to_date=args.to_date,
+                tournament_ids=args.tournament_ids,
+                max_workers=args.max_workers,
+                verbose=args.verbose
+            )
+        
+        if fetcher.failed_tournaments:
+            # Partial data would overwrite the output and feed every index with missing tournaments
+            logger.error("Not saving: %d of %d tournaments failed (%s)",
+                         len(fetcher.failed_tournaments), len(args.tournament_ids),
+                         ', '.join(str(t) for t in sorted(fetcher.failed_tournaments)),
+                         extra={'fields': {'event': 'tournaments_failed',
+                                           'tournament_ids': sorted(fetcher.failed_tournaments)}})
+            return 1
+        
+        matches = [match for tournament_matches in matches_by_tournament.values() for match in tournament_matches]
+        memory.checkpoint('fetch')
         
         if not matches:
-            print("No matches found or error occurred during fetching.")
+            logger.warning("No matches found or error occurred during fetching.")
             return
         
         # Save to file
-        fetcher.save_matches_to_file(matches, args.output)
+        save_options = {'compress': args.compress, 'compress_level': args.compress_level}
+        saved_files = []
+        if len(args.tournament_ids) == 1:
+            fetcher.save_matches_to_file(matches, args.output, **save_options)
+            saved_files.append((args.output, matches))
+        elif args.split_output:
+            for tournament_id, tournament_matches in matches_by_tournament.items():
+                if tournament_matches:
+                    tournament_file = tournament_output_path(args.output, tournament_id)
+                    fetcher.save_matches_to_file(
+                        tournament_matches,
+                        tournament_file,
+                        tournament_ids=[tournament_id],
+                        **save_options
+                    )
+                    saved_files.append((tournament_file, tournament_matches))
+        else:
+            # Combined output keeps the API's newest-first order across tournaments
+            matches.sort(key=lambda match: match.get('startDate') or '', reverse=True)
+            fetcher.save_matches_to_file(matches, args.output, tournament_ids=args.tournament_ids, **save_options)
+            saved_files.append((args.output, matches))
+        memory.checkpoint('save')
+        
+        if not args.no_matchup_index:
+            with profiler.phase('index'):
+                update_matchup_index(matches, args.matchup_index)
+        
+        if not args.no_id_index:
+            with profiler.phase('index'):
+                id_index = MatchIdIndex.load(args.id_index)
+                for saved_file, saved_matches in saved_files:
+                    id_index.add_schedule(saved_matches, matches_file=saved_file)
+                id_index.save(args.id_index)
+        
+        if not args.no_partitions:
+            with profiler.phase('index'):
+                update_partitions(args.partition_dir, matches=matches,
+                                  compress=args.compress, compress_level=args.compress_level)
+        
+        if not args.no_ratings:
+            with profiler.phase('index'):
+                update_ratings(matches, args.ratings_dir)
+        
+        if not args.no_form:
+            with profiler.phase('index'):
+                update_form(args.form_db, matches=matches)
+        
+        if not args.no_rollups:
+            with profiler.phase('index'):
+                update_rollups(args.rollup_db, matches=matches)
+        memory.checkpoint('index')
         
         # Print summary
-        print(f"\nSummary:")
-        print(f"  Total matches fetched: {len(matches)}")
-        print(f"  Date range: {args.from_date} to {args.to_date}")
-        print(f"  Tournament ID: {args.tournament_id}")
-        print(f"  Output file: {args.output}")
+        logger.info(
+            "\nSummary:\n"
+            "  Total matches fetched: %d\n"
+            "  Date range: %s to %s\n"
+            "  Tournament ID(s): %s\n"
+            "  Output file: %s",
+            len(matches), args.from_date, args.to_date,
+            ', '.join(str(t) for t in args.tournament_ids),
+            args.output if not (args.split_output and len(args.tournament_ids) > 1)
+            else tournament_output_path(args.output, '<id>'),
+            extra={'fields': {
+                'event': 'summary',
+                'total_matches': len(matches),
+                'from': args.from_date,
+                'to': args.to_date,
+                'tournament_ids': args.tournament_ids,
+                'matches_per_tournament': {
+                    str(tournament_id): len(tournament_matches)
+                    for tournament_id, tournament_matches in matches_by_tournament.items()
+                },
+                'output': args.output
+            }}
+        )
         
-        if args.verbose and matches:
-            print(f"\nSample match data:")
+        if matches:
             sample_match = matches[0]
-            print(f"  Match ID: {sample_match.get('matchId')}")
-            print(f"  Teams: {sample_match.get('homeTeamName')} vs {sample_match.get('awayTeamName')}")
-            print(f"  Score: {sample_match.get('homeScore')} - {sample_match.get('awayScore')}")
-            print(f"  Date: {sample_match.get('startDate')}")
-            print(f"  Tournament: {sample_match.get('tournamentName')}")
-            print(f"  Result: {sample_match.get('result')}")
+            logger.debug(
+                "\nSample match data:\n"
+                "  Match ID: %s\n"
+                "  Teams: %s vs %s\n"
+                "  Score: %s - %s\n"
+                "  Date: %s\n"
+                "  Tournament: %s\n"
+                "  Result: %s",
+                sample_match.get('matchId'),
+                sample_match.get('homeTeamName'), sample_match.get('awayTeamName'),
+                sample_match.get('homeScore'), sample_match.get('awayScore'),
+                sample_match.get('startDate'),
+                sample_match.get('tournamentName'),
+                sample_match.get('result')
+            )
     
     except KeyboardInterrupt:
-        print("\nOperation cancelled by user.")
+        logger.warning("\nOperation cancelled by user.")
     except Exception as e:
-        print(f"Unexpected error: {e}")
-        if args.verbose:
-            import traceback
-            traceback.print_exc()
+        logger.error("Unexpected error: %s", e, exc_info=args.verbose)
+        return 1
+    finally:
+        if profiler.enabled:
+            profile_output = args.profile_output or f"{os.path.splitext(strip_compression_extension(args.output))[0]}_profile.txt"
+            profiler.save_report(profile_output)
+        if memory.enabled:
+            memory.checkpoint('end')
+            memory_output = args.trace_memory_output or f"{os.path.splitext(strip_compression_extension(args.output))[0]}_memory.txt"
+            memory.save_report(memory_output)
+            memory.stop()
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Standings, Player and Comparison Fetcher
+
+This script fetches league standings, player details, upcoming matches and
+player comparisons from the H2H GG League API (see
+project_notes/H2H_GG_LEAGUE_API.md). Responses are cached in memory and on
+disk with a per-endpoint TTL; stale entries are revalidated with
+ETag/Last-Modified so repeated polls are cheap.
+
+Usage:
+    python fetch_league_data.py --standings
+    python fetch_league_data.py --player player123 player456
+    python fetch_league_data.py --upcoming
+    python fetch_league_data.py --compare player123 player456 --output comparison.json
+
+Requires:
+    - requests library for HTTP requests
+    - Valid API authentication (automatically refreshed)
+"""
+
+import argparse
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from data_io import add_compression_arguments, with_compression_extension, write_json
+from fetch_completed_matches import H2HMatchFetcher
+from http_transport import add_transport_arguments, set_pool_size
+from logging_utils import add_logging_arguments, setup_logging_from_args
+from profiling import PhaseProfiler
+from response_cache import DEFAULT_CACHE_DIR, ResponseCache, cache_key
+from token_cache import TokenManager
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached response is served without revalidation
+DEFAULT_TTLS = {
+    'standings': 60,
+    'player': 300,
+    'upcoming': 30,
+    'compare': 300,
+}
+
+
+class H2HLeagueClient(H2HMatchFetcher):
+    """Cached client for the standings, player, schedule and comparison endpoints."""
+
+    def __init__(self, base_url: str = "https://h2hggl.com/api",
+                 league_path: str = "/en/ebasketball",
+                 cache: Optional[ResponseCache] = None,
+                 ttls: Optional[Dict[str, float]] = None,
+                 profiler: Optional[PhaseProfiler] = None,
+                 transport: Optional[str] = None,
+                 tokens: Optional[TokenManager] = None):
+        super().__init__(base_url=base_url, profiler=profiler, transport=transport, tokens=tokens)
+        self.league_path = league_path
+        self.cache = cache if cache is not None else ResponseCache(DEFAULT_CACHE_DIR)
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+
+    def _get_json(self, endpoint: str, path: str, params: Optional[Dict] = None,
+                  verbose: bool = False, retry_on_auth_fail: bool = True) -> Optional[Dict]:
+        """GET a JSON resource through the cache, revalidating stale entries."""
+
+        url = f"{self.base_url}{self.league_path}{path}"
+        key = cache_key(url, params)
+        entry = self.cache.get(key)
+
+        if entry is not None and self.cache.is_fresh(entry, self.ttls[endpoint]):
+            self.cache.record('hits')
+            logger.debug("Cache hit for %s", key)
+            return entry['body']
+
+        try:
+            logger.debug("Fetching %s...", key)
+
+            token_used = self.tokens.get()
+            headers = self.cache.conditional_headers(entry)
+            headers['Authorization'] = f'Bearer {token_used}'
+            with self.profiler.phase(endpoint):
+                response = self.session.get(url, params=params, headers=headers, timeout=30)
+
+            if response.status_code == 304 and entry is not None:
+                self.cache.record('revalidated')
+                logger.debug("Not modified: %s", key)
+                return self.cache.touch(key, entry)['body']
+
+            # Check for authentication errors
+            if response.status_code == 401:
+                if retry_on_auth_fail and self.tokens.refresh_after_rejection(token_used, response.text):
+                    logger.info("Retrying request with new token...")
+                    return self._get_json(endpoint, path, params, verbose, retry_on_auth_fail=False)
+                logger.error("Error: Authentication required. The API returned 'Unauthenticated'.")
+                return None
+
+            if response.status_code == 404:
+                logger.warning("Resource not found: %s", key)
+                return None
+
+            response.raise_for_status()
+            with self.profiler.phase('decode'):
+                body = response.json()
+
+            self.cache.record('misses')
+            self.cache.put(key, body, response.headers)
+            return body
+
+        except OSError as e:
+            if entry is not None:
+                # Serve the stale copy rather than nothing when the API is unreachable
+                logger.warning("Error fetching %s (%s); serving cached copy", key, e)
+                return entry['body']
+            logger.error("Error fetching %s: %s", key, e)
+            return None
+        except json.JSONDecodeError as e:
+            logger.error("Error parsing JSON response for %s: %s", key, e)
+            return None
+
+    def fetch_standings(self, verbose: bool = False) -> Optional[Dict]:
+        """Fetch the league standings."""
+        return self._get_json('standings', '/standings', verbose=verbose)
+
+    def fetch_player(self, player_id: str, verbose: bool = False) -> Optional[Dict]:
+        """Fetch details for one player."""
+        return self._get_json('player', f'/player/{player_id}', verbose=verbose)
+
+    def fetch_players(self, player_ids: List[str], max_workers: int = 8,
+                      verbose: bool = False) -> Dict[str, Optional[Dict]]:
+        """Fetch many players concurrently over the shared session and cache."""
+        player_ids = list(dict.fromkeys(str(player_id) for player_id in player_ids))
+        if not player_ids:
+            return {}
+
+        max_workers = max(1, min(max_workers, len(player_ids)))
+        set_pool_size(self.session, max_workers)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='player') as executor:
+            results = executor.map(lambda player_id: self.fetch_player(player_id, verbose), player_ids)
+            return dict(zip(player_ids, results))
+
+    def fetch_upcoming(self, verbose: bool = False) -> Optional[Dict]:
+        """Fetch the upcoming match schedule."""
+        return self._get_json('upcoming', '/schedule', verbose=verbose)
+
+    def compare_players(self, player1_id: str, player2_id: str, verbose: bool = False) -> Optional[Dict]:
+        """Fetch the head-to-head comparison of two players."""
+        return self._get_json('compare', f'/comparePlayers/{player1_id}/{player2_id}', verbose=verbose)
+
+    def save_league_data(self, data: Dict, output_file: str, endpoint: str,
+                         compress: Optional[str] = None, compress_level: Optional[int] = None) -> None:
+        """Save fetched league data to a JSON file (compressed if the path ends in .gz/.zst)."""
+
+        output_data = {
+            'metadata': {
+                'fetched_at': datetime.now().isoformat(),
+                'api_endpoint': f"{self.base_url}{self.league_path}/{endpoint}",
+                'cache': self.cache.stats()
+            },
+            'data': data
+        }
+
+        try:
+            write_json(output_data, output_file, compress=compress, level=compress_level, profiler=self.profiler)
+
+            logger.info("Successfully saved %s data to %s", endpoint, output_file)
+
+        except IOError as e:
+            logger.error("Error saving file: %s", e)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(
+        description='Fetch standings, players, upcoming matches and comparisons from H2H GG League API',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python fetch_league_data.py --standings
+  python fetch_league_data.py --player player123 player456 --max-workers 8
+  python fetch_league_data.py --upcoming --ttl 10
+  python fetch_league_data.py --compare player123 player456
+        """
+    )
+
+    endpoint_group = parser.add_mutually_exclusive_group(required=True)
+    endpoint_group.add_argument('--standings', action='store_true', help='Fetch league standings')
+    endpoint_group.add_argument('--player', nargs='+', metavar='PLAYER_ID', help='Fetch one or more players')
+    endpoint_group.add_argument('--upcoming', action='store_true', help='Fetch upcoming matches')
+    endpoint_group.add_argument('--compare', nargs=2, metavar=('PLAYER1_ID', 'PLAYER2_ID'),
+                                help='Compare two players')
+
+    parser.add_argument(
+        '--output',
+        help='Output file path (default: h2hggl_data/<endpoint>.json)'
+    )
+
+    parser.add_argument(
+        '--cache-dir',
+        default=DEFAULT_CACHE_DIR,
+        help=f'On-disk response cache directory (default: {DEFAULT_CACHE_DIR})'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always fetch from the API (responses are still cached for later runs)'
+    )
+
+    parser.add_argument(
+        '--ttl',
+        type=float,
+        help='Override the cache TTL in seconds for this endpoint'
+    )
+
+    parser.add_argument(
+        '--max-workers',
+        type=int,
+        default=8,
+        help='Concurrent requests when fetching several players (default: 8)'
+    )
+
+    parser.add_argument(
+        '--auth-token',
+        help='API authentication token (default: cached token from auth_token.json, refreshed if missing or expired)'
+    )
+
+    add_transport_arguments(parser)
+
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        help='Enable verbose output'
+    )
+
+    add_compression_arguments(parser)
+    add_logging_arguments(parser)
+
+    return parser.parse_args()
+
+
+def main():
+    """Main function to execute the league data fetching process."""
+
+    args = parse_arguments()
+    setup_logging_from_args(args)
+
+    if args.standings:
+        endpoint = 'standings'
+    elif args.player:
+        endpoint = 'player'
+    elif args.upcoming:
+        endpoint = 'upcoming'
+    else:
+        endpoint = 'compare'
+
+    ttls = {}
+    if args.no_cache:
+        ttls[endpoint] = 0
+    elif args.ttl is not None:
+        ttls[endpoint] = args.ttl
+
+    client = H2HLeagueClient(cache=ResponseCache(args.cache_dir), ttls=ttls, transport=args.transport)
+    if args.auth_token:
+        client.set_auth_token(args.auth_token)
+
+    output = with_compression_extension(args.output or f'h2hggl_data/{endpoint}.json', args.compress)
+
+    try:
+        if args.standings:
+            data = client.fetch_standings(verbose=args.verbose)
+        elif args.player:
+            data = client.fetch_players(args.player, max_workers=args.max_workers, verbose=args.verbose)
+            if not any(data.values()):
+                data = None
+        elif args.upcoming:
+            data = client.fetch_upcoming(verbose=args.verbose)
+        else:
+            data = client.compare_players(args.compare[0], args.compare[1], verbose=args.verbose)
+
+        if data is None:
+            logger.warning("No data found or error occurred during fetching.")
+            return
+
+        client.save_league_data(data, output, endpoint, compress=args.compress,
+                                compress_level=args.compress_level)
+
+        cache_stats = client.cache.stats()
+        logger.info(
+            "\nSummary:\n"
+            "  Endpoint: %s\n"
+            "  Cache: %d hits, %d revalidated, %d fetched\n"
+            "  Output file: %s",
+            endpoint, cache_stats['hits'], cache_stats['revalidated'], cache_stats['misses'], output,
+            extra={'fields': {'event': 'summary', 'endpoint': endpoint, 'cache': cache_stats, 'output': output}}
+        )
+
+    except KeyboardInterrupt:
+        logger.warning("\nOperation cancelled by user.")
+    except Exception as e:
+        logger.error("Unexpected error: %s", e, exc_info=args.verbose)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ Usage:
     python fetch_match_stats.py --match-id NB125120625
     python fetch_match_stats.py --matches-file completed_matches.json
     python fetch_match_stats.py --match-id NB125120625 --output stats.json
+    python fetch_match_stats.py --match-id 233406 --refetch
 
 Requires:
     - requests library for HTTP requests
@@ -17,26 +18,74 @@ Requires:
 
 import argparse
 import json
+import logging
 import os
-import subprocess
 import sys
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 from urllib.parse import quote
 
-try:
-    import requests
-except ImportError:
-    print("Error: requests library not found. Install with: pip install requests")
-    sys.exit(1)
+from data_io import (add_compression_arguments, iter_matches, strip_compression_extension,
+                     with_compression_extension, write_json)
+from form_stats import DEFAULT_FORM_DB, update_form
+from http_transport import add_transport_arguments, create_session
+from logging_utils import ProgressReporter, add_logging_arguments, setup_logging_from_args
+from match_ids import DEFAULT_ID_INDEX_FILE, MatchIdIndex, ids_from_statistics
+from match_metrics import derive_match_metrics, enrich_batch
+from matchup_index import DEFAULT_INDEX_FILE, update_matchup_index
+from memory_trace import MemoryTracer, add_memory_arguments, memory_tracer_from_args
+from partitions import DEFAULT_PARTITION_DIR, update_partitions
+from profiling import PhaseProfiler
+from refetch import DEFAULT_REFETCH_DB, RefetchQueue, update_refetch_queue
+from rollups import DEFAULT_ROLLUP_DB, update_rollups
+from time_budget import (TimeBudget, default_remainder_file, load_remainder, merge_matches, parse_duration,
+                         prioritize, save_remainder)
+from token_cache import TokenManager
+
+logger = logging.getLogger(__name__)
+
+
+def match_info_from_schedule(match: Dict) -> Dict:
+    """Build the 'match_info' block stored with a match's statistics from its schedule row."""
+    return {
+        'matchId': str(match.get('matchId')),
+        'homeTeamName': match.get('homeTeamName'),
+        'awayTeamName': match.get('awayTeamName'),
+        'homeParticipantName': match.get('homeParticipantName'),
+        'awayParticipantName': match.get('awayParticipantName'),
+        'homeScore': match.get('homeScore'),
+        'awayScore': match.get('awayScore'),
+        'startDate': match.get('startDate'),
+        'tournamentId': match.get('tournamentId'),
+        'tournamentName': match.get('tournamentName')
+    }
 
 
 class H2HMatchStatsFetcher:
     """Fetches detailed match statistics from H2H GG League API."""
     
-    def __init__(self, base_url: str = "https://api-sis-stats.hudstats.com/v1"):
+    def __init__(self, base_url: str = "https://api-sis-stats.hudstats.com/v1",
+                 profiler: Optional[PhaseProfiler] = None,
+                 id_index: Optional[MatchIdIndex] = None,
+                 transport: Optional[str] = None,
+                 memory: Optional[MemoryTracer] = None,
+                 session=None,
+                 tokens: Optional[TokenManager] = None):
         self.base_url = base_url
-        self.session = requests.Session()
+        # An existing session shares its connection pool with other clients
+        self.session = session if session is not None else create_session(transport)
+        self.profiler = profiler or PhaseProfiler()
+        self.memory = memory or MemoryTracer()
+        # Statistics already stored under any alias of a match are served from disk
+        self.id_index = id_index
+        # Schedule rows whose statistics could not be fetched in the last matches-file run
+        self.failed_matches: List[Dict] = []
+        # Schedule rows left unfetched when the last run's time budget ran out
+        self.remaining_matches: List[Dict] = []
+        
+        # Resolved on the first request; shared with other clients so a 401 is refreshed once
+        self.tokens = tokens or TokenManager(self.refresh_auth_token)
         
         # Set default headers based on the example in match_stats_information.txt
         self.session.headers.update({
@@ -57,13 +106,20 @@ class H2HMatchStatsFetcher:
     
     def set_auth_token(self, token: str) -> None:
         """Set authentication token."""
-        self.session.headers.update({'authorization': f'Bearer {token}'})
+        self.tokens.set(token)
     
     def refresh_auth_token(self, verbose: bool = False) -> Optional[str]:
         """Fetch a new authentication token using the token fetcher script."""
+        with self.profiler.phase('auth'):
+            return self._run_token_fetcher(verbose)
+    
+    def _run_token_fetcher(self, verbose: bool = False) -> Optional[str]:
+        """Run the token fetcher script and read the token it saved."""
+        # Only needed when the token has to be refreshed
+        import subprocess
+        
         try:
-            if verbose:
-                print("Attempting to fetch new authentication token...")
+            logger.debug("Attempting to fetch new authentication token...")
             
             # Run the token fetcher script
             result = subprocess.run(
@@ -81,30 +137,24 @@ class H2HMatchStatsFetcher:
                     
                     new_token = token_data.get('token')
                     if new_token:
-                        if verbose:
-                            print("Successfully fetched new token")
+                        logger.debug("Successfully fetched new token")
                         return new_token
                     else:
-                        if verbose:
-                            print("Token file exists but no token found")
+                        logger.debug("Token file exists but no token found")
                         return None
                         
                 except (FileNotFoundError, json.JSONDecodeError) as e:
-                    if verbose:
-                        print(f"Error reading token file: {e}")
+                    logger.debug("Error reading token file: %s", e)
                     return None
             else:
-                if verbose:
-                    print(f"Token fetcher script failed: {result.stderr}")
+                logger.debug("Token fetcher script failed: %s", result.stderr)
                 return None
                 
         except subprocess.TimeoutExpired:
-            if verbose:
-                print("Token fetcher script timed out")
+            logger.debug("Token fetcher script timed out")
             return None
         except Exception as e:
-            if verbose:
-                print(f"Error running token fetcher: {e}")
+            logger.debug("Error running token fetcher: %s", e)
             return None
     
     def fetch_match_stats(self, match_id: str, verbose: bool = False, retry_on_auth_fail: bool = True) -> Optional[Dict]:
@@ -114,132 +164,199 @@ class H2HMatchStatsFetcher:
         url = f"{self.base_url}/match/{match_id}/stats"
         
         try:
-            if verbose:
-                print(f"Fetching statistics for match {match_id}...")
+            logger.debug("Fetching statistics for match %s...", match_id)
             
-            response = self.session.get(url, timeout=30)
+            token_used = self.tokens.get()
+            with self.profiler.phase('stats_fetch'):
+                response = self.session.get(url, timeout=30, headers={'authorization': f'Bearer {token_used}'})
             
             # Check for authentication errors
             if response.status_code == 401:
-                error_text = response.text.lower()
-                auth_error_detected = (
-                    'unauthenticated' in error_text or 
-                    'authentication' in error_text or
-                    'authentication token' in error_text
-                )
-                
-                if auth_error_detected and retry_on_auth_fail:
-                    print("Authentication failed. Attempting to fetch new token...")
+                if retry_on_auth_fail and self.tokens.refresh_after_rejection(token_used, response.text):
+                    logger.info("Retrying request with new token...")
                     
-                    # Try to get a new token
-                    new_token = self.refresh_auth_token(verbose=verbose)
-                    
-                    if new_token:
-                        # Update the session with the new token
-                        self.set_auth_token(new_token)
-                        print("Retrying request with new token...")
-                        
-                        # Retry the request with the new token (no retry to avoid infinite loop)
-                        return self.fetch_match_stats(match_id, verbose, retry_on_auth_fail=False)
-                    else:
-                        print("Failed to obtain new authentication token.")
-                        print("Error: Authentication required. The API returned 'Unauthenticated'.")
-                        return None
-                else:
-                    print("Error: Authentication required. The API returned 'Unauthenticated'.")
-                    return None
+                    # Retry the request with the new token (no retry to avoid infinite loop)
+                    return self.fetch_match_stats(match_id, verbose, retry_on_auth_fail=False)
+                logger.error("Error: Authentication required. The API returned 'Unauthenticated'.")
+                return None
             
             # Check for other HTTP errors
             if response.status_code == 404:
-                print(f"Match {match_id} not found or statistics not available.")
+                logger.warning("Match %s not found or statistics not available.", match_id)
                 return None
             
             response.raise_for_status()
-            return response.json()
+            with self.profiler.phase('decode'):
+                return response.json()
             
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching statistics for match {match_id}: {e}")
+        except OSError as e:
+            logger.error("Error fetching statistics for match %s: %s", match_id, e)
             return None
         except json.JSONDecodeError as e:
-            print(f"Error parsing JSON response for match {match_id}: {e}")
+            logger.error("Error parsing JSON response for match %s: %s", match_id, e)
             return None
     
-    def fetch_stats_from_matches_file(self, matches_file: str, verbose: bool = False) -> Dict[str, Dict]:
-        """Fetch statistics for all matches from a completed matches file."""
+    def load_stored_stats(self, match_ids: List[str]) -> Dict[str, Dict]:
+        """Return statistics already saved for any of the given IDs, without API requests."""
+        if self.id_index is None:
+            return {}
+        with self.profiler.phase('load'):
+            return self.id_index.load_statistics(match_ids)
+    
+    def fetch_stats_from_matches_file(self, matches_file: str, verbose: bool = False,
+                                      budget: Optional[TimeBudget] = None,
+                                      carried_over: Optional[List[Dict]] = None,
+                                      missing_ids: Set[str] = frozenset(),
+                                      refresh_ids: Set[str] = frozenset()) -> Dict[str, Dict]:
+        """Fetch statistics for all matches from a completed matches file.
+        
+        With a time budget, matches are requested in priority order (see
+        time_budget.prioritize) and no request is started that is not
+        expected to finish in time; the rest are left in remaining_matches.
+        carried_over rows from an earlier run are added to the file's.
+        """
+        
+        # An aborted run saves nothing, so until it completes every match stays pending
+        self.remaining_matches = list(carried_over or [])
+        matches: List[Dict] = []
         
         try:
-            with open(matches_file, 'r', encoding='utf-8') as f:
-                matches_data = json.load(f)
+            with self.profiler.phase('load'):
+                matches = list(iter_matches(matches_file))
+                if carried_over:
+                    matches = merge_matches(matches, carried_over)
             
-            matches = matches_data.get('matches', [])
             if not matches:
-                print(f"No matches found in {matches_file}")
+                logger.warning("No matches found in %s", matches_file)
                 return {}
             
-            print(f"Found {len(matches)} matches in {matches_file}")
+            logger.info("Found %d matches in %s", len(matches), matches_file)
+            self.memory.checkpoint('load')
+            
+            # In budgeted runs, queued incomplete statistics are refetched rather than served from disk
+            stored_stats = self.load_stored_stats(
+                [str(match['matchId']) for match in matches
+                 if match.get('matchId') and not (budget is not None and str(match['matchId']) in missing_ids)]
+            )
+            if stored_stats:
+                logger.info("Using stored statistics for %d matches", len(stored_stats))
+            
+            if budget is not None:
+                # Stored statistics cost no request, so they are taken first
+                matches = (
+                    [match for match in matches if str(match.get('matchId')) in stored_stats]
+                    + prioritize((match for match in matches if str(match.get('matchId')) not in stored_stats),
+                                 missing_ids, refresh_ids)
+                )
             
             all_stats = {}
+            self.failed_matches = []
+            self.remaining_matches = []
             successful_fetches = 0
             failed_fetches = 0
+            progress = ProgressReporter(total=len(matches), label="Fetching stats", unit="matches")
             
             for i, match in enumerate(matches, 1):
                 match_id = match.get('matchId')
                 if not match_id:
-                    print(f"Match {i}: No match ID found, skipping...")
+                    logger.warning("Match %d: No match ID found, skipping...", i)
                     failed_fetches += 1
+                    progress.update()
                     continue
                 
                 # Convert match_id to string if it's a number
                 match_id_str = str(match_id)
                 
-                if verbose:
-                    home_team = match.get('homeTeamName', 'Unknown')
-                    away_team = match.get('awayTeamName', 'Unknown')
-                    print(f"Match {i}/{len(matches)}: {home_team} vs {away_team} (ID: {match_id_str})")
-                else:
-                    print(f"Fetching stats for match {i}/{len(matches)} (ID: {match_id_str})")
+                logger.debug(
+                    "Match %d/%d: %s vs %s (ID: %s)",
+                    i, len(matches),
+                    match.get('homeTeamName', 'Unknown'), match.get('awayTeamName', 'Unknown'),
+                    match_id_str
+                )
                 
-                stats = self.fetch_match_stats(match_id_str, verbose=verbose)
+                stats = stored_stats.get(match_id_str)
+                if not stats:
+                    if budget is not None and not budget.can_dispatch():
+                        if not self.remaining_matches:
+                            logger.info(
+                                "Time budget: %.1fs left, next request estimated at %.1fs; deferring the rest",
+                                budget.remaining(), budget.estimate()
+                            )
+                        self.remaining_matches.append(match)
+                        progress.update()
+                        continue
+                    with budget.request() if budget is not None else nullcontext():
+                        stats = self.fetch_match_stats(match_id_str, verbose=verbose)
                 
                 if stats:
-                    all_stats[match_id_str] = {
-                        'match_info': {
-                            'matchId': match_id_str,
-                            'homeTeamName': match.get('homeTeamName'),
-                            'awayTeamName': match.get('awayTeamName'),
-                            'homeScore': match.get('homeScore'),
-                            'awayScore': match.get('awayScore'),
-                            'startDate': match.get('startDate'),
-                            'tournamentName': match.get('tournamentName')
-                        },
-                        'statistics': stats
-                    }
+                    with self.profiler.phase('transform'):
+                        all_stats[match_id_str] = {
+                            'match_info': match_info_from_schedule(match),
+                            'statistics': stats
+                        }
                     successful_fetches += 1
                 else:
+                    self.failed_matches.append(match)
                     failed_fetches += 1
+                progress.update()
+                self.memory.items()
             
-            print(f"\nStatistics fetching completed:")
-            print(f"  Successful: {successful_fetches}")
-            print(f"  Failed: {failed_fetches}")
-            print(f"  Total: {len(matches)}")
+            progress.close()
+            self.memory.checkpoint('fetch')
+            
+            # Compute derived metrics once for the whole batch
+            with self.profiler.phase('enrich'):
+                enrich_batch(all_stats)
+            self.memory.checkpoint('enrich')
+            
+            logger.info(
+                "\nStatistics fetching completed:\n"
+                "  Successful: %d\n"
+                "  Failed: %d\n"
+                "  Total: %d",
+                successful_fetches, failed_fetches, len(matches),
+                extra={'fields': {
+                    'event': 'stats_completed',
+                    'successful': successful_fetches,
+                    'failed': failed_fetches,
+                    'total': len(matches)
+                }}
+            )
+            if budget is not None:
+                throughput = budget.throughput()
+                logger.info(
+                    "Time budget: %d requests in %.1fs (%s), %d deferred to the next run",
+                    budget.requests, budget.elapsed(),
+                    f"{throughput:.2f} requests/s" if throughput else "no requests",
+                    len(self.remaining_matches),
+                    extra={'fields': {
+                        'event': 'time_budget',
+                        'requests': budget.requests,
+                        'elapsed': round(budget.elapsed(), 3),
+                        'throughput': throughput,
+                        'deferred': len(self.remaining_matches)
+                    }}
+                )
             
             return all_stats
             
         except FileNotFoundError:
-            print(f"Error: Matches file '{matches_file}' not found.")
+            logger.error("Error: Matches file '%s' not found.", matches_file)
             return {}
         except json.JSONDecodeError as e:
-            print(f"Error parsing matches file '{matches_file}': {e}")
+            logger.error("Error parsing matches file '%s': %s", matches_file, e)
             return {}
         except Exception as e:
-            print(f"Error processing matches file '{matches_file}': {e}")
+            logger.error("Error processing matches file '%s': %s", matches_file, e)
+            if matches:
+                self.remaining_matches = matches
             return {}
     
-    def save_stats_to_file(self, stats_data: Dict, output_file: str, match_id: str = None) -> None:
-        """Save match statistics to a JSON file."""
-        
-        # Ensure the output directory exists
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    def save_stats_to_file(self, stats_data: Dict, output_file: str, match_id: str = None,
+                           derived: Optional[Dict] = None,
+                           compress: Optional[str] = None,
+                           compress_level: Optional[int] = None) -> None:
+        """Save match statistics to a JSON file, compressed by extension or explicit choice."""
         
         # Prepare the data structure
         if match_id:
@@ -252,6 +369,8 @@ class H2HMatchStatsFetcher:
                 },
                 'statistics': stats_data
             }
+            if derived is not None:
+                output_data['derived'] = derived
         else:
             # Multiple matches statistics
             output_data = {
@@ -264,16 +383,16 @@ class H2HMatchStatsFetcher:
             }
         
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, indent=2, ensure_ascii=False)
+            write_json(output_data, output_file, compress=compress, level=compress_level,
+                       profiler=self.profiler)
             
             if match_id:
-                print(f"Successfully saved statistics for match {match_id} to {output_file}")
+                logger.info("Successfully saved statistics for match %s to %s", match_id, output_file)
             else:
-                print(f"Successfully saved statistics for {len(stats_data)} matches to {output_file}")
+                logger.info("Successfully saved statistics for %d matches to %s", len(stats_data), output_file)
             
         except IOError as e:
-            print(f"Error saving file: {e}")
+            logger.error("Error saving file: %s", e)
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -309,20 +428,143 @@ Examples:
         help='Output file path (default: auto-generated based on input)'
     )
     
+    parser.add_argument(
+        '--matchup-index',
+        default=DEFAULT_INDEX_FILE,
+        help=f'Head-to-head index updated with fetched matches (default: {DEFAULT_INDEX_FILE})'
+    )
+    
+    parser.add_argument(
+        '--no-matchup-index',
+        action='store_true',
+        help='Do not update the head-to-head index'
+    )
+    
+    parser.add_argument(
+        '--id-index',
+        default=DEFAULT_ID_INDEX_FILE,
+        help=f'Match code/matchId/fixtureId index used to skip already stored matches (default: {DEFAULT_ID_INDEX_FILE})'
+    )
+    
+    parser.add_argument(
+        '--no-id-index',
+        action='store_true',
+        help='Neither consult nor update the match ID index'
+    )
+    
+    parser.add_argument(
+        '--partition-dir',
+        default=DEFAULT_PARTITION_DIR,
+        help=f'League-day/tournament partitions updated with fetched statistics (default: {DEFAULT_PARTITION_DIR})'
+    )
+    
+    parser.add_argument(
+        '--no-partitions',
+        action='store_true',
+        help='Do not update the partitioned store'
+    )
+    
+    parser.add_argument(
+        '--form-db',
+        default=DEFAULT_FORM_DB,
+        help=f'Rolling form/streak database updated with fetched statistics (default: {DEFAULT_FORM_DB})'
+    )
+    
+    parser.add_argument(
+        '--no-form',
+        action='store_true',
+        help='Do not update the rolling form statistics'
+    )
+    
+    parser.add_argument(
+        '--rollup-db',
+        default=DEFAULT_ROLLUP_DB,
+        help=f'Daily team/tournament rollup database updated with fetched statistics (default: {DEFAULT_ROLLUP_DB})'
+    )
+    
+    parser.add_argument(
+        '--no-rollups',
+        action='store_true',
+        help='Do not update the daily rollups'
+    )
+    
+    parser.add_argument(
+        '--refetch-db',
+        default=DEFAULT_REFETCH_DB,
+        help=f'Queue of matches with failed or incomplete statistics, processed by refetch.py (default: {DEFAULT_REFETCH_DB})'
+    )
+    
+    parser.add_argument(
+        '--no-refetch-queue',
+        action='store_true',
+        help='Do not validate statistics or queue failed and incomplete matches'
+    )
+    
+    parser.add_argument(
+        '--refetch',
+        action='store_true',
+        help='Fetch from the API even when statistics are already stored'
+    )
+    
+    # Deadline-aware runs
+    parser.add_argument(
+        '--time-budget',
+        type=parse_duration,
+        metavar='DURATION',
+        help='With --matches-file: finish within this wall-clock time (e.g. 900, 15m, 1h), newest and '
+             'missing matches first; the rest is saved for the next run'
+    )
+    
+    parser.add_argument(
+        '--time-budget-reserve',
+        type=parse_duration,
+        metavar='DURATION',
+        help='Part of the time budget kept for saving and index updates (default: 10%% of the budget)'
+    )
+    
+    parser.add_argument(
+        '--remainder-file',
+        help='Matches deferred by --time-budget, read back by the next run (default: <output>_remaining.json)'
+    )
+    
     # Authentication
     parser.add_argument(
         '--auth-token',
-        default='test',
-        help='API authentication token (default: test token to trigger auth refresh)'
+        help='API authentication token (default: cached token from auth_token.json, refreshed if missing or expired)'
     )
     
+    add_transport_arguments(parser)
+    
     # Verbose output
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
-        help='Enable verbose output'
+        help='Enable verbose output (per-match lines)'
+    )
+    
+    add_logging_arguments(parser)
+    add_compression_arguments(parser)
+    
+    # Profiling
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Time each pipeline phase and write a profile report'
+    )
+    
+    parser.add_argument(
+        '--profile-cprofile',
+        action='store_true',
+        help='Also run cProfile inside each phase (implies --profile)'
     )
     
+    parser.add_argument(
+        '--profile-output',
+        help='Profile report path (default: <output>_profile.txt)'
+    )
+    
+    add_memory_arguments(parser)
+    
     return parser.parse_args()
 
 
@@ -330,6 +572,10 @@ def main():
     """Main function to execute the match statistics fetching process."""
     
     args = parse_arguments()
+    setup_logging_from_args(args)
+    
+    # The budget covers the whole run, startup and token refresh included
+    budget = TimeBudget(args.time_budget, reserve=args.time_budget_reserve) if args.time_budget else None
     
     # Determine output file if not specified
     if not args.output:
@@ -337,76 +583,173 @@ def main():
             args.output = f'h2hggl_data/match_stats_{args.match_id}.json'
         else:
             # Extract base name from matches file
-            base_name = os.path.splitext(os.path.basename(args.matches_file))[0]
+            base_name = os.path.splitext(os.path.basename(strip_compression_extension(args.matches_file)))[0]
             args.output = f'h2hggl_data/{base_name}_statistics.json'
+    args.output = with_compression_extension(args.output, args.compress)
     
-    if args.verbose:
-        if args.match_id:
-            print(f"Fetching statistics for match: {args.match_id}")
-        else:
-            print(f"Fetching statistics from matches file: {args.matches_file}")
-        print(f"Output file: {args.output}")
+    if args.match_id:
+        logger.debug("Fetching statistics for match: %s", args.match_id)
+    else:
+        logger.debug("Fetching statistics from matches file: %s", args.matches_file)
+    logger.debug("Output file: %s", args.output)
     
     # Initialize the fetcher
-    fetcher = H2HMatchStatsFetcher()
+    profiler = PhaseProfiler(
+        enabled=args.profile or args.profile_cprofile,
+        use_cprofile=args.profile_cprofile
+    )
+    id_index = None if args.no_id_index else MatchIdIndex.load(args.id_index)
+    memory = memory_tracer_from_args(args)
+    fetcher = H2HMatchStatsFetcher(profiler=profiler, id_index=None if args.refetch else id_index,
+                                   transport=args.transport, memory=memory)
     
-    # Set authentication token
-    fetcher.set_auth_token(args.auth_token)
-    if args.verbose:
-        print("Authentication token set")
+    # Set authentication token (explicit, cached, or freshly fetched)
+    if args.auth_token:
+        fetcher.set_auth_token(args.auth_token)
+    logger.debug("Authentication token set")
     
     try:
         if args.match_id:
-            # Fetch statistics for a single match
-            stats = fetcher.fetch_match_stats(args.match_id, verbose=args.verbose)
+            # Fetch statistics for a single match, unless already stored under any of its IDs
+            stats = fetcher.load_stored_stats([args.match_id]).get(args.match_id)
+            if stats:
+                logger.info("Using stored statistics for match %s", args.match_id)
+            else:
+                stats = fetcher.fetch_match_stats(args.match_id, verbose=args.verbose)
+            
+            if not args.no_refetch_queue:
+                with profiler.phase('index'):
+                    if stats:
+                        update_refetch_queue(args.refetch_db, statistics={args.match_id: {'statistics': stats}})
+                    else:
+                        update_refetch_queue(args.refetch_db, failed=[args.match_id])
             
             if not stats:
-                print("No statistics found or error occurred during fetching.")
+                logger.warning("No statistics found or error occurred during fetching.")
                 return
             
             # Save to file
-            fetcher.save_stats_to_file(stats, args.output, args.match_id)
+            with fetcher.profiler.phase('enrich'):
+                derived = derive_match_metrics(stats)
+            fetcher.save_stats_to_file(stats, args.output, args.match_id, derived=derived,
+                                       compress=args.compress, compress_level=args.compress_level)
+            
+            if id_index is not None:
+                with profiler.phase('index'):
+                    id_index.add_statistics(stats, stats_file=args.output, requested_id=args.match_id)
+                    id_index.save(args.id_index)
+            
+            if not args.no_partitions:
+                with profiler.phase('index'):
+                    match_id = ids_from_statistics(stats)['match_id'] or args.match_id
+                    update_partitions(args.partition_dir, statistics={match_id: {'statistics': stats, 'derived': derived}},
+                                      compress=args.compress, compress_level=args.compress_level)
             
             # Print summary
-            print(f"\nSummary:")
-            print(f"  Match ID: {args.match_id}")
-            print(f"  Output file: {args.output}")
+            logger.info("\nSummary:\n  Match ID: %s\n  Output file: %s", args.match_id, args.output)
             
-            if args.verbose and stats:
+            if stats:
                 # Show available periods
                 periods = [key for key in stats.keys() if key != 'metadata']
-                print(f"  Available periods: {', '.join(periods)}")
+                logger.debug("  Available periods: %s", ', '.join(periods))
                 
                 # Show sample data from endMatch if available
                 if 'endMatch' in stats:
                     end_match = stats['endMatch']
-                    print(f"  Final Score: {end_match.get('homePoints', 'N/A')} - {end_match.get('awayPoints', 'N/A')}")
-                    print(f"  Teams: {end_match.get('homeTeamName', 'N/A')} vs {end_match.get('awayTeamName', 'N/A')}")
+                    logger.debug("  Final Score: %s - %s", end_match.get('homePoints', 'N/A'), end_match.get('awayPoints', 'N/A'))
+                    logger.debug("  Teams: %s vs %s", end_match.get('homeTeamName', 'N/A'), end_match.get('awayTeamName', 'N/A'))
         
         else:
             # Fetch statistics for all matches in the file
-            all_stats = fetcher.fetch_stats_from_matches_file(args.matches_file, verbose=args.verbose)
+            carried_over, missing_ids, refresh_ids = [], set(), set()
+            if budget is not None:
+                remainder_file = args.remainder_file or default_remainder_file(strip_compression_extension(args.output))
+                carried_over = load_remainder(remainder_file)
+                if carried_over:
+                    logger.info("Carrying over %d matches deferred by the previous run", len(carried_over))
+                if not args.no_refetch_queue:
+                    missing_ids = RefetchQueue(args.refetch_db).match_ids()
+                if args.refetch and id_index is not None:
+                    refresh_ids = {entry['match_id'] for entry in id_index.entries.values()
+                                   if entry.get('stats_file') and entry.get('match_id')}
+            
+            all_stats = fetcher.fetch_stats_from_matches_file(
+                args.matches_file, verbose=args.verbose, budget=budget,
+                carried_over=carried_over, missing_ids=missing_ids, refresh_ids=refresh_ids
+            )
+            
+            if budget is not None:
+                save_remainder(remainder_file, fetcher.remaining_matches, budget)
+            
+            # Failed and incomplete matches are queued even when nothing else was fetched
+            if not args.no_refetch_queue:
+                with profiler.phase('index'):
+                    update_refetch_queue(args.refetch_db, statistics=all_stats, failed=fetcher.failed_matches)
             
             if not all_stats:
-                print("No statistics found or error occurred during fetching.")
+                logger.warning("No statistics found or error occurred during fetching.")
                 return
             
             # Save to file
-            fetcher.save_stats_to_file(all_stats, args.output)
+            fetcher.save_stats_to_file(all_stats, args.output,
+                                       compress=args.compress, compress_level=args.compress_level)
+            memory.checkpoint('save')
+            
+            if not args.no_matchup_index:
+                with profiler.phase('index'):
+                    update_matchup_index(
+                        (record['match_info'] for record in all_stats.values()), args.matchup_index
+                    )
+            
+            if id_index is not None:
+                with profiler.phase('index'):
+                    for match_id, record in all_stats.items():
+                        id_index.add_statistics(record['statistics'], stats_file=args.output,
+                                                stats_key=match_id, requested_id=match_id)
+                    id_index.save(args.id_index)
+            
+            if not args.no_partitions:
+                with profiler.phase('index'):
+                    update_partitions(args.partition_dir, statistics=all_stats,
+                                      compress=args.compress, compress_level=args.compress_level)
+            
+            if not args.no_form:
+                with profiler.phase('index'):
+                    update_form(args.form_db, statistics=all_stats)
+            
+            if not args.no_rollups:
+                with profiler.phase('index'):
+                    update_rollups(args.rollup_db, statistics=all_stats)
+            memory.checkpoint('index')
             
             # Print summary
-            print(f"\nSummary:")
-            print(f"  Total matches with statistics: {len(all_stats)}")
-            print(f"  Source file: {args.matches_file}")
-            print(f"  Output file: {args.output}")
+            logger.info(
+                "\nSummary:\n"
+                "  Total matches with statistics: %d\n"
+                "  Source file: %s\n"
+                "  Output file: %s",
+                len(all_stats), args.matches_file, args.output,
+                extra={'fields': {
+                    'event': 'summary',
+                    'total_matches': len(all_stats),
+                    'source': args.matches_file,
+                    'output': args.output
+                }}
+            )
     
     except KeyboardInterrupt:
-        print("\nOperation cancelled by user.")
+        logger.warning("\nOperation cancelled by user.")
     except Exception as e:
-        print(f"Unexpected error: {e}")
-        if args.verbose:
-            import traceback
-            traceback.print_exc()
+        logger.error("Unexpected error: %s", e, exc_info=args.verbose)
+    finally:
+        if profiler.enabled:
+            profile_output = args.profile_output or f"{os.path.splitext(strip_compression_extension(args.output))[0]}_profile.txt"
+            profiler.save_report(profile_output)
+        if memory.enabled:
+            memory.checkpoint('end')
+            memory_output = args.trace_memory_output or f"{os.path.splitext(strip_compression_extension(args.output))[0]}_memory.txt"
+            memory.save_report(memory_output)
+            memory.stop()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Rolling Form and Streak Statistics
+
+This module keeps rolling statistics for every team and player, updated
+one match at a time:
+
+    form                  last 5 results, newest first (["W", "L", ...])
+    current streak        e.g. W3 or L2, plus longest win and loss streaks
+    points for/against    totals and averages over the last --window matches
+    quarter averages      points for/against per quarter over the last
+                          --window matches with statistics
+
+Each entity holds fixed-size ring buffers with running sums, so a new
+match costs O(1) per entity regardless of history: the value falling out
+of the window is subtracted as the new one is added.
+
+After each match the entity's summary is stored as a snapshot keyed by
+match, so point-in-time questions ("form going into match X", "form as of
+2025-06-01") are indexed lookups rather than a replay of history. State
+and snapshots live in a SQLite database (default h2hggl_data/form.db).
+
+The schedule fetcher feeds results and scores; the statistics fetcher
+also feeds quarter scores. Each match is counted once per stream. A match
+older than an entity's latest (a late result or a backfill) is replayed:
+the entity's window is restored from the snapshot before it, and every
+later snapshot of that entity is recomputed, so the result is the same as
+adding the matches in order. Snapshots written before the stored inputs
+were kept can't be replayed; --rebuild recomputes those.
+
+Usage:
+    python form_stats.py --team "Los Angeles Lakers"
+    python form_stats.py --player VELOCITY --before-match 233333
+    python form_stats.py --player VELOCITY --as-of "2025-06-01 04:00"
+    python form_stats.py --rebuild h2hggl_data/completed_matches.json h2hggl_data/*_statistics.json
+
+    engine = FormEngine('h2hggl_data/form.db')
+    engine.add_matches(matches)
+    engine.form('player', 'VELOCITY', match_id='233333', before=True)
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+from collections import deque
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from data_io import iter_file_records
+from logging_utils import add_logging_arguments, setup_logging_from_args
+from matchup_index import match_id_of, match_scores, match_sides
+from partitions import parse_start
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FORM_DB = 'h2hggl_data/form.db'
+FORM_LENGTH = 5
+DEFAULT_WINDOW = 10
+
+QUARTERS = ('quarter1', 'quarter2', 'quarter3', 'quarter4')
+
+# Streams each match feeds, counted once per stream
+RESULTS = 'results'
+QUARTER_SCORES = 'quarters'
+
+# Snapshot columns of each stream: its summary and the entity's input vector for the match
+_COLUMNS = {RESULTS: ('results', 'result_input'), QUARTER_SCORES: ('quarters', 'quarter_input')}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entities (
+    kind   TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    state  TEXT NOT NULL,
+    PRIMARY KEY (kind, entity)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    kind     TEXT NOT NULL,
+    entity   TEXT NOT NULL,
+    match_id TEXT NOT NULL,
+    start    TEXT NOT NULL,
+    results  TEXT,
+    quarters TEXT,
+    result_input  TEXT,
+    quarter_input TEXT,
+    PRIMARY KEY (kind, entity, match_id)
+);
+CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (kind, entity, start, match_id);
+CREATE TABLE IF NOT EXISTS applied (
+    match_id TEXT NOT NULL,
+    stream   TEXT NOT NULL,
+    PRIMARY KEY (match_id, stream)
+);
+"""
+
+
+class RollingWindow:
+    """Fixed-size ring buffer of numeric vectors with running sums."""
+
+    __slots__ = ('values', 'sums')
+
+    def __init__(self, size: int, width: int, values: Optional[List[List[float]]] = None):
+        self.values = deque(values or [], maxlen=size)
+        self.sums = [sum(column) for column in zip(*self.values)] if self.values else [0.0] * width
+
+    def push(self, vector: Sequence[float]) -> None:
+        """Add a vector, subtracting the one that falls out of the window."""
+        if len(self.values) == self.values.maxlen:
+            for i, value in enumerate(self.values[0]):
+                self.sums[i] -= value
+        self.values.append(list(vector))
+        for i, value in enumerate(vector):
+            self.sums[i] += value
+
+    def averages(self) -> List[Optional[float]]:
+        count = len(self.values)
+        return [round(total / count, 2) if count else None for total in self.sums]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class EntityForm:
+    """Rolling results, scores and quarter scores of one team or player."""
+
+    def __init__(self, name: str, window: int, data: Optional[Dict] = None):
+        data = data or {}
+        self.name = name
+        self.window = window
+        self.games = data.get('games', 0)
+        self.wins = data.get('wins', 0)
+        self.losses = data.get('losses', 0)
+        self.streak = data.get('streak', 0)
+        self.longest_win_streak = data.get('longest_win_streak', 0)
+        self.longest_loss_streak = data.get('longest_loss_streak', 0)
+        self.results = deque(data.get('results', []), maxlen=FORM_LENGTH)
+        self.points = RollingWindow(window, 2, data.get('points'))
+        self.quarters = RollingWindow(window, 2 * len(QUARTERS), data.get('quarters'))
+
+    def add_result(self, points_for: float, points_against: float) -> None:
+        """Record a finished match from this entity's side."""
+        self.games += 1
+        if points_for > points_against:
+            self.wins += 1
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+            self.longest_win_streak = max(self.longest_win_streak, self.streak)
+            self.results.append('W')
+        elif points_for < points_against:
+            self.losses += 1
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+            self.longest_loss_streak = max(self.longest_loss_streak, -self.streak)
+            self.results.append('L')
+        else:
+            self.streak = 0
+            self.results.append('D')
+        self.points.push((points_for, points_against))
+
+    def add_quarters(self, quarter_points: Sequence[float]) -> None:
+        """Record per-quarter points as [q1 for, q1 against, q2 for, ...]."""
+        self.quarters.push(quarter_points)
+
+    def add(self, stream: str, vector: Sequence[float]) -> Dict:
+        """Record one match of a stream and return the stream's new summary."""
+        if stream == RESULTS:
+            self.add_result(*vector)
+            return self.results_summary()
+        self.add_quarters(vector)
+        return self.quarters_summary()
+
+    def restore(self, stream: str, summary: Optional[Dict], window: List[List[float]]) -> None:
+        """Reset a stream to a stored summary and the input vectors of its window."""
+        if stream == QUARTER_SCORES:
+            self.quarters = RollingWindow(self.window, 2 * len(QUARTERS), window)
+            return
+        summary = summary or {}
+        streak = summary.get('current_streak')
+        self.games = summary.get('games', 0)
+        self.wins = summary.get('wins', 0)
+        self.losses = summary.get('losses', 0)
+        self.streak = (int(streak[1:]) if streak[0] == 'W' else -int(streak[1:])) if streak else 0
+        self.longest_win_streak = summary.get('longest_win_streak', 0)
+        self.longest_loss_streak = summary.get('longest_loss_streak', 0)
+        self.results = deque(reversed(summary.get('form', [])), maxlen=FORM_LENGTH)
+        self.points = RollingWindow(self.window, 2, window)
+
+    def results_summary(self) -> Dict:
+        points_for, points_against = self.points.sums
+        average_for, average_against = self.points.averages()
+        streak = f"{'W' if self.streak > 0 else 'L'}{abs(self.streak)}" if self.streak else None
+        return {
+            'games': self.games,
+            'wins': self.wins,
+            'losses': self.losses,
+            'form': list(reversed(self.results)),
+            'current_streak': streak,
+            'longest_win_streak': self.longest_win_streak,
+            'longest_loss_streak': self.longest_loss_streak,
+            'window': len(self.points),
+            'points_for': points_for,
+            'points_against': points_against,
+            'avg_points_for': average_for,
+            'avg_points_against': average_against,
+        }
+
+    def quarters_summary(self) -> Dict:
+        averages = self.quarters.averages()
+        summary = {'window': len(self.quarters)}
+        for index, quarter in enumerate(QUARTERS):
+            summary[quarter] = {'avg_for': averages[2 * index], 'avg_against': averages[2 * index + 1]}
+        return summary
+
+    def to_dict(self) -> Dict:
+        return {
+            'games': self.games,
+            'wins': self.wins,
+            'losses': self.losses,
+            'streak': self.streak,
+            'longest_win_streak': self.longest_win_streak,
+            'longest_loss_streak': self.longest_loss_streak,
+            'results': list(self.results),
+            'points': list(self.points.values),
+            'quarters': list(self.quarters.values),
+        }
+
+
+def _entity_key(name: str) -> str:
+    return ' '.join(str(name).split()).lower()
+
+
+def _quarter_points(statistics: Dict) -> Optional[Tuple[List[float], List[float]]]:
+    """Home-side and away-side [q1 for, q1 against, ...] vectors, or None if incomplete."""
+    home, away = [], []
+    for quarter in QUARTERS:
+        period = (statistics or {}).get(quarter) or {}
+        home_points, away_points = period.get('homePoints'), period.get('awayPoints')
+        if home_points is None or away_points is None:
+            return None
+        home += [float(home_points), float(away_points)]
+        away += [float(away_points), float(home_points)]
+    return home, away
+
+
+class FormEngine:
+    """Rolling form per team and player with per-match snapshots in SQLite."""
+
+    def __init__(self, db_file: str = DEFAULT_FORM_DB, window: int = DEFAULT_WINDOW, busy_timeout: float = 60):
+        self.db_file = db_file
+        self.busy_timeout = busy_timeout
+
+        db_dir = os.path.dirname(db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.executescript(_SCHEMA)
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(snapshots)')}
+            for _, input_column in _COLUMNS.values():
+                if input_column not in columns:
+                    # Databases from before late matches were replayed
+                    connection.execute(f'ALTER TABLE snapshots ADD COLUMN {input_column} TEXT')
+            row = connection.execute("SELECT value FROM meta WHERE key = 'window'").fetchone()
+            if row is None:
+                connection.execute("INSERT INTO meta (key, value) VALUES ('window', ?)", (str(window),))
+                self.window = window
+            else:
+                self.window = int(row[0])
+                if self.window != window:
+                    logger.debug("Form database %s uses a %d-match window", db_file, self.window)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_file, timeout=self.busy_timeout, isolation_level=None)
+
+    def _apply(self, events: List[Tuple[str, str, str, Dict]]) -> int:
+        """Apply (stream, match_id, start, payload) events in start order. Returns the number applied."""
+        events.sort(key=lambda event: (event[2], event[1]))
+        applied = 0
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            entities: Dict[Tuple[str, str], EntityForm] = {}
+            # New (start, match_id, input vector) per entity and stream, oldest first
+            pending: Dict[Tuple[str, str, str], List[Tuple[str, str, List[float]]]] = {}
+
+            for stream, match_id, start, payload in events:
+                inserted = connection.execute(
+                    'INSERT OR IGNORE INTO applied (match_id, stream) VALUES (?, ?)', (match_id, stream)
+                ).rowcount
+                if not inserted:
+                    continue
+                applied += 1
+
+                for kind, (home, away) in payload['sides'].items():
+                    if home is None or away is None:
+                        continue
+                    for name, side in ((home, 0), (away, 1)):
+                        key = (kind, _entity_key(name))
+                        if key not in entities:
+                            row = connection.execute('SELECT state FROM entities WHERE kind = ? AND entity = ?',
+                                                     key).fetchone()
+                            entities[key] = EntityForm(str(name), self.window, json.loads(row[0]) if row else None)
+                        if stream == RESULTS:
+                            scores = payload['scores']
+                            vector = [scores[side], scores[1 - side]]
+                        else:
+                            vector = payload['quarters'][side]
+                        pending.setdefault((*key, stream), []).append((start, match_id, vector))
+
+            for (kind, key, stream), inputs in pending.items():
+                self._apply_entity(connection, kind, key, stream, entities[(kind, key)], inputs)
+
+            connection.executemany(
+                'INSERT OR REPLACE INTO entities (kind, entity, state) VALUES (?, ?, ?)',
+                [(kind, key, json.dumps(dict(form.to_dict(), name=form.name)))
+                 for (kind, key), form in entities.items()]
+            )
+            connection.execute('COMMIT')
+        return applied
+
+    def _apply_entity(self, connection: sqlite3.Connection, kind: str, key: str, stream: str, form: EntityForm,
+                      inputs: List[Tuple[str, str, List[float]]]) -> None:
+        """Add one entity's new matches of a stream, replaying its later matches if any are late."""
+        column, input_column = _COLUMNS[stream]
+        first = inputs[0][:2]
+        later = connection.execute(
+            f'SELECT start, match_id, {input_column} FROM snapshots WHERE kind = ? AND entity = ? '
+            f'AND {column} IS NOT NULL AND (start, match_id) > (?, ?) ORDER BY start, match_id',
+            (kind, key, *first)
+        ).fetchall()
+
+        if later:
+            if None not in (row[2] for row in later) and self._restore(connection, kind, key, stream, form, first):
+                logger.debug("Replaying %d later %s snapshot(s) of %s %s", len(later), stream, kind, key)
+                inputs = sorted(inputs + [(start, match_id, json.loads(vector)) for start, match_id, vector in later])
+            else:
+                logger.warning("Can't replay %s snapshots of %s %s stored without inputs; late matches are "
+                               "added as the newest (use --rebuild to recompute)", stream, kind, key)
+
+        for start, match_id, vector in inputs:
+            summary = form.add(stream, vector)
+            connection.execute(
+                f'INSERT INTO snapshots (kind, entity, match_id, start, {column}, {input_column}) '
+                f'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (kind, entity, match_id) '
+                f'DO UPDATE SET {column} = excluded.{column}, {input_column} = excluded.{input_column}',
+                (kind, key, match_id, start, json.dumps(summary), json.dumps(vector))
+            )
+
+    def _restore(self, connection: sqlite3.Connection, kind: str, key: str, stream: str, form: EntityForm,
+                 before: Tuple[str, str]) -> bool:
+        """Reset an entity's stream to its state going into a match. False if the inputs aren't stored."""
+        column, input_column = _COLUMNS[stream]
+        rows = connection.execute(
+            f'SELECT {column}, {input_column} FROM snapshots WHERE kind = ? AND entity = ? '
+            f'AND {column} IS NOT NULL AND (start, match_id) < (?, ?) ORDER BY start DESC, match_id DESC LIMIT ?',
+            (kind, key, *before, form.window)
+        ).fetchall()
+        summary = json.loads(rows[0][0]) if rows else None
+        vectors = [vector for _, vector in reversed(rows[:summary['window']])] if summary else []
+        if summary and (len(vectors) < summary['window'] or None in vectors):
+            return False
+        window = [json.loads(vector) for vector in vectors]
+        form.restore(stream, summary, window)
+        return True
+
+    @staticmethod
+    def _result_event(match: Dict) -> Optional[Tuple[str, str, str, Dict]]:
+        match_id = match_id_of(match)
+        home_score, away_score = match_scores(match)
+        if not match_id or not match.get('startDate') or home_score is None or away_score is None:
+            return None
+        try:
+            scores = (float(home_score), float(away_score))
+        except (TypeError, ValueError):
+            return None
+        return RESULTS, match_id, match['startDate'], {'sides': match_sides(match), 'scores': scores}
+
+    def _statistics_events(self, statistics: Dict[str, Dict]) -> List[Tuple[str, str, str, Dict]]:
+        events = []
+        for record in statistics.values():
+            result = self._result_event(record.get('match_info') or {})
+            if result is None:
+                continue
+            events.append(result)
+            quarters = _quarter_points(record.get('statistics'))
+            if quarters is not None:
+                events.append((QUARTER_SCORES, result[1], result[2],
+                               {'sides': result[3]['sides'], 'quarters': quarters}))
+        return events
+
+    def add(self, matches: Optional[Iterable[Dict]] = None, statistics: Optional[Dict[str, Dict]] = None) -> int:
+        """Add schedule rows and/or statistics records in one ordered pass. Returns the number of new events."""
+        events = [event for event in (self._result_event(match) for match in matches or []) if event]
+        events += self._statistics_events(statistics or {})
+        return self._apply(events)
+
+    def add_matches(self, matches: Iterable[Dict]) -> int:
+        """Add schedule rows (or match_info records). Returns the number of new results."""
+        return self.add(matches=matches)
+
+    def add_statistics(self, statistics: Dict[str, Dict]) -> int:
+        """Add {match_id: {'match_info', 'statistics'}} records: results and quarter scores."""
+        return self.add(statistics=statistics)
+
+    def form(self, kind: str, name: str, match_id: Optional[str] = None, before: bool = False,
+             as_of: Optional[str] = None) -> Optional[Dict]:
+        """Summary of an entity: current, after (or, with before=True, going into) a match, or as of a time."""
+        key = _entity_key(name)
+        with closing(self._connect()) as connection:
+            if match_id is None and as_of is None:
+                row = connection.execute('SELECT state FROM entities WHERE kind = ? AND entity = ?',
+                                         (kind, key)).fetchone()
+                if row is None:
+                    return None
+                state = json.loads(row[0])
+                current = EntityForm(state.get('name', name), self.window, state)
+                return {'name': current.name, **current.results_summary(), 'quarters': current.quarters_summary()}
+
+            if match_id is not None:
+                anchor = connection.execute(
+                    'SELECT start FROM snapshots WHERE kind = ? AND entity = ? AND match_id = ?',
+                    (kind, key, str(match_id))
+                ).fetchone()
+                if anchor is None:
+                    return None
+                bound, comparison = (anchor[0], str(match_id)), '<' if before else '<='
+            else:
+                as_of_start = parse_start(as_of)
+                if as_of_start is None:
+                    raise ValueError(f"Invalid date '{as_of}'")
+                # Any match starting at or before as_of; '~' sorts after every match ID
+                bound, comparison = (as_of_start.strftime('%Y-%m-%dT%H:%M:%SZ'), '~'), '<='
+
+            summary = {'name': name, 'as_of_match': str(match_id) if match_id else None, 'before': before}
+            for column in ('results', 'quarters'):
+                row = connection.execute(
+                    f'SELECT {column}, match_id FROM snapshots WHERE kind = ? AND entity = ? AND {column} IS NOT NULL '
+                    f'AND (start, match_id) {comparison} (?, ?) ORDER BY start DESC, match_id DESC LIMIT 1',
+                    (kind, key, *bound)
+                ).fetchone()
+                data = json.loads(row[0]) if row else None
+                if column == 'results':
+                    summary.update(data or {'games': 0})
+                else:
+                    summary['quarters'] = data
+            return summary
+
+    def reset(self, window: Optional[int] = None) -> None:
+        """Remove all state and snapshots, optionally changing the window size."""
+        self.window = window or self.window
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            for table in ('entities', 'snapshots', 'applied'):
+                connection.execute(f'DELETE FROM {table}')
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('window', ?)", (str(self.window),))
+            connection.execute('COMMIT')
+
+
+def update_form(db_file: str = DEFAULT_FORM_DB, matches: Optional[Iterable[Dict]] = None,
+                statistics: Optional[Dict[str, Dict]] = None) -> int:
+    """Feed freshly fetched matches or statistics to the form database. Returns the number of new events."""
+    try:
+        added = FormEngine(db_file).add(matches=matches, statistics=statistics)
+    except (OSError, sqlite3.Error) as e:
+        logger.error("Error updating form statistics in '%s': %s", db_file, e)
+        return 0
+    logger.debug("Form statistics: %d new events in %s", added, db_file)
+    return added
+
+
+def _print_summary(kind: str, summary: Dict) -> None:
+    print(f"{summary['name']} ({kind})")
+    if not summary.get('games'):
+        print("  No matches")
+        return
+    print(f"  Record: {summary['wins']}-{summary['losses']} in {summary['games']} games")
+    print(f"  Form: {' '.join(summary['form'])}   Streak: {summary['current_streak'] or '-'}   "
+          f"Longest: W{summary['longest_win_streak']} / L{summary['longest_loss_streak']}")
+    print(f"  Last {summary['window']}: {summary['avg_points_for']} for, {summary['avg_points_against']} against per game")
+    quarters = summary.get('quarters')
+    if quarters and quarters.get('window'):
+        averages = ', '.join(f"Q{index + 1} {quarters[quarter]['avg_for']}-{quarters[quarter]['avg_against']}"
+                             for index, quarter in enumerate(QUARTERS))
+        print(f"  Quarters (last {quarters['window']}): {averages}")
+
+
+def main():
+    """Show or rebuild rolling form statistics."""
+    parser = argparse.ArgumentParser(
+        description='Rolling form, streak and scoring statistics per team and player',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python form_stats.py --team "Los Angeles Lakers"
+  python form_stats.py --player VELOCITY --before-match 233333
+  python form_stats.py --player VELOCITY RAZE --as-of "2025-06-01 04:00"
+  python form_stats.py --rebuild h2hggl_data/completed_matches.json h2hggl_data/*_statistics.json --window 20
+        """
+    )
+
+    parser.add_argument('--form-db', default=DEFAULT_FORM_DB, help=f'Form database (default: {DEFAULT_FORM_DB})')
+    parser.add_argument('--team', nargs='+', default=[], help='Teams to show')
+    parser.add_argument('--player', nargs='+', default=[], help='Players to show')
+    point_group = parser.add_mutually_exclusive_group()
+    point_group.add_argument('--after-match', metavar='MATCH_ID', help='Show form including this match')
+    point_group.add_argument('--before-match', metavar='MATCH_ID', help='Show form going into this match')
+    point_group.add_argument('--as-of', metavar='START_DATE',
+                             help='Show form after the last match starting at or before this startDate')
+    parser.add_argument('--rebuild', nargs='+', metavar='FILE',
+                        help='Discard saved form and rebuild from completed matches and statistics files')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW,
+                        help=f'Matches in the points and quarter windows, used by --rebuild (default: {DEFAULT_WINDOW})')
+    parser.add_argument('--json', action='store_true', help='Print summaries as JSON')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    if args.rebuild:
+        engine = FormEngine(args.form_db, window=args.window)
+        engine.reset(window=args.window)
+        matches, statistics = [], {}
+        for path in args.rebuild:
+            try:
+                for kind, match_id, _, record in iter_file_records(path):
+                    if kind == 'matches':
+                        matches.append(record)
+                    else:
+                        statistics[match_id] = record
+            except (OSError, ValueError) as e:
+                logger.error("Error reading '%s': %s", path, e)
+                return 1
+        added = engine.add(matches=matches, statistics=statistics)
+        logger.info("Rebuilt form statistics from %d file(s): %d events", len(args.rebuild), added,
+                    extra={'fields': {'event': 'form_rebuilt', 'events': added}})
+    else:
+        engine = FormEngine(args.form_db)
+
+    match_id = args.after_match or args.before_match
+    for kind, names in (('team', args.team), ('player', args.player)):
+        for name in names:
+            try:
+                summary = engine.form(kind, name, match_id=match_id, before=bool(args.before_match), as_of=args.as_of)
+            except ValueError as e:
+                logger.error("Error: %s", e)
+                return 1
+            if summary is None:
+                print(f"{name} ({kind}): not found" + (f" in match {match_id}" if match_id else ''))
+                continue
+            if args.json:
+                print(json.dumps(summary, ensure_ascii=False))
+            else:
+                _print_summary(kind, summary)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Streaming Client
+
+This module is the library entry point for reading schedule rows and
+match statistics without going through files. Everything is lazy: pages
+are requested only as the caller iterates, statistics are fetched a few
+at a time ahead of the consumer, and breaking out of a loop stops all
+further requests. Memory stays constant however long the range is.
+
+    H2HClient          synchronous iterators
+    AsyncH2HClient     the same iterators as async generators, for use
+                       inside an asyncio application
+
+Both share the fetchers' request, retry and token refresh logic. The
+token is taken from auth_token= or the cached auth_token.json, and only
+refreshed through fetch_auth_token.py when neither is valid.
+
+Usage:
+    from h2hggl_client import H2HClient
+
+    with H2HClient() as client:
+        for match in client.iter_matches('2025-06-01 04:00', '2025-06-02 03:59', tournament_ids=[1, 2]):
+            ...
+        for match_id, stats in client.iter_stats(['233333', '233330']):
+            ...
+
+    async with AsyncH2HClient(max_workers=8) as client:
+        async for match_id, stats in client.iter_stats(client.iter_matches(start, end)):
+            ...
+"""
+
+import asyncio
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from fetch_completed_matches import H2HMatchFetcher
+from fetch_match_stats import H2HMatchStatsFetcher
+from http_transport import set_pool_size
+from matchup_index import match_id_of
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api-sis-stats.hudstats.com/v1"
+DEFAULT_MAX_WORKERS = 4
+
+# Requests queued per worker, so the next fetch starts as soon as one completes
+_PREFETCH_PER_WORKER = 2
+
+MatchRef = Union[str, int, Dict]
+
+
+def _ref_match_id(match: MatchRef) -> Optional[str]:
+    """The matchId of a match ID, schedule row or match_info record."""
+    if isinstance(match, dict):
+        return match_id_of(match)
+    return None if match in (None, '') else str(match)
+
+
+class H2HClient:
+    """Lazy, synchronous access to schedule pages and match statistics."""
+
+    def __init__(self, auth_token: Optional[str] = None, transport: Optional[str] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS, base_url: str = DEFAULT_BASE_URL):
+        self.max_workers = max(1, max_workers)
+        self.match_fetcher = H2HMatchFetcher(base_url, transport=transport)
+        # Both endpoints use one token, resolved on the first request
+        self.stats_fetcher = H2HMatchStatsFetcher(base_url, transport=transport, tokens=self.match_fetcher.tokens)
+        if auth_token:
+            self.match_fetcher.set_auth_token(auth_token)
+
+    def iter_pages(self, from_date: str, to_date: str, tournament_id: int = 1) -> Iterator[List[Dict]]:
+        """Yield schedule rows one page at a time, newest first. Dates are 'YYYY-MM-DD HH:MM'."""
+        for data in self.match_fetcher.iter_pages(from_date, to_date, tournament_id):
+            matches = data['data']
+            for match in matches:
+                match.setdefault('tournamentId', tournament_id)
+            yield matches
+
+    def iter_matches(self, from_date: str, to_date: str,
+                     tournament_ids: Sequence[int] = (1,)) -> Iterator[Dict]:
+        """Yield schedule rows of each tournament in turn."""
+        for tournament_id in tournament_ids:
+            for page in self.iter_pages(from_date, to_date, tournament_id):
+                yield from page
+
+    def iter_stats(self, matches: Iterable[MatchRef],
+                   max_workers: Optional[int] = None) -> Iterator[Tuple[str, Dict]]:
+        """Yield (match_id, statistics) as fetches complete.
+
+        matches may be match IDs, schedule rows or any lazy iterable of
+        them, such as iter_matches(); it is consumed only a few items ahead
+        of the fetches. Matches without statistics are skipped.
+        """
+        workers = max(1, max_workers or self.max_workers)
+        set_pool_size(self.stats_fetcher.session, workers)
+
+        source = iter(matches)
+        exhausted = False
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stats')
+        try:
+            while True:
+                while not exhausted and len(pending) < workers * _PREFETCH_PER_WORKER:
+                    try:
+                        match = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    match_id = _ref_match_id(match)
+                    if match_id:
+                        pending[executor.submit(self.stats_fetcher.fetch_match_stats, match_id)] = match_id
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    match_id = pending.pop(future)
+                    stats = future.result()
+                    if stats:
+                        yield match_id, stats
+        finally:
+            # Reached on early exit too: queued fetches are dropped, running ones finish in the background
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def fetch_stats(self, match: MatchRef) -> Optional[Dict]:
+        """Fetch the statistics of a single match."""
+        match_id = _ref_match_id(match)
+        return self.stats_fetcher.fetch_match_stats(match_id) if match_id else None
+
+    def close(self) -> None:
+        for fetcher in (self.match_fetcher, self.stats_fetcher):
+            close = getattr(fetcher.session, 'close', None)
+            if close:
+                close()
+
+    def __enter__(self) -> 'H2HClient':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class AsyncH2HClient:
+    """H2HClient's iterators as async generators.
+
+    Requests run on a thread pool, so the event loop is never blocked and
+    iter_stats keeps max_workers fetches in flight.
+    """
+
+    def __init__(self, auth_token: Optional[str] = None, transport: Optional[str] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS, base_url: str = DEFAULT_BASE_URL):
+        self.client = H2HClient(auth_token=auth_token, transport=transport, max_workers=max_workers,
+                                base_url=base_url)
+        self.max_workers = self.client.max_workers
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='async-stats')
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def iter_pages(self, from_date: str, to_date: str, tournament_id: int = 1) -> AsyncIterator[List[Dict]]:
+        """Yield schedule rows one page at a time, newest first."""
+        pages = self.client.iter_pages(from_date, to_date, tournament_id)
+        try:
+            while True:
+                page = await self._run(next, pages, None)
+                if page is None:
+                    return
+                yield page
+        finally:
+            pages.close()
+
+    async def iter_matches(self, from_date: str, to_date: str,
+                           tournament_ids: Sequence[int] = (1,)) -> AsyncIterator[Dict]:
+        """Yield schedule rows of each tournament in turn."""
+        for tournament_id in tournament_ids:
+            async for page in self.iter_pages(from_date, to_date, tournament_id):
+                for match in page:
+                    yield match
+
+    async def iter_stats(self, matches: Union[Iterable[MatchRef], AsyncIterable[MatchRef]],
+                         max_workers: Optional[int] = None) -> AsyncIterator[Tuple[str, Dict]]:
+        """Yield (match_id, statistics) as fetches complete; matches may be a sync or async iterable."""
+        workers = max(1, min(max_workers or self.max_workers, self.max_workers))
+        set_pool_size(self.client.stats_fetcher.session, workers)
+
+        if hasattr(matches, '__aiter__'):
+            source = matches.__aiter__()
+        else:
+            iterator = iter(matches)
+
+            async def source_iterator():
+                for match in iterator:
+                    yield match
+            source = source_iterator()
+
+        exhausted = False
+        pending: Dict[asyncio.Future, str] = {}
+        try:
+            while True:
+                while not exhausted and len(pending) < workers * _PREFETCH_PER_WORKER:
+                    try:
+                        match = await source.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    match_id = _ref_match_id(match)
+                    if match_id:
+                        future = asyncio.ensure_future(self._run(self.client.stats_fetcher.fetch_match_stats, match_id))
+                        pending[future] = match_id
+                if not pending:
+                    return
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    match_id = pending.pop(future)
+                    stats = future.result()
+                    if stats:
+                        yield match_id, stats
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def fetch_stats(self, match: MatchRef) -> Optional[Dict]:
+        """Fetch the statistics of a single match."""
+        return await self._run(self.client.fetch_stats, match)
+
+    async def aclose(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
+
+    async def __aenter__(self) -> 'AsyncH2HClient':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - HTTP Transport
+
+This module creates the HTTP sessions used by the API clients. Two
+transports are available:
+
+    requests   the requests library (default), imported on first use
+    http       a small keep-alive client on the standard library's
+               http.client, for short cron and watch runs where importing
+               requests dominates startup time
+
+The 'http' session implements the part of the requests Session/Response
+API the fetchers use (headers, get(), status_code, headers, text, json(),
+raise_for_status()). It sends gzip-accepting requests, follows redirects
+and keeps a per-host pool of idle connections that is safe to share
+between threads. Like requests, it drops the Authorization and Cookie
+headers when a redirect leads to another scheme, host or port. It is
+stricter than requests about downgrades: requests follows a redirect
+from https to http with the credentials stripped, while this session
+refuses it. It does not read proxy settings from the environment.
+
+Both transports raise exceptions derived from OSError (requests'
+RequestException is an IOError), so callers catch OSError for either.
+
+Usage:
+    session = create_session(args.transport)
+    set_pool_size(session, max_workers)
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import zlib
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urljoin, urlsplit
+
+TRANSPORTS = ('requests', 'http')
+DEFAULT_TRANSPORT = os.environ.get('H2HGGL_TRANSPORT', 'requests')
+
+DEFAULT_POOL_SIZE = 10
+MAX_REDIRECTS = 5
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# Dropped when a redirect leaves the original scheme, host or port, as requests does
+_CREDENTIAL_HEADERS = ('Authorization', 'Cookie')
+
+
+class TransportError(OSError):
+    """A request failed before a complete response was received."""
+
+
+class TransportTimeout(TransportError):
+    """The server did not respond within the timeout."""
+
+
+class HTTPError(TransportError):
+    """raise_for_status() on a 4xx/5xx response."""
+
+    def __init__(self, message: str, response: 'Response'):
+        super().__init__(message)
+        self.response = response
+
+
+class Headers(MutableMapping):
+    """Case-insensitive header mapping that keeps the last-set spelling of each name."""
+
+    def __init__(self, data=None):
+        self._store: Dict[str, Tuple[str, str]] = {}
+        if data:
+            self.update(data)
+
+    def __setitem__(self, key: str, value: str) -> None:
+        self._store[key.lower()] = (key, value)
+
+    def __getitem__(self, key: str) -> str:
+        return self._store[key.lower()][1]
+
+    def __delitem__(self, key: str) -> None:
+        del self._store[key.lower()]
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, _ in self._store.values())
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+class Response:
+    """A fully read HTTP response."""
+
+    def __init__(self, url: str, status_code: int, reason: str, headers: Headers, content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+
+    @property
+    def encoding(self) -> str:
+        content_type = self.headers.get('Content-Type', '')
+        for parameter in content_type.split(';')[1:]:
+            name, _, value = parameter.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                return value.strip('"')
+        return 'utf-8'
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        if 400 <= self.status_code < 600:
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise HTTPError(f"{self.status_code} {kind} Error: {self.reason} for url: {self.url}", self)
+
+
+def _origin(url: str) -> Tuple[str, str, int]:
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    return scheme, (parts.hostname or '').lower(), parts.port or (443 if scheme == 'https' else 80)
+
+
+class Session:
+    """Keep-alive HTTP session on http.client with a thread-safe connection pool."""
+
+    def __init__(self, pool_maxsize: int = DEFAULT_POOL_SIZE):
+        self.headers = Headers({
+            'User-Agent': 'H2H-GG-League-Fetcher/1.0',
+            'Accept-Encoding': 'gzip, deflate',
+            'Accept': '*/*',
+        })
+        self.pool_maxsize = pool_maxsize
+        self._idle: Dict[Tuple[str, str, int], List] = {}
+        self._lock = threading.Lock()
+
+    def _new_connection(self, scheme: str, host: str, port: int, timeout: Optional[float]):
+        # http.client (and ssl for https) load on the first request rather than at import
+        import http.client
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _checkout(self, key: Tuple[str, str, int], timeout: Optional[float]):
+        with self._lock:
+            idle = self._idle.get(key)
+            connection = idle.pop() if idle else None
+        if connection is None:
+            return self._new_connection(*key, timeout), False
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection, True
+
+    def _checkin(self, key: Tuple[str, str, int], connection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.pool_maxsize:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def _send(self, method: str, url: str, headers: Headers, timeout: Optional[float]) -> Response:
+        import http.client
+        import socket
+
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ('http', 'https'):
+            raise TransportError(f"Unsupported URL scheme: {url}")
+        key = (scheme, parts.hostname or '', parts.port or (443 if scheme == 'https' else 80))
+        target = parts.path or '/'
+        if parts.query:
+            target = f"{target}?{parts.query}"
+
+        while True:
+            connection, reused = self._checkout(key, timeout)
+            try:
+                connection.request(method, target, headers=dict(headers))
+                raw = connection.getresponse()
+                content = raw.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                connection.close()
+                # An idle pooled connection may have been closed by the server; retry once on a fresh one
+                if reused:
+                    continue
+                raise TransportError(f"Connection to {key[1]} failed: {e}") from e
+            except socket.timeout as e:
+                connection.close()
+                raise TransportTimeout(f"Request to {url} timed out") from e
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise TransportError(f"Request to {url} failed: {e}") from e
+
+        response_headers = Headers(raw.getheaders())
+        encoding = response_headers.get('Content-Encoding', '').lower()
+        if encoding in ('gzip', 'deflate') and content:
+            try:
+                content = zlib.decompress(content, 16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS)
+            except zlib.error as e:
+                connection.close()
+                raise TransportError(f"Could not decode {encoding} response from {url}: {e}") from e
+
+        if raw.will_close:
+            connection.close()
+        else:
+            self._checkin(key, connection)
+        return Response(url, raw.status, raw.reason, response_headers, content)
+
+    def get(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+            timeout: Optional[float] = None) -> Response:
+        """GET a URL, following redirects."""
+        if params:
+            url = f"{url}{'&' if urlsplit(url).query else '?'}{urlencode(params)}"
+
+        origin = _origin(url)
+        for _ in range(MAX_REDIRECTS + 1):
+            # Headers are rebuilt per hop; credentials only go to the origin they were meant for
+            request_headers = Headers(self.headers)
+            if headers:
+                request_headers.update(headers)
+            if _origin(url) != origin:
+                for name in _CREDENTIAL_HEADERS:
+                    request_headers.pop(name, None)
+
+            response = self._send('GET', url, request_headers, timeout)
+            location = response.headers.get('Location')
+            if response.status_code not in _REDIRECT_STATUSES or not location:
+                return response
+
+            next_url = urljoin(url, location)
+            if urlsplit(url).scheme.lower() == 'https' and urlsplit(next_url).scheme.lower() != 'https':
+                raise TransportError(f"Refusing redirect from {url} to insecure {next_url}")
+            url = next_url
+        raise TransportError(f"Too many redirects fetching {url}")
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+def create_session(transport: Optional[str] = None):
+    """Return a new session for the chosen transport."""
+    transport = transport or DEFAULT_TRANSPORT
+    if transport == 'http':
+        return Session()
+    if transport != 'requests':
+        raise ValueError(f"Unknown transport '{transport}' (choose from {', '.join(TRANSPORTS)})")
+
+    try:
+        import requests
+    except ImportError:
+        print("Error: requests library not found. Install with: pip install requests")
+        print("Or use the standard library transport with --transport http")
+        sys.exit(1)
+    return requests.Session()
+
+
+def set_pool_size(session, size: int) -> None:
+    """Let a session keep up to size connections per host, for concurrent workers.
+
+    The pool only ever grows, so a session shared by several clients keeps
+    its open connections when one of them asks for fewer workers.
+    """
+    size = max(size, DEFAULT_POOL_SIZE)
+    if isinstance(session, Session):
+        session.pool_maxsize = max(session.pool_maxsize, size)
+        return
+
+    if getattr(session.get_adapter('https://'), '_pool_maxsize', 0) >= size:
+        return
+    import requests.adapters
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+def add_transport_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the shared HTTP transport option to a CLI argument parser."""
+    parser.add_argument(
+        '--transport',
+        choices=TRANSPORTS,
+        default=DEFAULT_TRANSPORT,
+        help=f'HTTP transport: requests, or http for the faster-starting standard library client '
+             f'(default: {DEFAULT_TRANSPORT}, or $H2HGGL_TRANSPORT)'
+    )
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Live Match Tracker
+
+This script follows matches in progress by polling their statistics and
+recording only what changed. Each poll's per-period blocks (quarter1-4,
+endMatch) are compared field by field with the previous snapshot; the
+first poll of a match is stored in full and every later one as a delta of
+the changed, added and removed fields.
+
+Each match gets an append-only JSON Lines file in the output directory:
+
+    {"type": "snapshot", "seq": 0, "at": ..., "statistics": {...}}
+    {"type": "delta", "seq": 1, "at": ..., "changes": {"quarter2": {"homePoints": 14}}, "removed": []}
+
+Deltas are also logged; with --log-format json the log is a stream of
+small update records. Polling adapts per match: the interval drops to the
+minimum whenever a poll sees changes and grows by --backoff after each
+unchanged poll, up to the maximum. A match stops being tracked once it has
+not changed for --idle-timeout seconds (it has finished or stalled).
+Restarting the tracker continues existing files from their last state.
+
+Usage:
+    python live_tracker.py --match-id NB052120625 NB053120625
+    python live_tracker.py --match-id 233333 --min-interval 3 --max-interval 30
+    python live_tracker.py --replay h2hggl_data/live/NB052120625.jsonl
+
+Requires:
+    - requests library for HTTP requests (or --transport http)
+    - Valid API authentication (automatically refreshed)
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fetch_match_stats import H2HMatchStatsFetcher
+from http_transport import add_transport_arguments, set_pool_size
+from logging_utils import add_logging_arguments, setup_logging_from_args
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIVE_DIR = 'h2hggl_data/live'
+
+
+def flatten(statistics: Dict) -> Dict[str, object]:
+    """Flatten {period: {field: value}} into {'period.field': value}."""
+    flat = {}
+    for period, fields in (statistics or {}).items():
+        if isinstance(fields, dict):
+            for field, value in fields.items():
+                flat[f'{period}.{field}'] = value
+        else:
+            flat[period] = fields
+    return flat
+
+
+def unflatten(flat: Dict[str, object]) -> Dict:
+    """Inverse of flatten()."""
+    statistics: Dict = {}
+    for key, value in flat.items():
+        period, dot, field = key.partition('.')
+        if dot:
+            statistics.setdefault(period, {})[field] = value
+        else:
+            statistics[period] = value
+    return statistics
+
+
+def diff_snapshots(previous: Dict[str, object], current: Dict[str, object]) -> Tuple[Dict[str, object], List[str]]:
+    """Return the changed or added fields and the removed field keys between two flat snapshots."""
+    changes = {key: value for key, value in current.items()
+               if key not in previous or previous[key] != value}
+    removed = sorted(key for key in previous if key not in current)
+    return changes, removed
+
+
+def apply_record(state: Dict[str, object], record: Dict) -> None:
+    """Apply one stored snapshot or delta record to a flat state in place."""
+    if record.get('type') == 'snapshot':
+        state.clear()
+        state.update(flatten(record.get('statistics')))
+        return
+    state.update(flatten(record.get('changes')))
+    for key in record.get('removed', []):
+        state.pop(key, None)
+
+
+def replay(path: str) -> Tuple[Dict[str, object], int]:
+    """Rebuild a match's latest flat state and last sequence number from its file."""
+    state: Dict[str, object] = {}
+    seq = -1
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a truncated last line
+                logger.warning("Skipping unreadable line in %s", path)
+                continue
+            apply_record(state, record)
+            seq = record.get('seq', seq + 1)
+    return state, seq
+
+
+class LiveMatch:
+    """Polling state of one tracked match."""
+
+    __slots__ = ('match_id', 'path', 'state', 'seq', 'interval', 'next_poll', 'last_change', 'polls', 'deltas')
+
+    def __init__(self, match_id: str, path: str, min_interval: float):
+        self.match_id = match_id
+        self.path = path
+        self.state: Optional[Dict[str, object]] = None
+        self.seq = -1
+        self.interval = min_interval
+        self.next_poll = 0.0
+        self.last_change = time.monotonic()
+        self.polls = 0
+        self.deltas = 0
+
+
+class LiveTracker:
+    """Polls live matches concurrently and stores field-level deltas."""
+
+    def __init__(self, fetcher: H2HMatchStatsFetcher, output_dir: str = DEFAULT_LIVE_DIR,
+                 min_interval: float = 5, max_interval: float = 60, backoff: float = 1.5,
+                 idle_timeout: float = 600, max_workers: int = 8):
+        self.fetcher = fetcher
+        self.output_dir = output_dir
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.max_workers = max_workers
+        self.matches: Dict[str, LiveMatch] = {}
+
+        os.makedirs(output_dir, exist_ok=True)
+        set_pool_size(fetcher.session, max_workers)
+
+    def track(self, match_id: str) -> LiveMatch:
+        """Start tracking a match, resuming from its file if one exists."""
+        match = LiveMatch(match_id, os.path.join(self.output_dir, f'{match_id}.jsonl'), self.min_interval)
+        if os.path.exists(match.path):
+            state, seq = replay(match.path)
+            if seq >= 0:
+                match.state, match.seq = state, seq
+                logger.info("Resuming %s from %s (seq %d)", match_id, match.path, seq)
+        self.matches[match_id] = match
+        return match
+
+    def _store(self, match: LiveMatch, record: Dict) -> None:
+        with open(match.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            f.write('\n')
+
+    def process(self, match: LiveMatch, statistics: Optional[Dict], now: float) -> Optional[Dict]:
+        """Diff one poll result against the match's last state; store and return the record, if any."""
+        match.polls += 1
+        record = None
+
+        if statistics:
+            current = flatten(statistics)
+            at = datetime.now().isoformat()
+            if match.state is None:
+                record = {'type': 'snapshot', 'seq': match.seq + 1, 'at': at, 'statistics': statistics}
+            else:
+                changes, removed = diff_snapshots(match.state, current)
+                if changes or removed:
+                    record = {'type': 'delta', 'seq': match.seq + 1, 'at': at,
+                              'changes': unflatten(changes), 'removed': removed}
+            match.state = current
+
+        if record is not None:
+            match.seq = record['seq']
+            match.deltas += record['type'] == 'delta'
+            match.last_change = now
+            match.interval = self.min_interval
+            self._store(match, record)
+        else:
+            match.interval = min(match.interval * self.backoff, self.max_interval)
+
+        match.next_poll = now + match.interval
+        return record
+
+    def _log_record(self, match: LiveMatch, record: Dict) -> None:
+        if record['type'] == 'snapshot':
+            logger.info(
+                "%s: initial snapshot (%d fields)", match.match_id, len(match.state),
+                extra={'fields': {'event': 'live_snapshot', 'match_id': match.match_id, **record}}
+            )
+            return
+
+        changed = sum(len(fields) if isinstance(fields, dict) else 1 for fields in record['changes'].values())
+        end_match = record['changes'].get('endMatch', {})
+        score = ''
+        if 'homePoints' in end_match or 'awayPoints' in end_match:
+            score = f", score {match.state.get('endMatch.homePoints')}-{match.state.get('endMatch.awayPoints')}"
+        logger.info(
+            "%s: %d fields changed, %d removed%s", match.match_id, changed, len(record['removed']), score,
+            extra={'fields': {'event': 'live_delta', 'match_id': match.match_id, **record}}
+        )
+
+    def run(self, duration: Optional[float] = None, verbose: bool = False) -> Dict[str, LiveMatch]:
+        """Poll until every match has gone idle (or duration seconds pass). Returns all tracked matches."""
+        started = time.monotonic()
+        active = dict(self.matches)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='live') as executor:
+            while active:
+                now = time.monotonic()
+                if duration is not None and now - started >= duration:
+                    break
+
+                due = [match for match in active.values() if match.next_poll <= now]
+                if not due:
+                    wake = min(match.next_poll for match in active.values())
+                    if duration is not None:
+                        wake = min(wake, started + duration)
+                    time.sleep(max(wake - now, 0.01))
+                    continue
+
+                results = executor.map(
+                    lambda match: self.fetcher.fetch_match_stats(match.match_id, verbose=verbose), due
+                )
+                for match, statistics in zip(due, results):
+                    now = time.monotonic()
+                    record = self.process(match, statistics, now)
+                    if record is not None:
+                        self._log_record(match, record)
+                    elif now - match.last_change >= self.idle_timeout:
+                        logger.info(
+                            "%s: no changes for %.0fs; stopped tracking (%d polls, %d deltas)",
+                            match.match_id, now - match.last_change, match.polls, match.deltas,
+                            extra={'fields': {'event': 'live_stopped', 'match_id': match.match_id,
+                                              'polls': match.polls, 'deltas': match.deltas}}
+                        )
+                        del active[match.match_id]
+                    else:
+                        logger.debug("%s: unchanged; next poll in %.1fs", match.match_id, match.interval)
+
+        return self.matches
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(
+        description='Track live matches and store field-level statistics deltas',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python live_tracker.py --match-id NB052120625 NB053120625
+  python live_tracker.py --match-id 233333 --min-interval 3 --max-interval 30 --log-format json
+  python live_tracker.py --replay h2hggl_data/live/NB052120625.jsonl
+        """
+    )
+
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument('--match-id', nargs='+', help='Match codes or IDs to track')
+    source_group.add_argument('--replay', metavar='FILE',
+                              help='Print the latest statistics rebuilt from a tracker file and exit')
+
+    parser.add_argument(
+        '--output-dir',
+        default=DEFAULT_LIVE_DIR,
+        help=f'Directory for per-match delta files (default: {DEFAULT_LIVE_DIR})'
+    )
+
+    parser.add_argument('--min-interval', type=float, default=5,
+                        help='Seconds between polls while a match is changing (default: 5)')
+    parser.add_argument('--max-interval', type=float, default=60,
+                        help='Longest interval after repeated unchanged polls (default: 60)')
+    parser.add_argument('--backoff', type=float, default=1.5,
+                        help='Interval multiplier after an unchanged poll (default: 1.5)')
+    parser.add_argument('--idle-timeout', type=float, default=600,
+                        help='Stop tracking a match after this many seconds without changes (default: 600)')
+    parser.add_argument('--duration', type=float, help='Stop after this many seconds overall')
+    parser.add_argument('--max-workers', type=int, default=8, help='Concurrent polls (default: 8)')
+
+    parser.add_argument(
+        '--auth-token',
+        help='API authentication token (default: cached token from auth_token.json, refreshed if missing or expired)'
+    )
+
+    add_transport_arguments(parser)
+
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        help='Enable verbose output (every poll)'
+    )
+
+    add_logging_arguments(parser)
+
+    return parser.parse_args()
+
+
+def main():
+    """Main function to execute live tracking."""
+
+    args = parse_arguments()
+    setup_logging_from_args(args)
+
+    if args.replay:
+        try:
+            state, seq = replay(args.replay)
+        except FileNotFoundError:
+            logger.error("Error: Tracker file '%s' not found.", args.replay)
+            return 1
+        json.dump({'seq': seq, 'statistics': unflatten(state)}, sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write('\n')
+        return 0
+
+    fetcher = H2HMatchStatsFetcher(transport=args.transport)
+    if args.auth_token:
+        fetcher.set_auth_token(args.auth_token)
+
+    tracker = LiveTracker(
+        fetcher, output_dir=args.output_dir, min_interval=args.min_interval,
+        max_interval=args.max_interval, backoff=args.backoff,
+        idle_timeout=args.idle_timeout, max_workers=args.max_workers
+    )
+    for match_id in dict.fromkeys(args.match_id):
+        tracker.track(match_id)
+
+    try:
+        matches = tracker.run(duration=args.duration, verbose=args.verbose)
+    except KeyboardInterrupt:
+        logger.warning("\nTracking stopped by user.")
+        matches = tracker.matches
+
+    logger.info(
+        "\nSummary:\n"
+        "  Matches tracked: %d\n"
+        "  Polls: %d\n"
+        "  Updates stored: %d\n"
+        "  Output directory: %s",
+        len(matches), sum(match.polls for match in matches.values()),
+        sum(match.deltas for match in matches.values()), args.output_dir,
+        extra={'fields': {
+            'event': 'summary',
+            'matches': len(matches),
+            'polls': sum(match.polls for match in matches.values()),
+            'deltas': sum(match.deltas for match in matches.values()),
+            'output_dir': args.output_dir
+        }}
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Logging and Progress Reporting
+
+This module configures the shared logging layer used by the fetch scripts
+and provides a rate-limited single-line progress indicator for the hot
+loops (pages and matches).
+
+Log levels:
+    --verbose   DEBUG   per-page and per-match lines
+    (default)   INFO    run summaries and saved-file messages
+    --quiet     WARNING errors and warnings only
+
+With --log-format json every record is written as one JSON object per line,
+including any structured fields passed as extra={'fields': {...}}.
+
+Usage:
+    parser = argparse.ArgumentParser()
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    progress = ProgressReporter(total=len(matches), label="Fetching stats")
+    for match in matches:
+        ...
+        progress.update()
+    progress.close()
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Optional, TextIO
+
+
+# Whether progress indicators are drawn; decided once by setup_logging()
+_progress_enabled = False
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: int = logging.INFO,
+                  log_format: str = 'text',
+                  log_file: Optional[str] = None,
+                  progress: bool = True) -> None:
+    """Configure the root logger for a CLI run."""
+    global _progress_enabled
+
+    if log_format == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(message)s')
+
+    if log_file:
+        handler = logging.FileHandler(log_file, encoding='utf-8')
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    # Keep third-party debug chatter out of --verbose output
+    logging.getLogger('urllib3').setLevel(logging.WARNING)
+
+    # The progress line would interleave with per-item debug lines and JSON logs
+    _progress_enabled = (
+        progress
+        and level > logging.DEBUG
+        and log_format == 'text'
+        and sys.stderr.isatty()
+    )
+
+
+def add_logging_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the shared logging options to a CLI argument parser."""
+    parser.add_argument(
+        '--quiet', '-q',
+        action='store_true',
+        help='Only show warnings and errors'
+    )
+
+    parser.add_argument(
+        '--log-format',
+        choices=['text', 'json'],
+        default='text',
+        help='Log line format (default: text)'
+    )
+
+    parser.add_argument(
+        '--log-file',
+        help='Write log lines to this file instead of stdout'
+    )
+
+    parser.add_argument(
+        '--no-progress',
+        action='store_true',
+        help='Disable the single-line progress indicator'
+    )
+
+
+def setup_logging_from_args(args: argparse.Namespace) -> None:
+    """Configure logging from parsed --verbose/--quiet/--log-* options."""
+    if getattr(args, 'verbose', False):
+        level = logging.DEBUG
+    elif getattr(args, 'quiet', False):
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+
+    setup_logging(
+        level=level,
+        log_format=getattr(args, 'log_format', 'text'),
+        log_file=getattr(args, 'log_file', None),
+        progress=not getattr(args, 'no_progress', False)
+    )
+
+
+def _format_duration(seconds: float) -> str:
+    """Format a duration in seconds as H:MM:SS or M:SS."""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+class ProgressReporter:
+    """Rate-limited single-line progress indicator with throughput and ETA, safe to share between threads."""
+
+    def __init__(self,
+                 total: Optional[int] = None,
+                 label: str = "Progress",
+                 unit: str = "items",
+                 enabled: Optional[bool] = None,
+                 stream: Optional[TextIO] = None,
+                 min_interval: float = 0.25):
+        self.total = total
+        self.label = label
+        self.unit = unit
+        self.enabled = _progress_enabled if enabled is None else enabled
+        self.stream = stream or sys.stderr
+        self.min_interval = min_interval
+        self.done = 0
+        self._start = time.monotonic()
+        self._last_render = 0.0
+        self._last_width = 0
+        # Workers of a thread pool may report to the same line
+        self._lock = threading.Lock()
+
+    def set_total(self, total: int) -> None:
+        """Set or correct the expected total once it is known."""
+        with self._lock:
+            self.total = total
+
+    def update(self, count: int = 1) -> None:
+        """Record completed items and redraw if the interval has elapsed."""
+        with self._lock:
+            self.done += count
+            if not self.enabled:
+                return
+
+            now = time.monotonic()
+            if now - self._last_render >= self.min_interval:
+                self._render(now)
+
+    def close(self) -> None:
+        """Draw the final state and end the progress line."""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._render(time.monotonic())
+            self.stream.write("\n")
+            self.stream.flush()
+
+    def _render(self, now: float) -> None:
+        # Called with self._lock held
+        self._last_render = now
+        elapsed = now - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+
+        if self.total:
+            percent = self.done / self.total * 100
+            remaining = max(self.total - self.done, 0)
+            eta = _format_duration(remaining / rate) if rate > 0 else "--:--"
+            line = (f"{self.label}: {self.done}/{self.total} {self.unit} ({percent:.0f}%) "
+                    f"{rate:.1f}/s ETA {eta}")
+        else:
+            line = f"{self.label}: {self.done} {self.unit} {rate:.1f}/s elapsed {_format_duration(elapsed)}"
+
+        padding = " " * max(self._last_width - len(line), 0)
+        self._last_width = len(line)
+        self.stream.write(f"\r{line}{padding}")
+        self.stream.flush()
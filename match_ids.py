@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Match Identifier Index
+
+The same match is known by several identifiers:
+    match code   NB052120625   site URL code, accepted by the stats endpoint
+    matchId      233333        numeric ID in schedule rows and stats periods
+    fixtureId    234826        numeric ID inside every stats period
+
+This module keeps a persistent index that maps any of them to one entry
+holding all known identifiers and where the match is stored (the schedule
+file and the statistics file plus its key). Lookups are dictionary hits,
+so a match requested by any alias resolves in O(1) and, when its
+statistics are already on disk, can be served without an API request.
+
+The fetch scripts update the index as schedules and statistics are saved.
+
+Usage:
+    python match_ids.py NB052120625 233333
+    python match_ids.py --rebuild h2hggl_data/completed_matches.json h2hggl_data/match_stats_NB052120625.json
+
+    index = MatchIdIndex.load('h2hggl_data/match_ids.json')
+    entry = index.resolve('NB052120625')   # {'match_id': '233333', 'fixture_id': '234826', ...}
+    stored = index.load_statistics(['233333', '234826'])
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from data_io import iter_match_statistics, iter_sections, load_json
+from logging_utils import add_logging_arguments, setup_logging_from_args
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ID_INDEX_FILE = 'h2hggl_data/match_ids.json'
+ID_INDEX_VERSION = 1
+
+# Identifier kinds and the alias prefix each is stored under
+_ALIAS_PREFIXES = {
+    'match_id': 'm:',
+    'fixture_id': 'f:',
+    'match_code': 'c:',
+}
+
+# Schedule row fields that may carry the site match code
+_CODE_FIELDS = ('matchCode', 'code')
+
+_ENTRY_FIELDS = ('match_id', 'fixture_id', 'match_code', 'matches_file', 'stats_file', 'stats_key')
+
+
+def _clean(identifier) -> Optional[str]:
+    if identifier in (None, ''):
+        return None
+    return str(identifier).strip()
+
+
+def is_match_code(identifier) -> bool:
+    """Whether an identifier is a site match code rather than a numeric ID."""
+    identifier = _clean(identifier)
+    return bool(identifier) and not identifier.isdigit()
+
+
+def ids_from_statistics(statistics: Dict) -> Dict[str, Optional[str]]:
+    """Return the matchId and fixtureId carried by a stats response's periods."""
+    for period in (statistics or {}).values():
+        if isinstance(period, dict) and ('matchId' in period or 'fixtureId' in period):
+            return {'match_id': _clean(period.get('matchId')), 'fixture_id': _clean(period.get('fixtureId'))}
+    return {'match_id': None, 'fixture_id': None}
+
+
+class MatchIdIndex:
+    """Maps match codes, matchIds and fixtureIds to one entry per match."""
+
+    def __init__(self):
+        self.entries: Dict[str, Dict] = {}
+        self.aliases: Dict[str, str] = {}
+        self._next_key = 0
+
+    @staticmethod
+    def _alias_keys(entry: Dict) -> List[str]:
+        return [f"{prefix}{entry[kind]}" for kind, prefix in _ALIAS_PREFIXES.items() if entry.get(kind)]
+
+    def _candidates(self, identifier) -> List[str]:
+        identifier = _clean(identifier)
+        if not identifier:
+            return []
+        if identifier.isdigit():
+            # matchId and fixtureId are both numeric; matchId takes precedence
+            return [f"m:{identifier}", f"f:{identifier}"]
+        return [f"c:{identifier.upper()}"]
+
+    def resolve(self, identifier) -> Optional[Dict]:
+        """Return the entry for any known identifier of a match."""
+        for alias in self._candidates(identifier):
+            key = self.aliases.get(alias)
+            if key is not None:
+                return self.entries[key]
+        return None
+
+    def add(self, match_id=None, fixture_id=None, match_code=None, **locations) -> Dict:
+        """Record identifiers and storage locations for one match, merging known aliases."""
+        fields = {
+            'match_id': _clean(match_id),
+            'fixture_id': _clean(fixture_id),
+            'match_code': _clean(match_code).upper() if _clean(match_code) else None,
+        }
+        fields.update({name: _clean(value) for name, value in locations.items() if name in _ENTRY_FIELDS})
+
+        keys = []
+        for kind, prefix in _ALIAS_PREFIXES.items():
+            key = self.aliases.get(f"{prefix}{fields[kind]}") if fields[kind] else None
+            if key is not None and key not in keys:
+                keys.append(key)
+
+        if keys:
+            key = keys[0]
+            entry = self.entries[key]
+            # Two entries turned out to be the same match; fold the others into the first
+            for other_key in keys[1:]:
+                other = self.entries.pop(other_key)
+                for name, value in other.items():
+                    if value and not entry.get(name):
+                        entry[name] = value
+        else:
+            key = str(self._next_key)
+            self._next_key += 1
+            entry = self.entries[key] = dict.fromkeys(_ENTRY_FIELDS)
+
+        previous_aliases = self._alias_keys(entry)
+        for name, value in fields.items():
+            if value:
+                entry[name] = value
+        if fields.get('stats_file'):
+            # A new statistics location replaces the old one, key included
+            entry['stats_key'] = fields.get('stats_key')
+
+        current_aliases = self._alias_keys(entry)
+        for alias in set(previous_aliases) - set(current_aliases):
+            if self.aliases.get(alias) == key:
+                del self.aliases[alias]
+        for alias in current_aliases:
+            self.aliases[alias] = key
+        return entry
+
+    def add_schedule(self, matches: Iterable[Dict], matches_file: Optional[str] = None) -> int:
+        """Record schedule rows and the file they were saved to. Returns the number recorded."""
+        count = 0
+        for match in matches:
+            match_id = match.get('matchId')
+            match_code = next((match[field] for field in _CODE_FIELDS if match.get(field)), None)
+            if match_id is None and match_code is None:
+                continue
+            self.add(match_id=match_id, match_code=match_code, matches_file=matches_file)
+            count += 1
+        return count
+
+    def add_statistics(self, statistics: Dict, stats_file: Optional[str] = None,
+                       stats_key: Optional[str] = None, requested_id: Optional[str] = None) -> Dict:
+        """Record a stats response, the file it was saved to and the ID it was requested by.
+
+        stats_key is the match's key in a multi-match file's 'matches_statistics'
+        object, or None for a single-match file.
+        """
+        ids = ids_from_statistics(statistics)
+        match_code = requested_id if is_match_code(requested_id) else None
+        if not ids['match_id'] and requested_id and not match_code:
+            ids['match_id'] = requested_id
+        return self.add(match_code=match_code, stats_file=stats_file, stats_key=stats_key, **ids)
+
+    def load_statistics(self, identifiers: Iterable) -> Dict[str, Dict]:
+        """Return stored statistics for the identifiers that have them, keyed by identifier.
+
+        Identifiers are grouped by statistics file so each file is read at
+        most once; multi-match files are streamed and closed as soon as every
+        wanted match has been found.
+        """
+        wanted_by_file: Dict[str, Dict[Optional[str], List[str]]] = {}
+        for identifier in identifiers:
+            entry = self.resolve(identifier)
+            if not entry or not entry.get('stats_file') or not os.path.exists(entry['stats_file']):
+                continue
+            wanted_by_file.setdefault(entry['stats_file'], {}).setdefault(
+                entry.get('stats_key'), []).append(str(identifier))
+
+        found: Dict[str, Dict] = {}
+        for stats_file, wanted in wanted_by_file.items():
+            try:
+                if None in wanted:
+                    statistics = load_json(stats_file).get('statistics')
+                    if statistics:
+                        for identifier in wanted.pop(None):
+                            found[identifier] = statistics
+                if not wanted:
+                    continue
+                for stats_key, record in iter_match_statistics(stats_file):
+                    if stats_key in wanted and record.get('statistics'):
+                        for identifier in wanted.pop(stats_key):
+                            found[identifier] = record['statistics']
+                        if not wanted:
+                            break
+            except (OSError, ValueError, AttributeError) as e:
+                logger.warning("Could not read stored statistics from '%s': %s", stats_file, e)
+        return found
+
+    @classmethod
+    def load(cls, index_file: str = DEFAULT_ID_INDEX_FILE) -> 'MatchIdIndex':
+        """Load an index from disk, or return an empty one if it does not exist."""
+        index = cls()
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return index
+        except json.JSONDecodeError as e:
+            logger.warning("Match ID index '%s' is corrupt (%s); starting a new one", index_file, e)
+            return index
+
+        if data.get('version') != ID_INDEX_VERSION:
+            logger.warning("Match ID index '%s' has an unknown version; starting a new one", index_file)
+            return index
+
+        for entry in data.get('entries', []):
+            key = str(index._next_key)
+            index._next_key += 1
+            index.entries[key] = {name: entry.get(name) for name in _ENTRY_FIELDS}
+            for alias in index._alias_keys(entry):
+                index.aliases[alias] = key
+        return index
+
+    def save(self, index_file: str = DEFAULT_ID_INDEX_FILE) -> None:
+        """Write the index to disk."""
+        output_dir = os.path.dirname(index_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        data = {
+            'version': ID_INDEX_VERSION,
+            'updated_at': datetime.now().isoformat(),
+            'entries': [
+                {name: value for name, value in entry.items() if value is not None}
+                for entry in self.entries.values()
+            ],
+        }
+
+        # Write to a temporary file first so an interrupted save keeps the old index
+        temp_file = f"{index_file}.tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_file, index_file)
+        except IOError as e:
+            logger.error("Error saving match ID index: %s", e)
+
+
+def index_file_contents(index: MatchIdIndex, path: str) -> int:
+    """Add the matches in a schedule or statistics output file. Returns the number added."""
+    metadata: Dict = {}
+    count = 0
+    for section, item in iter_sections(path, ('matches', 'matches_statistics'), metadata):
+        if section == 'matches':
+            count += index.add_schedule([item], matches_file=path)
+        else:
+            stats_key, record = item
+            index.add_statistics(record.get('statistics') or {}, stats_file=path,
+                                 stats_key=stats_key, requested_id=stats_key)
+            count += 1
+
+    # Single-match statistics files carry the requested ID in their metadata
+    if 'statistics' in metadata:
+        requested_id = (metadata.get('metadata') or {}).get('match_id')
+        index.add_statistics(metadata['statistics'] or {}, stats_file=path, requested_id=requested_id)
+        count += 1
+    return count
+
+
+def main():
+    """Resolve identifiers or rebuild the match ID index."""
+    parser = argparse.ArgumentParser(
+        description='Resolve match codes, matchIds and fixtureIds to stored matches',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python match_ids.py NB052120625
+  python match_ids.py 233333 234826
+  python match_ids.py --rebuild h2hggl_data/completed_matches.json h2hggl_data/*_statistics.json
+        """
+    )
+
+    parser.add_argument('identifiers', nargs='*', help='Match codes, matchIds or fixtureIds to resolve')
+    parser.add_argument('--rebuild', nargs='+', metavar='FILE',
+                        help='Rebuild the index from completed matches or statistics files')
+    parser.add_argument('--index-file', default=DEFAULT_ID_INDEX_FILE,
+                        help=f'Index file (default: {DEFAULT_ID_INDEX_FILE})')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+    add_logging_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    if not args.rebuild and not args.identifiers:
+        parser.error('give identifiers to resolve or --rebuild FILE...')
+
+    if args.rebuild:
+        index = MatchIdIndex()
+        for path in args.rebuild:
+            try:
+                added = index_file_contents(index, path)
+            except (FileNotFoundError, ValueError) as e:
+                logger.error("Error reading '%s': %s", path, e)
+                return 1
+            logger.info("Indexed %d records from %s", added, path)
+        index.save(args.index_file)
+        logger.info("Saved match ID index with %d matches to %s", len(index.entries), args.index_file)
+    else:
+        index = MatchIdIndex.load(args.index_file)
+
+    unresolved = 0
+    for identifier in args.identifiers:
+        entry = index.resolve(identifier)
+        if entry is None:
+            logger.info("%s: unknown", identifier)
+            unresolved += 1
+            continue
+        logger.info(
+            "%s: code %s, matchId %s, fixtureId %s, stats %s",
+            identifier, entry['match_code'] or '-', entry['match_id'] or '-', entry['fixture_id'] or '-',
+            f"{entry['stats_file']}" + (f" [{entry['stats_key']}]" if entry['stats_key'] else '')
+            if entry['stats_file'] else '-',
+            extra={'fields': {'event': 'resolved', 'identifier': identifier, **entry}}
+        )
+    return 1 if unresolved else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
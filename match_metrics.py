@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Derived Match Metrics
+
+This module computes derived per-period metrics from raw match statistics
+once, at ingest time, so downstream scripts can read them instead of
+re-deriving them from the raw fields.
+
+Derived metrics (per period and side, stored under each match's 'derived' key):
+    margin                       home points minus away points
+    homeRunningScore/...         cumulative score through the period
+    homePossessions/...          FGA - offensive rebounds + turnovers + 0.44 * FTA
+    homeOffensiveRating/...      points per 100 possessions
+    homeEffectiveFieldGoalPercent/...  (FGM + 0.5 * 3PM) / FGA * 100
+
+Percentages are computed from the made/attempted counts rather than the
+rounded integer *Percent fields. Quarter count fields that come back null
+are imputed as the endMatch total minus the other quarters when possible,
+and a missing endMatch block is rebuilt from the quarter sums.
+
+Usage:
+    from match_metrics import enrich_batch
+    enrich_batch(all_stats)   # all_stats: {match_id: {'match_info': ..., 'statistics': ...}}
+"""
+
+from typing import Dict, List, Optional
+
+
+DERIVED_VERSION = 1
+
+QUARTERS = ('quarter1', 'quarter2', 'quarter3', 'quarter4')
+PERIODS = QUARTERS + ('endMatch',)
+SIDES = ('home', 'away')
+
+# Raw count fields the derived metrics are built from
+COUNT_FIELDS = (
+    'Points',
+    'FieldGoalsScored',
+    'FieldGoalsAttempted',
+    '3PointersScored',
+    'FreeThrowsAttempted',
+    'OffensiveRebounds',
+    'Turnovers',
+)
+
+# Weight of free-throw attempts in the possession estimate
+FREE_THROW_POSSESSION_FACTOR = 0.44
+
+
+def _extract_counts(statistics: Dict, imputed: List[str]) -> Dict[str, Optional[float]]:
+    """Return '{period}.{side}{field}' -> count for one match, filling nulls where possible."""
+    counts: Dict[str, Optional[float]] = {}
+
+    for side in SIDES:
+        for field in COUNT_FIELDS:
+            key = f'{side}{field}'
+            quarter_values = [(statistics.get(period) or {}).get(key) for period in QUARTERS]
+            end_value = (statistics.get('endMatch') or {}).get(key)
+
+            missing = [i for i, value in enumerate(quarter_values) if value is None]
+            if len(missing) == 1 and end_value is not None and any(p in statistics for p in QUARTERS):
+                index = missing[0]
+                known_total = sum(value for value in quarter_values if value is not None)
+                quarter_values[index] = max(end_value - known_total, 0)
+                if QUARTERS[index] in statistics:
+                    imputed.append(f'{QUARTERS[index]}.{key}')
+
+            if end_value is None and not missing:
+                end_value = sum(quarter_values)
+                if 'endMatch' not in statistics:
+                    imputed.append(f'endMatch.{key}')
+
+            for period, value in zip(QUARTERS, quarter_values):
+                counts[f'{period}.{key}'] = value
+            counts[f'endMatch.{key}'] = end_value
+
+    return counts
+
+
+def _round(value: Optional[float], digits: int) -> Optional[float]:
+    return None if value is None else round(value, digits)
+
+
+def enrich_batch(all_stats: Dict[str, Dict], force: bool = False) -> int:
+    """Compute derived metrics for a batch of match records in place.
+
+    Metrics are computed column-wise across the whole batch: one list per
+    raw field, one pass per derived metric. Records that already carry
+    metrics of the current version are skipped unless force is set.
+
+    Returns the number of records enriched.
+    """
+    match_ids = [
+        match_id for match_id, record in all_stats.items()
+        if force or (record.get('derived') or {}).get('version') != DERIVED_VERSION
+    ]
+    if not match_ids:
+        return 0
+
+    # Gather raw counts into columns
+    imputed_by_match: List[List[str]] = []
+    columns: Dict[str, List[Optional[float]]] = {}
+    for match_id in match_ids:
+        imputed: List[str] = []
+        counts = _extract_counts(all_stats[match_id].get('statistics') or {}, imputed)
+        imputed_by_match.append(imputed)
+        for key, value in counts.items():
+            columns.setdefault(key, []).append(value)
+
+    derived_columns: Dict[str, List[Optional[float]]] = {}
+
+    for period in PERIODS:
+        home_points = columns[f'{period}.homePoints']
+        away_points = columns[f'{period}.awayPoints']
+        derived_columns[f'{period}.margin'] = [
+            None if h is None or a is None else h - a
+            for h, a in zip(home_points, away_points)
+        ]
+
+        for side in SIDES:
+            fga = columns[f'{period}.{side}FieldGoalsAttempted']
+            fgm = columns[f'{period}.{side}FieldGoalsScored']
+            tpm = columns[f'{period}.{side}3PointersScored']
+            fta = columns[f'{period}.{side}FreeThrowsAttempted']
+            orb = columns[f'{period}.{side}OffensiveRebounds']
+            tov = columns[f'{period}.{side}Turnovers']
+            points = columns[f'{period}.{side}Points']
+
+            possessions = [
+                None if None in (a, o, t, f) else a - o + t + FREE_THROW_POSSESSION_FACTOR * f
+                for a, o, t, f in zip(fga, orb, tov, fta)
+            ]
+            derived_columns[f'{period}.{side}Possessions'] = [_round(p, 2) for p in possessions]
+            derived_columns[f'{period}.{side}OffensiveRating'] = [
+                None if p is None or not poss else round(100 * p / poss, 1)
+                for p, poss in zip(points, possessions)
+            ]
+            derived_columns[f'{period}.{side}EffectiveFieldGoalPercent'] = [
+                None if None in (m, t, a) or not a else round((m + 0.5 * t) / a * 100, 1)
+                for m, t, a in zip(fgm, tpm, fga)
+            ]
+
+    # Running score through each quarter; endMatch carries the final score
+    for side in SIDES:
+        running: List[Optional[float]] = [0] * len(match_ids)
+        for period in QUARTERS:
+            running = [
+                None if total is None or value is None else total + value
+                for total, value in zip(running, columns[f'{period}.{side}Points'])
+            ]
+            derived_columns[f'{period}.{side}RunningScore'] = running
+        derived_columns[f'endMatch.{side}RunningScore'] = columns[f'endMatch.{side}Points']
+
+    for period in PERIODS:
+        derived_columns[f'{period}.runningMargin'] = [
+            None if h is None or a is None else h - a
+            for h, a in zip(derived_columns[f'{period}.homeRunningScore'],
+                            derived_columns[f'{period}.awayRunningScore'])
+        ]
+
+    # Scatter the columns back into one 'derived' block per match
+    for row, match_id in enumerate(match_ids):
+        statistics = all_stats[match_id].get('statistics') or {}
+        derived: Dict = {'version': DERIVED_VERSION}
+        for period in PERIODS:
+            if period not in statistics and not (period == 'endMatch' and statistics):
+                continue
+            derived[period] = {}
+        for key, values in derived_columns.items():
+            period, metric = key.split('.', 1)
+            if period in derived:
+                derived[period][metric] = values[row]
+        if imputed_by_match[row]:
+            derived['imputedFields'] = imputed_by_match[row]
+        all_stats[match_id]['derived'] = derived
+
+    return len(match_ids)
+
+
+def derive_match_metrics(statistics: Dict) -> Dict:
+    """Compute the derived metrics block for a single match's statistics."""
+    batch = {'match': {'statistics': statistics}}
+    enrich_batch(batch, force=True)
+    return batch['match']['derived']
+
+
+def get_derived(record: Dict) -> Dict:
+    """Return a match record's derived metrics, computing them for older files that lack them."""
+    derived = record.get('derived')
+    if not derived or derived.get('version') != DERIVED_VERSION:
+        derived = derive_match_metrics(record.get('statistics') or {})
+        record['derived'] = derived
+    return derived
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Head-to-Head Matchup Index
+
+This module maintains a persistent index of head-to-head meetings, keyed by
+the unordered pair of teams and the unordered pair of players. Each pair
+keeps its match IDs sorted by startDate together with cumulative win and
+points counts, so "last N meetings" and "record between A and B since X"
+are answered with two binary searches instead of a scan over every match.
+
+The fetch scripts update the index incrementally as matches are fetched.
+
+Usage:
+    python matchup_index.py --team "Los Angeles Lakers" --team "Boston Celtics" --last 50
+    python matchup_index.py --player VELOCITY --player RAZE
+    python matchup_index.py --rebuild h2hggl_data/completed_matches.json
+
+    index = MatchupIndex.load('h2hggl_data/matchup_index.json')
+    index.add_matches(matches)
+    index.save('h2hggl_data/matchup_index.json')
+    result = index.meetings('Los Angeles Lakers', 'Boston Celtics', last=50)
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from data_io import iter_sections
+from logging_utils import add_logging_arguments, setup_logging_from_args
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_FILE = 'h2hggl_data/matchup_index.json'
+INDEX_VERSION = 1
+
+# Field names for each side, newest schedule format first
+_SIDE_FIELDS = {
+    'team': (('homeTeamName', 'teamAName'), ('awayTeamName', 'teamBName')),
+    'player': (('homeParticipantName', 'participantAName'), ('awayParticipantName', 'participantBName')),
+}
+_SCORE_FIELDS = (('homeScore', 'teamAScore'), ('awayScore', 'teamBScore'))
+
+
+def _first(match: Dict, fields: Tuple[str, ...]):
+    for field in fields:
+        value = match.get(field)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _normalize(name: str) -> str:
+    return ' '.join(str(name).split()).lower()
+
+
+def match_id_of(match: Dict) -> Optional[str]:
+    """Return a schedule row's or match_info record's match ID as a string."""
+    match_id = _first(match, ('matchId', 'id'))
+    return None if match_id is None else str(match_id)
+
+
+def match_sides(match: Dict) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """Return {'team': (home, away), 'player': (home, away)} names of a schedule row or match_info."""
+    return {kind: (_first(match, home_fields), _first(match, away_fields))
+            for kind, (home_fields, away_fields) in _SIDE_FIELDS.items()}
+
+
+def match_scores(match: Dict) -> Tuple[Optional[int], Optional[int]]:
+    """Return (home, away) final scores of a schedule row or match_info."""
+    return _first(match, _SCORE_FIELDS[0]), _first(match, _SCORE_FIELDS[1])
+
+
+class Matchup:
+    """Meetings between one unordered pair, sorted by startDate.
+
+    Side 'a' is the lexicographically smaller normalized name. The a_wins,
+    b_wins, a_points and b_points lists are cumulative, so any date range's
+    record is a difference of two entries.
+    """
+
+    __slots__ = ('a', 'b', 'dates', 'match_ids', 'a_wins', 'b_wins', 'a_points', 'b_points')
+
+    def __init__(self, a: str, b: str):
+        self.a = a
+        self.b = b
+        self.dates: List[str] = []
+        self.match_ids: List[str] = []
+        self.a_wins: List[int] = []
+        self.b_wins: List[int] = []
+        self.a_points: List[int] = []
+        self.b_points: List[int] = []
+
+    def insert(self, date: str, match_id: str, a_score: Optional[int], b_score: Optional[int]) -> None:
+        """Insert one meeting, keeping the lists sorted and the running totals correct."""
+        position = bisect_right(self.dates, date)
+
+        a_win = 1 if a_score is not None and b_score is not None and a_score > b_score else 0
+        b_win = 1 if a_score is not None and b_score is not None and b_score > a_score else 0
+
+        self.dates.insert(position, date)
+        self.match_ids.insert(position, match_id)
+        for column, value in ((self.a_wins, a_win), (self.b_wins, b_win),
+                              (self.a_points, a_score or 0), (self.b_points, b_score or 0)):
+            # Running totals after the insertion point all shift by this meeting's value
+            previous = column[position - 1] if position > 0 else 0
+            column.insert(position, previous + value)
+            for i in range(position + 1, len(column)):
+                column[i] += value
+
+    def _range(self, since: Optional[str], until: Optional[str], last: Optional[int]) -> Tuple[int, int]:
+        lo = bisect_left(self.dates, since) if since else 0
+        hi = bisect_right(self.dates, until) if until else len(self.dates)
+        if last is not None:
+            lo = max(lo, hi - last)
+        return lo, max(lo, hi)
+
+    @staticmethod
+    def _between(column: List[int], lo: int, hi: int) -> int:
+        if hi <= lo:
+            return 0
+        return column[hi - 1] - (column[lo - 1] if lo > 0 else 0)
+
+    def query(self, since: Optional[str] = None, until: Optional[str] = None,
+              last: Optional[int] = None) -> Dict:
+        """Return meetings (newest first) and the record over a date range."""
+        lo, hi = self._range(since, until, last)
+        meetings = hi - lo
+        a_wins = self._between(self.a_wins, lo, hi)
+        b_wins = self._between(self.b_wins, lo, hi)
+        return {
+            'a': self.a,
+            'b': self.b,
+            'meetings': meetings,
+            'a_wins': a_wins,
+            'b_wins': b_wins,
+            'ties': meetings - a_wins - b_wins,
+            'a_points': self._between(self.a_points, lo, hi),
+            'b_points': self._between(self.b_points, lo, hi),
+            'match_ids': self.match_ids[lo:hi][::-1],
+            'dates': self.dates[lo:hi][::-1],
+        }
+
+    def to_dict(self) -> Dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Matchup':
+        matchup = cls(data['a'], data['b'])
+        for slot in cls.__slots__[2:]:
+            setattr(matchup, slot, data.get(slot, []))
+        return matchup
+
+
+class MatchupIndex:
+    """Head-to-head index over teams and players."""
+
+    def __init__(self):
+        self.pairs: Dict[str, Dict[str, Matchup]] = {'team': {}, 'player': {}}
+        self.indexed_match_ids: Dict[str, set] = {kind: set() for kind in self.pairs}
+
+    @staticmethod
+    def pair_key(name_a: str, name_b: str) -> Tuple[str, bool]:
+        """Return the unordered pair key and whether name_a is side 'a'."""
+        a, b = _normalize(name_a), _normalize(name_b)
+        if a <= b:
+            return f"{a}|{b}", True
+        return f"{b}|{a}", False
+
+    def add_match(self, match: Dict) -> bool:
+        """Index one schedule row or match_info record. Returns False if skipped."""
+        match_id = match_id_of(match)
+        start_date = match.get('startDate')
+        if not match_id or not start_date:
+            return False
+
+        home_score, away_score = match_scores(match)
+
+        indexed = False
+        for kind, (home, away) in match_sides(match).items():
+            if home is None or away is None or match_id in self.indexed_match_ids[kind]:
+                continue
+
+            key, home_is_a = self.pair_key(home, away)
+            matchup = self.pairs[kind].get(key)
+            if matchup is None:
+                names = (str(home), str(away)) if home_is_a else (str(away), str(home))
+                matchup = self.pairs[kind][key] = Matchup(*names)
+
+            if home_is_a:
+                matchup.insert(start_date, match_id, home_score, away_score)
+            else:
+                matchup.insert(start_date, match_id, away_score, home_score)
+            self.indexed_match_ids[kind].add(match_id)
+            indexed = True
+
+        return indexed
+
+    def add_matches(self, matches: Iterable[Dict]) -> int:
+        """Index many matches, oldest first so inserts are appends. Returns the number added."""
+        ordered = sorted(matches, key=lambda match: match.get('startDate') or '')
+        return sum(1 for match in ordered if self.add_match(match))
+
+    def meetings(self, name_a: str, name_b: str, kind: str = 'team',
+                 last: Optional[int] = None, since: Optional[str] = None,
+                 until: Optional[str] = None) -> Optional[Dict]:
+        """Return head-to-head meetings and record oriented as name_a vs name_b."""
+        key, a_first = self.pair_key(name_a, name_b)
+        matchup = self.pairs[kind].get(key)
+        if matchup is None:
+            return None
+
+        result = matchup.query(since=since, until=until, last=last)
+        if not a_first:
+            result['a'], result['b'] = result['b'], result['a']
+            result['a_wins'], result['b_wins'] = result['b_wins'], result['a_wins']
+            result['a_points'], result['b_points'] = result['b_points'], result['a_points']
+        return result
+
+    @classmethod
+    def load(cls, index_file: str = DEFAULT_INDEX_FILE) -> 'MatchupIndex':
+        """Load an index from disk, or return an empty one if it does not exist."""
+        index = cls()
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return index
+        except json.JSONDecodeError as e:
+            logger.warning("Matchup index '%s' is corrupt (%s); starting a new one", index_file, e)
+            return index
+
+        if data.get('version') != INDEX_VERSION:
+            logger.warning("Matchup index '%s' has an unknown version; starting a new one", index_file)
+            return index
+
+        for kind in index.pairs:
+            index.pairs[kind] = {
+                key: Matchup.from_dict(entry) for key, entry in data.get(kind, {}).items()
+            }
+        for kind, match_ids in data.get('indexed_match_ids', {}).items():
+            index.indexed_match_ids[kind] = set(match_ids)
+        return index
+
+    def save(self, index_file: str = DEFAULT_INDEX_FILE) -> None:
+        """Write the index to disk."""
+        output_dir = os.path.dirname(index_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        data = {
+            'version': INDEX_VERSION,
+            'updated_at': datetime.now().isoformat(),
+            'indexed_match_ids': {kind: sorted(ids) for kind, ids in self.indexed_match_ids.items()},
+        }
+        for kind, pairs in self.pairs.items():
+            data[kind] = {key: matchup.to_dict() for key, matchup in pairs.items()}
+
+        # Write to a temporary file first so an interrupted save keeps the old index
+        temp_file = f"{index_file}.tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_file, index_file)
+        except IOError as e:
+            logger.error("Error saving matchup index: %s", e)
+
+
+def update_matchup_index(matches: Iterable[Dict], index_file: str = DEFAULT_INDEX_FILE) -> int:
+    """Add newly fetched matches to the on-disk index. Returns the number added."""
+    index = MatchupIndex.load(index_file)
+    added = index.add_matches(matches)
+    if added:
+        index.save(index_file)
+    logger.debug("Matchup index: %d new matches indexed in %s", added, index_file)
+    return added
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """Stream schedule rows or stats match_info records from an output file."""
+    for section, item in iter_sections(path, ('matches', 'matches_statistics')):
+        if section == 'matches':
+            yield item
+        else:
+            yield item[1].get('match_info', {})
+
+
+def main():
+    """Query or rebuild the matchup index."""
+    parser = argparse.ArgumentParser(
+        description='Query the head-to-head matchup index',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python matchup_index.py --team "Los Angeles Lakers" --team "Boston Celtics" --last 50
+  python matchup_index.py --player VELOCITY --player RAZE --since 2025-06-01
+  python matchup_index.py --rebuild h2hggl_data/completed_matches.json
+        """
+    )
+
+    query_group = parser.add_mutually_exclusive_group(required=True)
+    query_group.add_argument('--team', action='append', help='Team name (give exactly two)')
+    query_group.add_argument('--player', action='append', help='Player name (give exactly two)')
+    query_group.add_argument('--rebuild', nargs='+', metavar='FILE',
+                             help='Rebuild the index from completed matches or statistics files')
+
+    parser.add_argument('--last', type=int, help='Only the last N meetings')
+    parser.add_argument('--since', help='Only meetings on or after this date (YYYY-MM-DD)')
+    parser.add_argument('--until', help='Only meetings on or before this date (YYYY-MM-DD)')
+    parser.add_argument('--index-file', default=DEFAULT_INDEX_FILE,
+                        help=f'Index file (default: {DEFAULT_INDEX_FILE})')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+    add_logging_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    if args.rebuild:
+        index = MatchupIndex()
+        for path in args.rebuild:
+            try:
+                added = index.add_matches(iter_records(path))
+            except (FileNotFoundError, ValueError) as e:
+                logger.error("Error reading '%s': %s", path, e)
+                return 1
+            logger.info("Indexed %d matches from %s", added, path)
+        index.save(args.index_file)
+        logger.info("Saved matchup index with %d matches to %s", len(index.indexed_match_ids['team']), args.index_file)
+        return 0
+
+    kind, names = ('team', args.team) if args.team else ('player', args.player)
+    if len(names) != 2:
+        parser.error(f'--{kind} must be given exactly twice')
+
+    # Treat a bare --until date as inclusive of the whole day
+    until = f"{args.until}T23:59:59Z" if args.until and len(args.until) == 10 else args.until
+
+    index = MatchupIndex.load(args.index_file)
+    result = index.meetings(names[0], names[1], kind=kind, last=args.last, since=args.since, until=until)
+    if not result or not result['meetings']:
+        logger.info("No meetings found between %s and %s", names[0], names[1])
+        return 0
+
+    logger.info(
+        "%s vs %s: %d meetings, record %d-%d%s, points %d-%d",
+        result['a'], result['b'], result['meetings'], result['a_wins'], result['b_wins'],
+        f"-{result['ties']}" if result['ties'] else '', result['a_points'], result['b_points'],
+        extra={'fields': {'event': 'matchup', **{k: v for k, v in result.items() if k != 'dates'}}}
+    )
+    for match_id, date in zip(result['match_ids'], result['dates']):
+        logger.info("  %s  %s", date, match_id)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
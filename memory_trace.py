@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Memory Tracing
+
+This module records where a fetch run's memory goes. When enabled it
+starts tracemalloc and takes a sample at every phase boundary (after
+pagination, the statistics loop, enrichment, saving and index updates)
+and every N fetched matches. Each sample holds the traced Python memory,
+the traced peak since the previous sample, and the process's current and
+peak resident set size. Phase samples also keep a snapshot, so the report
+can list the allocation sites that grew most between the start of the
+run and its largest point, both by source line and by the line in this
+project that led to them (for example the response.json() call rather
+than json's decoder).
+
+The per-match samples give the memory growth per item, which is what
+decides whether a backfill of a given size fits in memory.
+
+Usage:
+    tracer = MemoryTracer(enabled=True, every=1000)
+    tracer.start()
+    for match in matches:
+        ...
+        tracer.items()
+    tracer.checkpoint('fetch')
+    tracer.save_report('h2hggl_data/completed_matches_memory.txt')
+
+When the tracer is disabled every method returns immediately. Tracing
+itself slows Python allocations down noticeably, and the snapshots add
+to the traced total, so only enable it for diagnosis.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVERY = 1000
+DEFAULT_FRAMES = 16
+DEFAULT_TOP = 15
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Allocations made by the tracing itself or by imports are not interesting
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+_MIB = 1024 * 1024
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, where the platform exposes it."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of this process in bytes."""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+class MemorySample:
+    """Memory figures at one point of a run."""
+
+    __slots__ = ('label', 'periodic', 'items', 'elapsed', 'traced', 'traced_peak', 'rss', 'peak_rss')
+
+    def __init__(self, label: str, periodic: bool, items: int, elapsed: float, traced: int, traced_peak: int,
+                 rss: Optional[int], peak_rss: Optional[int]):
+        self.label = label
+        self.periodic = periodic
+        self.items = items
+        self.elapsed = elapsed
+        self.traced = traced
+        self.traced_peak = traced_peak
+        self.rss = rss
+        self.peak_rss = peak_rss
+
+
+class MemoryTracer:
+    """Collects tracemalloc and RSS samples at phase boundaries and every N items."""
+
+    def __init__(self, enabled: bool = False, every: int = DEFAULT_EVERY, frames: int = DEFAULT_FRAMES,
+                 top: int = DEFAULT_TOP):
+        self.enabled = enabled
+        self.every = max(every, 1)
+        self.frames = frames
+        self.top = top
+        self.samples: List[MemorySample] = []
+        self.item_count = 0
+        self._next_sample = self.every
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._first_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._largest_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._largest_label = ''
+        self._largest_traced = -1
+
+    def start(self) -> None:
+        """Start tracing and take the reference sample."""
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self._started = time.perf_counter()
+        self.checkpoint('start')
+
+    def items(self, count: int = 1) -> None:
+        """Count processed items, sampling every N of them."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.item_count += count
+            if self.item_count < self._next_sample:
+                return
+            while self._next_sample <= self.item_count:
+                self._next_sample += self.every
+            self._sample(f'{self.item_count} items', periodic=True)
+
+    def checkpoint(self, label: str) -> None:
+        """Sample at a phase boundary and keep a snapshot for the allocation site report."""
+        if not self.enabled:
+            return
+        with self._lock:
+            sample = self._sample(label)
+            if sample is None:
+                return
+            if self._first_snapshot is not None and sample.traced <= self._largest_traced:
+                return
+            snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+            if self._first_snapshot is None:
+                self._first_snapshot = snapshot
+            else:
+                # Only the largest snapshot is kept, so tracing memory stays bounded
+                self._largest_snapshot = snapshot
+                self._largest_label = label
+            self._largest_traced = sample.traced
+
+    def _sample(self, label: str, periodic: bool = False) -> Optional[MemorySample]:
+        if not tracemalloc.is_tracing():
+            return None
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        sample = MemorySample(label, periodic, self.item_count, time.perf_counter() - self._started,
+                              traced, traced_peak, current_rss(), peak_rss())
+        self.samples.append(sample)
+        logger.debug(
+            "Memory at %s: traced %.1f MiB (peak %.1f MiB), RSS %s",
+            label, traced / _MIB, traced_peak / _MIB, _format_mib(sample.rss),
+            extra={'fields': {
+                'event': 'memory',
+                'label': label,
+                'items': self.item_count,
+                'traced_bytes': traced,
+                'traced_peak_bytes': traced_peak,
+                'rss_bytes': sample.rss,
+                'peak_rss_bytes': sample.peak_rss
+            }}
+        )
+        return sample
+
+    def stop(self) -> None:
+        if self.enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def growth_per_item(self) -> Optional[float]:
+        """Traced bytes added per item between the first and last per-item samples."""
+        counted = [sample for sample in self.samples if sample.periodic]
+        if len(counted) < 2 or counted[-1].items == counted[0].items:
+            return None
+        return (counted[-1].traced - counted[0].traced) / (counted[-1].items - counted[0].items)
+
+    def _top_lines(self) -> List[str]:
+        stats = self._largest_snapshot.compare_to(self._first_snapshot, 'lineno')
+        lines = []
+        for stat in stats[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size_diff / _MIB:>10.1f} {stat.count_diff:>10} "
+                         f"{_short_path(frame.filename)}:{frame.lineno}")
+        return lines
+
+    def _top_project_sites(self) -> List[str]:
+        """Growth grouped by the innermost frame in this project's source."""
+        sites: Dict[str, List[int]] = {}
+        for stat in self._largest_snapshot.compare_to(self._first_snapshot, 'traceback'):
+            site = '(outside project)'
+            for frame in reversed(stat.traceback):
+                if frame.filename.startswith(REPO_DIR):
+                    site = f'{_short_path(frame.filename)}:{frame.lineno}'
+                    break
+            totals = sites.setdefault(site, [0, 0])
+            totals[0] += stat.size_diff
+            totals[1] += stat.count_diff
+        ranked = sorted(sites.items(), key=lambda item: item[1][0], reverse=True)
+        return [f"{size / _MIB:>10.1f} {count:>10} {site}" for site, (size, count) in ranked[:self.top]]
+
+    def report(self) -> str:
+        """Build a text report of the samples and the largest allocation sites."""
+        lines = [
+            "Memory trace report",
+            f"  Generated at: {time.strftime('%Y-%m-%dT%H:%M:%S')}",
+            f"  Items: {self.item_count} (sampled every {self.every})",
+            f"  Peak traced: {_format_mib(max((s.traced_peak for s in self.samples), default=None))}",
+            f"  Peak RSS: {_format_mib(peak_rss())}",
+        ]
+        growth = self.growth_per_item()
+        if growth is not None:
+            lines.append(f"  Growth per item: {growth / 1024:.1f} KiB "
+                         f"({growth * 100000 / _MIB:.0f} MiB per 100k items)")
+        lines += [
+            "",
+            f"{'Sample':<20} {'Items':>9} {'Time (s)':>9} {'Traced':>11} {'Peak':>11} {'Delta':>11} "
+            f"{'B/item':>9} {'RSS':>11} {'Peak RSS':>11}",
+            "-" * 110,
+        ]
+
+        previous = None
+        for sample in self.samples:
+            delta = sample.traced - previous.traced if previous else 0
+            items = sample.items - previous.items if previous else 0
+            per_item = f"{delta / items:>9.0f}" if items else f"{'':>9}"
+            lines.append(
+                f"{sample.label[:20]:<20} {sample.items:>9} {sample.elapsed:>9.2f} {_format_mib(sample.traced):>11} "
+                f"{_format_mib(sample.traced_peak):>11} {delta / _MIB:>+7.1f} MiB {per_item} "
+                f"{_format_mib(sample.rss):>11} {_format_mib(sample.peak_rss):>11}"
+            )
+            previous = sample
+
+        if self._first_snapshot is not None and self._largest_snapshot is not None:
+            header = f"{'MiB':>10} {'Blocks':>10} Site"
+            lines += ["", f"=== Largest growth by line (start to '{self._largest_label}') ===", header]
+            lines += self._top_lines()
+            lines += ["", f"=== Largest growth by project call site (start to '{self._largest_label}') ===", header]
+            lines += self._top_project_sites()
+
+        return "\n".join(lines) + "\n"
+
+    def save_report(self, output_file: str) -> None:
+        """Write the memory report to a text file."""
+        report = self.report()
+
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        try:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(report)
+
+            logger.info("Memory report saved to %s", output_file)
+
+        except IOError as e:
+            logger.error("Error saving memory report: %s", e)
+
+
+def _format_mib(value: Optional[int]) -> str:
+    return '-' if value is None else f'{value / _MIB:.1f} MiB'
+
+
+def _short_path(path: str) -> str:
+    return os.path.relpath(path, REPO_DIR) if path.startswith(REPO_DIR) else path
+
+
+def add_memory_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the --trace-memory options shared by the fetch scripts."""
+    parser.add_argument(
+        '--trace-memory',
+        action='store_true',
+        help='Record tracemalloc and peak RSS samples per phase and write a memory report'
+    )
+    parser.add_argument(
+        '--trace-memory-every',
+        type=int,
+        default=DEFAULT_EVERY,
+        metavar='N',
+        help=f'Also sample every N matches (default: {DEFAULT_EVERY})'
+    )
+    parser.add_argument(
+        '--trace-memory-output',
+        help='Memory report path (default: <output>_memory.txt)'
+    )
+
+
+def memory_tracer_from_args(args: argparse.Namespace) -> MemoryTracer:
+    """Create and start the tracer selected by add_memory_arguments()."""
+    tracer = MemoryTracer(enabled=args.trace_memory, every=args.trace_memory_every)
+    tracer.start()
+    return tracer
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - League-Day Partitioned Storage
+
+This module stores schedule rows and match statistics in small files
+partitioned by league day and tournament, next to a manifest that records
+each partition's row count and min/max startDate:
+
+    h2hggl_data/partitions/
+        manifest.json
+        matches/day=2025-06-01/tournament=1.json
+        statistics/day=2025-06-01/tournament=1.json
+
+A league day runs from 04:00 to 03:59 (UTC, the zone of startDate), the
+same windows as the README's --from/--to examples. Writes merge into the
+affected partitions only, replacing rows by matchId, so an incremental
+fetch rewrites a few small files rather than the whole history. Readers
+consult the manifest and open only the partitions whose startDate range
+overlaps the query.
+
+Statistics without a schedule startDate (single-match fetches) go to the
+day=unknown partition, which is only read by queries without a date bound.
+When the same match later arrives with a startDate, its undated copy is
+removed so full scans see it once.
+
+Both fetch scripts write partitions as they save their output.
+
+Usage:
+    python partitions.py --list
+    python partitions.py --from "2025-06-01 04:00" --to "2025-06-02 03:59" --tournament 1
+    python partitions.py --day 2025-06-01 --statistics --output day_stats.json
+    python partitions.py --rebuild h2hggl_data/completed_matches.json h2hggl_data/*_statistics.json
+
+    store = PartitionStore('h2hggl_data/partitions')
+    store.add_matches(matches)
+    for match in store.iter_matches(start='2025-06-01 04:00', end='2025-06-02 03:59'):
+        ...
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from data_io import (add_compression_arguments, iter_file_records, iter_match_statistics, iter_matches,
+                     with_compression_extension, write_json, write_json_stream)
+from logging_utils import add_logging_arguments, setup_logging_from_args
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION_DIR = 'h2hggl_data/partitions'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# League days start at this hour of startDate's (UTC) clock
+DAY_START_HOUR = 4
+
+UNKNOWN = 'unknown'
+
+
+def parse_start(value) -> Optional[datetime]:
+    """Parse a startDate ('2025-06-01T10:43:00Z') or query time ('2025-06-01 04:00') as UTC."""
+    if not value:
+        return None
+    text = str(value).strip().replace('Z', '+00:00')
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def league_day(start_date) -> str:
+    """Return the league day ('YYYY-MM-DD') a startDate falls in, or 'unknown'."""
+    start = parse_start(start_date)
+    if start is None:
+        return UNKNOWN
+    return (start - timedelta(hours=DAY_START_HOUR)).date().isoformat()
+
+
+def day_bounds(day: str) -> Tuple[datetime, datetime]:
+    """Return the [start, end) UTC datetimes of a league day."""
+    start = datetime.fromisoformat(day).replace(hour=DAY_START_HOUR, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _stats_start(record: Dict) -> Optional[str]:
+    return (record.get('match_info') or {}).get('startDate')
+
+
+def _stats_tournament(record: Dict) -> Optional[str]:
+    return (record.get('match_info') or {}).get('tournamentId')
+
+
+def _partition_value(value) -> str:
+    return UNKNOWN if value in (None, '') else str(value)
+
+
+class PartitionStore:
+    """League-day x tournament partitions with a manifest for pruning."""
+
+    def __init__(self, root: str = DEFAULT_PARTITION_DIR, compress: Optional[str] = None,
+                 compress_level: Optional[int] = None):
+        self.root = root
+        self.compress = compress if compress != 'none' else None
+        self.compress_level = compress_level
+        self.manifest_path = os.path.join(root, MANIFEST_FILE)
+        self.partitions: Dict[str, Dict] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            logger.warning("Partition manifest '%s' is corrupt (%s); run --rebuild to restore it",
+                           self.manifest_path, e)
+            return {}
+
+        if data.get('version') != MANIFEST_VERSION or data.get('day_start_hour') != DAY_START_HOUR:
+            logger.warning("Partition manifest '%s' has an unknown layout; run --rebuild to restore it",
+                           self.manifest_path)
+            return {}
+        return data.get('partitions', {})
+
+    def _save_manifest(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        data = {
+            'version': MANIFEST_VERSION,
+            'day_start_hour': DAY_START_HOUR,
+            'updated_at': datetime.now().isoformat(),
+            'partitions': dict(sorted(self.partitions.items())),
+        }
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _key(kind: str, day: str, tournament: str) -> str:
+        return f"{kind}/{day}/{tournament}"
+
+    def _new_path(self, kind: str, day: str, tournament: str) -> str:
+        path = os.path.join(kind, f'day={day}', f'tournament={tournament}.json')
+        return with_compression_extension(path, self.compress)
+
+    def _read_partition(self, kind: str, entry: Dict) -> Iterator[Tuple[str, Dict]]:
+        path = os.path.join(self.root, entry['path'])
+        if not os.path.exists(path):
+            logger.warning("Partition file %s is missing; run --rebuild to restore it", path)
+            return
+        if kind == 'matches':
+            for match in iter_matches(path):
+                yield str(match.get('matchId')), match
+        else:
+            yield from iter_match_statistics(path)
+
+    def _write_partition(self, kind: str, day: str, tournament: str, new_rows: Dict[str, Dict]) -> None:
+        """Merge rows into one partition, replacing existing rows with the same matchId."""
+        key = self._key(kind, day, tournament)
+        entry = self.partitions.get(key)
+
+        rows: Dict[str, Dict] = dict(self._read_partition(kind, entry)) if entry else {}
+        rows.update(new_rows)
+        self._store_partition(kind, day, tournament, rows)
+
+    def _store_partition(self, kind: str, day: str, tournament: str, rows: Dict[str, Dict]) -> None:
+        key = self._key(kind, day, tournament)
+        entry = self.partitions.get(key)
+
+        start_of = (lambda row: row.get('startDate')) if kind == 'matches' else _stats_start
+        ordered = sorted(rows.items(), key=lambda item: (start_of(item[1]) or '', item[0]))
+        starts = [start for start in (start_of(row) for _, row in ordered) if start]
+
+        relative_path = entry['path'] if entry else self._new_path(kind, day, tournament)
+        path = os.path.join(self.root, relative_path)
+        metadata = {
+            'kind': kind,
+            'league_day': day,
+            'tournament_id': tournament,
+            'total_matches': len(ordered),
+            'fetched_at': datetime.now().isoformat(),
+        }
+        # Compression follows the partition's extension, fixed when it was first written
+        if kind == 'matches':
+            write_json_stream(path, metadata, 'matches', (row for _, row in ordered),
+                              level=self.compress_level)
+        else:
+            write_json_stream(path, metadata, 'matches_statistics', ordered, mapping=True,
+                              level=self.compress_level)
+
+        self.partitions[key] = {
+            'kind': kind,
+            'league_day': day,
+            'tournament_id': tournament,
+            'path': relative_path,
+            'rows': len(ordered),
+            'min_start': min(starts) if starts else None,
+            'max_start': max(starts) if starts else None,
+            'updated_at': metadata['fetched_at'],
+        }
+
+    def _drop_undated(self, kind: str, match_ids: set) -> int:
+        """Remove rows for match_ids from the day=unknown partitions, deleting emptied ones."""
+        dropped = 0
+        for key, entry in list(self.partitions.items()):
+            if entry['kind'] != kind or entry['league_day'] != UNKNOWN:
+                continue
+            rows = dict(self._read_partition(kind, entry))
+            stale = match_ids.intersection(rows)
+            if not stale:
+                continue
+            for match_id in stale:
+                del rows[match_id]
+            if rows:
+                self._store_partition(kind, UNKNOWN, entry['tournament_id'], rows)
+            else:
+                path = os.path.join(self.root, entry['path'])
+                if os.path.exists(path):
+                    os.remove(path)
+                del self.partitions[key]
+            dropped += len(stale)
+        return dropped
+
+    def _add(self, kind: str, grouped: Dict[Tuple[str, str], Dict[str, Dict]]) -> int:
+        for (day, tournament), rows in grouped.items():
+            self._write_partition(kind, day, tournament, rows)
+
+        # A dated row supersedes any copy stored under day=unknown earlier
+        dated = {match_id for (day, _), rows in grouped.items() if day != UNKNOWN for match_id in rows}
+        if dated:
+            dropped = self._drop_undated(kind, dated)
+            if dropped:
+                logger.debug("Removed %d undated %s row(s) now stored under their league day",
+                             dropped, kind)
+        if grouped:
+            self._save_manifest()
+        return len(grouped)
+
+    def add_matches(self, matches: Iterable[Dict]) -> int:
+        """Merge schedule rows into their partitions. Returns the number of partitions written."""
+        grouped: Dict[Tuple[str, str], Dict[str, Dict]] = {}
+        for match in matches:
+            if match.get('matchId') in (None, ''):
+                continue
+            partition = (league_day(match.get('startDate')), _partition_value(match.get('tournamentId')))
+            grouped.setdefault(partition, {})[str(match['matchId'])] = match
+        return self._add('matches', grouped)
+
+    def add_statistics(self, statistics: Dict[str, Dict]) -> int:
+        """Merge {match_id: {'match_info', 'statistics', ...}} records into their partitions."""
+        grouped: Dict[Tuple[str, str], Dict[str, Dict]] = {}
+        for match_id, record in statistics.items():
+            partition = (league_day(_stats_start(record)), _partition_value(_stats_tournament(record)))
+            grouped.setdefault(partition, {})[str(match_id)] = record
+        return self._add('statistics', grouped)
+
+    def select(self, kind: str, start: Optional[str] = None, end: Optional[str] = None,
+               tournaments: Optional[Iterable] = None) -> List[Dict]:
+        """Return the manifest entries of the partitions that can hold rows in [start, end]."""
+        start_at, end_at = parse_start(start), parse_start(end)
+        wanted = {str(tournament) for tournament in tournaments} if tournaments else None
+
+        selected = []
+        for entry in self.partitions.values():
+            if entry['kind'] != kind:
+                continue
+            if wanted is not None and entry['tournament_id'] not in wanted:
+                continue
+            if entry['league_day'] == UNKNOWN:
+                if start_at is None and end_at is None:
+                    selected.append(entry)
+                continue
+            low, high = parse_start(entry.get('min_start')), parse_start(entry.get('max_start'))
+            if low is None or high is None:
+                low, high = day_bounds(entry['league_day'])
+            if (end_at is not None and low > end_at) or (start_at is not None and high < start_at):
+                continue
+            selected.append(entry)
+        return sorted(selected, key=lambda entry: (entry['league_day'], entry['tournament_id']))
+
+    def _iter(self, kind: str, start: Optional[str], end: Optional[str],
+              tournaments: Optional[Iterable]) -> Iterator[Tuple[str, Dict]]:
+        start_at, end_at = parse_start(start), parse_start(end)
+        start_of = (lambda row: row.get('startDate')) if kind == 'matches' else _stats_start
+        for entry in self.select(kind, start, end, tournaments):
+            for match_id, row in self._read_partition(kind, entry):
+                if start_at is not None or end_at is not None:
+                    row_start = parse_start(start_of(row))
+                    if row_start is None or (start_at and row_start < start_at) or (end_at and row_start > end_at):
+                        continue
+                yield match_id, row
+
+    def iter_matches(self, start: Optional[str] = None, end: Optional[str] = None,
+                     tournaments: Optional[Iterable] = None) -> Iterator[Dict]:
+        """Stream schedule rows with startDate in [start, end], reading only overlapping partitions."""
+        for _, match in self._iter('matches', start, end, tournaments):
+            yield match
+
+    def iter_statistics(self, start: Optional[str] = None, end: Optional[str] = None,
+                        tournaments: Optional[Iterable] = None) -> Iterator[Tuple[str, Dict]]:
+        """Stream (match_id, record) statistics with startDate in [start, end]."""
+        return self._iter('statistics', start, end, tournaments)
+
+
+def update_partitions(partition_dir: str, matches: Optional[Iterable[Dict]] = None,
+                      statistics: Optional[Dict[str, Dict]] = None,
+                      compress: Optional[str] = None, compress_level: Optional[int] = None) -> None:
+    """Merge freshly fetched rows into the partitioned store, logging (not raising) write errors."""
+    try:
+        store = PartitionStore(partition_dir, compress=compress, compress_level=compress_level)
+        written = 0
+        if matches:
+            written += store.add_matches(matches)
+        if statistics:
+            written += store.add_statistics(statistics)
+        logger.debug("Updated %d partition(s) in %s", written, partition_dir)
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.error("Error updating partitions in '%s': %s", partition_dir, e)
+
+
+def main():
+    """Query, list or rebuild the partitioned store."""
+    parser = argparse.ArgumentParser(
+        description='Query league-day/tournament partitions of matches and statistics',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python partitions.py --list
+  python partitions.py --from "2025-06-01 04:00" --to "2025-06-02 03:59" --tournament 1
+  python partitions.py --day 2025-06-01 --statistics --output day_stats.json
+  python partitions.py --rebuild h2hggl_data/completed_matches.json h2hggl_data/*_statistics.json
+        """
+    )
+
+    parser.add_argument('--partition-dir', default=DEFAULT_PARTITION_DIR,
+                        help=f'Partition directory (default: {DEFAULT_PARTITION_DIR})')
+    parser.add_argument('--list', action='store_true', help='List partitions from the manifest')
+    parser.add_argument('--rebuild', nargs='+', metavar='FILE',
+                        help='Add completed matches or statistics files to the partitions (later files win)')
+    parser.add_argument('--from', dest='from_date', help='Start of the query range ("YYYY-MM-DD HH:MM", UTC)')
+    parser.add_argument('--to', dest='to_date', help='End of the query range ("YYYY-MM-DD HH:MM", UTC)')
+    parser.add_argument('--day', help='Query one league day (YYYY-MM-DD, 04:00 to 03:59)')
+    parser.add_argument('--tournament', nargs='+', help='Only these tournament IDs')
+    parser.add_argument('--statistics', action='store_true', help='Query statistics instead of schedule rows')
+    parser.add_argument('--output', help='Write the query result to a file instead of a summary')
+    add_compression_arguments(parser)
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    store = PartitionStore(args.partition_dir, compress=args.compress, compress_level=args.compress_level)
+
+    if args.rebuild:
+        for path in args.rebuild:
+            matches, statistics = [], {}
+            try:
+                for kind, match_id, _, record in iter_file_records(path):
+                    if kind == 'matches':
+                        matches.append(record)
+                    else:
+                        statistics[match_id] = record
+            except (OSError, ValueError) as e:
+                logger.error("Error reading '%s': %s", path, e)
+                return 1
+            written = store.add_matches(matches) + store.add_statistics(statistics)
+            logger.info("%s: %d matches, %d statistics into %d partition(s)",
+                        path, len(matches), len(statistics), written)
+        return 0
+
+    if args.list:
+        for key, entry in sorted(store.partitions.items()):
+            print(f"{key:<36} {entry['rows']:>6} rows  {entry.get('min_start') or '-'} .. "
+                  f"{entry.get('max_start') or '-'}")
+        return 0
+
+    start, end = args.from_date, args.to_date
+    if args.day:
+        day_start, day_end = day_bounds(args.day)
+        start = day_start.isoformat()
+        end = (day_end - timedelta(microseconds=1)).isoformat()
+
+    kind = 'statistics' if args.statistics else 'matches'
+    selected = store.select(kind, start, end, args.tournament)
+    logger.debug("Reading %d of %d partitions", len(selected), len(store.partitions))
+
+    if kind == 'matches':
+        rows = list(store.iter_matches(start, end, args.tournament))
+        data = {'metadata': {'total_matches': len(rows), 'from': start, 'to': end,
+                             'fetched_at': datetime.now().isoformat()}, 'matches': rows}
+    else:
+        rows = dict(store.iter_statistics(start, end, args.tournament))
+        data = {'metadata': {'total_matches': len(rows), 'from': start, 'to': end,
+                             'fetched_at': datetime.now().isoformat()}, 'matches_statistics': rows}
+
+    if args.output:
+        write_json(data, args.output, compress=args.compress, level=args.compress_level)
+        logger.info("Saved %d %s to %s", len(rows), kind, args.output)
+    else:
+        logger.info("%d %s in %d partition(s)", len(rows), kind, len(selected),
+                    extra={'fields': {'event': 'query', 'kind': kind, 'rows': len(rows),
+                                      'partitions': len(selected)}})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
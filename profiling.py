@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Phase Profiler
+
+This module provides low-overhead phase timing for the fetch and save
+pipeline. Each phase (auth, pagination, stats fetch, decode, transform,
+serialize, write) accumulates wall-clock and CPU time, and can optionally
+be run under cProfile to find the hot functions inside it.
+
+Usage:
+    profiler = PhaseProfiler(enabled=True, use_cprofile=True)
+    with profiler.phase('decode'):
+        data = response.json()
+    profiler.save_report('h2hggl_data/profile_report.txt')
+
+When the profiler is disabled, phase() returns a shared no-op context
+manager so the instrumentation costs a single method call per phase.
+Phases may run concurrently from worker threads; their wall times then
+overlap, so the wall percentages can add up to more than 100%.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+_NULL_PHASE = nullcontext()
+
+
+class PhaseStats:
+    """Accumulated timings for a single named phase."""
+
+    __slots__ = ('name', 'calls', 'wall', 'cpu', 'self_wall', 'self_cpu', 'profile')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.self_wall = 0.0
+        self.self_cpu = 0.0
+        self.profile: Optional[cProfile.Profile] = None
+
+
+class _Phase:
+    """Context manager timing one execution of a phase."""
+
+    __slots__ = ('profiler', 'stats', 'wall_start', 'cpu_start',
+                 'child_wall', 'child_cpu', 'profiling')
+
+    def __init__(self, profiler: 'PhaseProfiler', stats: PhaseStats):
+        self.profiler = profiler
+        self.stats = stats
+        self.child_wall = 0.0
+        self.child_cpu = 0.0
+        self.profiling = False
+
+    def __enter__(self) -> '_Phase':
+        profiler = self.profiler
+        stack = profiler._thread_stack()
+        stack.append(self)
+
+        # cProfile cannot nest, so nested and concurrent phases are attributed to the active profile
+        if profiler.use_cprofile:
+            with profiler._lock:
+                if profiler._active_profile is None:
+                    if self.stats.profile is None:
+                        self.stats.profile = cProfile.Profile()
+                    profiler._active_profile = self.stats.profile
+                    self.profiling = True
+            if self.profiling:
+                self.stats.profile.enable()
+
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+
+        profiler = self.profiler
+        if self.profiling:
+            self.stats.profile.disable()
+            profiler._active_profile = None
+
+        stats = self.stats
+        with profiler._lock:
+            stats.calls += 1
+            stats.wall += wall
+            stats.cpu += cpu
+            stats.self_wall += wall - self.child_wall
+            stats.self_cpu += cpu - self.child_cpu
+
+        stack = profiler._thread_stack()
+        stack.pop()
+        if stack:
+            parent = stack[-1]
+            parent.child_wall += wall
+            parent.child_cpu += cpu
+
+        return False
+
+
+class PhaseProfiler:
+    """Collects per-phase wall-clock and CPU timings for a single run."""
+
+    def __init__(self, enabled: bool = False, use_cprofile: bool = False):
+        self.enabled = enabled
+        self.use_cprofile = enabled and use_cprofile
+        self.phases: Dict[str, PhaseStats] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._active_profile: Optional[cProfile.Profile] = None
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def phase(self, name: str):
+        """Return a context manager that times the named phase."""
+        if not self.enabled:
+            return _NULL_PHASE
+
+        stats = self.phases.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.phases.setdefault(name, PhaseStats(name))
+        return _Phase(self, stats)
+
+    def _thread_stack(self) -> List[_Phase]:
+        """Return the open-phase stack for the calling thread."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def report(self, top_functions: int = 15) -> str:
+        """Build a text report ranking phases by self wall-clock time."""
+        total_wall = time.perf_counter() - self._wall_start
+        total_cpu = time.process_time() - self._cpu_start
+
+        ranked = sorted(self.phases.values(), key=lambda s: s.self_wall, reverse=True)
+        accounted_wall = sum(s.self_wall for s in ranked)
+        accounted_cpu = sum(s.self_cpu for s in ranked)
+
+        lines = [
+            "Phase profile report",
+            f"  Generated at: {time.strftime('%Y-%m-%dT%H:%M:%S')}",
+            f"  Total wall time: {total_wall:.3f}s",
+            f"  Total CPU time: {total_cpu:.3f}s",
+            "",
+            f"{'Phase':<14} {'Calls':>7} {'Wall (s)':>10} {'Wall %':>7} "
+            f"{'CPU (s)':>10} {'CPU %':>7} {'Avg (ms)':>10}",
+            "-" * 71,
+        ]
+
+        def _pct(value: float, total: float) -> float:
+            return (value / total * 100) if total > 0 else 0.0
+
+        for stats in ranked:
+            avg_ms = (stats.wall / stats.calls * 1000) if stats.calls else 0.0
+            lines.append(
+                f"{stats.name:<14} {stats.calls:>7} {stats.self_wall:>10.3f} "
+                f"{_pct(stats.self_wall, total_wall):>6.1f}% {stats.self_cpu:>10.3f} "
+                f"{_pct(stats.self_cpu, total_cpu):>6.1f}% {avg_ms:>10.2f}"
+            )
+
+        other_wall = max(total_wall - accounted_wall, 0.0)
+        other_cpu = max(total_cpu - accounted_cpu, 0.0)
+        lines.append(
+            f"{'(other)':<14} {'':>7} {other_wall:>10.3f} "
+            f"{_pct(other_wall, total_wall):>6.1f}% {other_cpu:>10.3f} "
+            f"{_pct(other_cpu, total_cpu):>6.1f}% {'':>10}"
+        )
+
+        for stats in ranked:
+            if stats.profile is None:
+                continue
+            # pstats is slow to import and only needed for cProfile reports
+            import pstats
+            buffer = io.StringIO()
+            pstats.Stats(stats.profile, stream=buffer).sort_stats('cumulative').print_stats(top_functions)
+            lines.append("")
+            lines.append(f"=== cProfile: {stats.name} ===")
+            lines.append(buffer.getvalue().rstrip())
+
+        return "\n".join(lines) + "\n"
+
+    def save_report(self, output_file: str) -> None:
+        """Write the profile report to a text file."""
+        report = self.report()
+
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        try:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(report)
+
+            logger.info("Profile report saved to %s", output_file)
+
+        except IOError as e:
+            logger.error("Error saving profile report: %s", e)
@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Incremental Team and Player Ratings
+
+This module keeps Elo- or Glicko-style ratings for every team and player,
+updated from completed matches in startDate order. Each match moves the
+ratings of its two teams and its two players; with margin-of-victory
+weighting (default) a blowout moves them further than a one-point game,
+damped when the favourite wins as expected.
+
+State lives in a directory (default h2hggl_data/ratings/):
+
+    state.json      current ratings, the last applied (startDate, matchId)
+                    and how much of the journal they include
+    journal.jsonl   one compact line per applied match, for replays
+    applied.db      SQLite index of the journal's match IDs
+    checkpoints/    rating snapshots every --checkpoint-every matches
+
+New matches cost O(new matches): only they are applied. A match starting
+after the last applied one is new without a lookup; one at or before it
+(a repeat from an overlapping fetch, or a late result) is looked up in
+applied.db. The index is derived from the journal and catches up with it
+when it falls behind. A match that starts before the last applied one (a late result) restores the newest
+checkpoint taken before it and replays the journal from there, so the
+ratings are exactly those of an in-order replay. fetch_completed_matches.py
+applies every fetched batch.
+
+Models:
+    elo      rating only; --k sets the update size
+    glicko   Glicko-1: rating plus rating deviation (RD) that shrinks with
+             games and grows again with inactivity
+
+Usage:
+    python ratings.py --top 20 --kind player
+    python ratings.py --name "VELOCITY" "RAZE" --kind player
+    python ratings.py --rebuild h2hggl_data/completed_matches*.json --model glicko
+    python ratings.py --apply h2hggl_data/completed_matches.json
+
+    engine = RatingEngine.load('h2hggl_data/ratings')
+    engine.apply(matches)
+    engine.save()
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from data_io import iter_matches
+from logging_utils import add_logging_arguments, setup_logging_from_args
+from matchup_index import match_id_of, match_scores, match_sides
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATINGS_DIR = 'h2hggl_data/ratings'
+RATINGS_VERSION = 1
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS applied (
+    match_id TEXT PRIMARY KEY,
+    offset   INTEGER NOT NULL
+);
+"""
+
+DEFAULT_CHECKPOINT_EVERY = 500
+DEFAULT_KEEP_CHECKPOINTS = 20
+
+_GLICKO_Q = math.log(10) / 400
+
+
+def mov_multiplier(margin: float, winner_rating_diff: float) -> float:
+    """Margin-of-victory weight: grows with the margin, shrinks when the favourite wins.
+
+    winner_rating_diff is the winner's pre-match rating minus the loser's.
+    """
+    if margin == 0:
+        return 1.0
+    # The denominator is floored so huge upsets stay finite
+    return (abs(margin) + 3) ** 0.8 / max(7.5 + 0.006 * winner_rating_diff, 2.5)
+
+
+def _days_between(earlier: Optional[str], later: Optional[str]) -> float:
+    if not earlier or not later:
+        return 0.0
+    try:
+        start = datetime.fromisoformat(earlier.replace('Z', '+00:00'))
+        end = datetime.fromisoformat(later.replace('Z', '+00:00'))
+    except ValueError:
+        return 0.0
+    return max((end - start).total_seconds() / 86400, 0.0)
+
+
+class EloModel:
+    """Classic Elo with optional margin-of-victory weighting."""
+
+    name = 'elo'
+
+    def __init__(self, k: float = 20.0, initial: float = 1500.0, home_advantage: float = 0.0,
+                 mov: bool = True):
+        self.k = k
+        self.initial = initial
+        self.home_advantage = home_advantage
+        self.mov = mov
+
+    def params(self) -> Dict:
+        return {'k': self.k, 'initial': self.initial, 'home_advantage': self.home_advantage, 'mov': self.mov}
+
+    def new_state(self) -> Dict:
+        return {'rating': self.initial, 'games': 0}
+
+    def expected(self, home: Dict, away: Dict) -> float:
+        """Probability that home beats away."""
+        return 1 / (1 + 10 ** ((away['rating'] - home['rating'] - self.home_advantage) / 400))
+
+    def update(self, home: Dict, away: Dict, score: float, margin: float, when: Optional[str]) -> None:
+        """Update both states in place; score is 1, 0.5 or 0 from home's side."""
+        expected = self.expected(home, away)
+        multiplier = 1.0
+        if self.mov:
+            diff = home['rating'] + self.home_advantage - away['rating']
+            multiplier = mov_multiplier(margin, diff if score > 0.5 else -diff)
+        delta = self.k * multiplier * (score - expected)
+        home['rating'] += delta
+        away['rating'] -= delta
+        home['games'] += 1
+        away['games'] += 1
+
+
+class GlickoModel:
+    """Glicko-1 with per-day RD growth and optional margin-of-victory weighting."""
+
+    name = 'glicko'
+
+    def __init__(self, initial: float = 1500.0, initial_rd: float = 350.0, min_rd: float = 30.0,
+                 rd_growth: float = 5.0, mov: bool = True):
+        self.initial = initial
+        self.initial_rd = initial_rd
+        self.min_rd = min_rd
+        self.rd_growth = rd_growth
+        self.mov = mov
+
+    def params(self) -> Dict:
+        return {'initial': self.initial, 'initial_rd': self.initial_rd, 'min_rd': self.min_rd,
+                'rd_growth': self.rd_growth, 'mov': self.mov}
+
+    def new_state(self) -> Dict:
+        return {'rating': self.initial, 'rd': self.initial_rd, 'games': 0, 'last': None}
+
+    @staticmethod
+    def _g(rd: float) -> float:
+        return 1 / math.sqrt(1 + 3 * (_GLICKO_Q * rd) ** 2 / math.pi ** 2)
+
+    def _inflate(self, state: Dict, when: Optional[str]) -> float:
+        """RD after the inactivity since the state's last game."""
+        days = _days_between(state.get('last'), when)
+        return min(math.sqrt(state['rd'] ** 2 + self.rd_growth ** 2 * days), self.initial_rd)
+
+    def expected(self, home: Dict, away: Dict) -> float:
+        """Probability that home beats away."""
+        combined = math.sqrt(home['rd'] ** 2 + away['rd'] ** 2)
+        return 1 / (1 + 10 ** (-self._g(combined) * (home['rating'] - away['rating']) / 400))
+
+    def update(self, home: Dict, away: Dict, score: float, margin: float, when: Optional[str]) -> None:
+        """Update both states in place; score is 1, 0.5 or 0 from home's side."""
+        rds = (self._inflate(home, when), self._inflate(away, when))
+        ratings = (home['rating'], away['rating'])
+        multiplier = 1.0
+        if self.mov:
+            diff = ratings[0] - ratings[1]
+            multiplier = mov_multiplier(margin, diff if score > 0.5 else -diff)
+
+        for index, (state, result) in enumerate(((home, score), (away, 1 - score))):
+            rating, rd = ratings[index], rds[index]
+            opponent_rating, opponent_rd = ratings[1 - index], rds[1 - index]
+            g = self._g(opponent_rd)
+            expected = 1 / (1 + 10 ** (-g * (rating - opponent_rating) / 400))
+            d_squared = 1 / (_GLICKO_Q ** 2 * g ** 2 * expected * (1 - expected))
+            precision = 1 / rd ** 2 + 1 / d_squared
+            state['rating'] = rating + multiplier * _GLICKO_Q / precision * g * (result - expected)
+            state['rd'] = max(math.sqrt(1 / precision), self.min_rd)
+            state['last'] = when
+            state['games'] += 1
+
+
+MODELS = {
+    'elo': EloModel,
+    'glicko': GlickoModel,
+}
+
+
+def create_model(name: str, **params):
+    """Create a rating model by name with the given parameters."""
+    if name not in MODELS:
+        raise ValueError(f"Unknown rating model '{name}' (choose from {', '.join(MODELS)})")
+    return MODELS[name](**params)
+
+
+def journal_row(match: Dict) -> Optional[Dict]:
+    """Compact the fields ratings need from a schedule row; None if it cannot be rated."""
+    match_id = match_id_of(match)
+    home_score, away_score = match_scores(match)
+    if not match_id or not match.get('startDate') or home_score is None or away_score is None:
+        return None
+    try:
+        scores = [float(home_score), float(away_score)]
+    except (TypeError, ValueError):
+        return None
+    row = {'id': match_id, 'start': match['startDate'], 'score': scores}
+    for kind, (home, away) in match_sides(match).items():
+        if home is not None and away is not None:
+            row[kind] = [str(home), str(away)]
+    return row
+
+
+def _entity_key(name: str) -> str:
+    return ' '.join(str(name).split()).lower()
+
+
+def _order(row: Dict) -> Tuple[str, str]:
+    return row['start'], row['id']
+
+
+class RatingEngine:
+    """Applies matches to ratings incrementally, with checkpoints for late results."""
+
+    def __init__(self, model, state_dir: str = DEFAULT_RATINGS_DIR,
+                 checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+                 keep_checkpoints: int = DEFAULT_KEEP_CHECKPOINTS):
+        self.model = model
+        self.state_dir = state_dir
+        self.checkpoint_every = checkpoint_every
+        self.keep_checkpoints = keep_checkpoints
+        self.ratings: Dict[str, Dict[str, Dict]] = {'team': {}, 'player': {}}
+        self.watermark: Optional[Tuple[str, str]] = None
+        self.applied = 0
+        # Bytes of the journal included in the saved state; later lines were never saved
+        self.journal_size: Optional[int] = 0
+
+    @property
+    def state_file(self) -> str:
+        return os.path.join(self.state_dir, 'state.json')
+
+    @property
+    def journal_file(self) -> str:
+        return os.path.join(self.state_dir, 'journal.jsonl')
+
+    @property
+    def checkpoint_dir(self) -> str:
+        return os.path.join(self.state_dir, 'checkpoints')
+
+    @property
+    def index_file(self) -> str:
+        return os.path.join(self.state_dir, 'applied.db')
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(self.state_dir, exist_ok=True)
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+        connection = sqlite3.connect(self.index_file, timeout=60, isolation_level=None)
+        connection.executescript(_INDEX_SCHEMA)
+        return connection
+
+    def _sync_index(self, connection: sqlite3.Connection) -> None:
+        """Trim the journal to the saved state and bring the ID index in line with it."""
+        size = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+        if self.journal_size is not None and size > self.journal_size:
+            logger.warning("Dropping journal entries after the saved ratings state in '%s'", self.journal_file)
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(self.journal_size)
+            size = self.journal_size
+
+        row = connection.execute("SELECT value FROM meta WHERE key = 'indexed_size'").fetchone()
+        indexed = int(row[0]) if row else 0
+        if indexed > size:
+            # Lines the index has seen were trimmed from the journal
+            connection.execute('DELETE FROM applied WHERE offset >= ?', (size,))
+            indexed = size
+        if indexed < size:
+            with open(self.journal_file, 'rb') as f:
+                f.seek(indexed)
+                offset = indexed
+                for line in f:
+                    if line.strip():
+                        connection.execute('INSERT OR REPLACE INTO applied (match_id, offset) VALUES (?, ?)',
+                                           (json.loads(line)['id'], offset))
+                    offset += len(line)
+        connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('indexed_size', ?)", (str(size),))
+
+    def _is_new(self, connection: sqlite3.Connection, row: Dict) -> bool:
+        if self.watermark is not None and _order(row) > tuple(self.watermark):
+            return True
+        return connection.execute('SELECT 1 FROM applied WHERE match_id = ?', (row['id'],)).fetchone() is None
+
+    def _apply_row(self, row: Dict) -> None:
+        home_score, away_score = row['score']
+        score = 1.0 if home_score > away_score else 0.0 if home_score < away_score else 0.5
+        margin = home_score - away_score
+        for kind, entities in self.ratings.items():
+            names = row.get(kind)
+            if not names:
+                continue
+            states = []
+            for name in names:
+                key = _entity_key(name)
+                if key not in entities:
+                    entities[key] = dict(self.model.new_state(), name=name)
+                states.append(entities[key])
+            self.model.update(states[0], states[1], score, margin, row['start'])
+
+        self.watermark = _order(row)
+        self.applied += 1
+        if self.checkpoint_every and self.applied % self.checkpoint_every == 0:
+            self._write_checkpoint()
+
+    def _write_checkpoint(self) -> None:
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = os.path.join(self.checkpoint_dir, f'checkpoint-{self.applied:09d}.json')
+        _write_atomic(path, {'applied': self.applied, 'watermark': list(self.watermark), 'ratings': self.ratings})
+
+        checkpoints = self._checkpoints()
+        for stale in checkpoints[:-self.keep_checkpoints] if self.keep_checkpoints else []:
+            os.remove(stale)
+
+    def _checkpoints(self) -> List[str]:
+        if not os.path.isdir(self.checkpoint_dir):
+            return []
+        return sorted(os.path.join(self.checkpoint_dir, name) for name in os.listdir(self.checkpoint_dir)
+                      if name.startswith('checkpoint-') and name.endswith('.json'))
+
+    def _restore_before(self, order: Tuple[str, str]) -> Optional[str]:
+        """Reset to the newest checkpoint taken before order (or to empty). Returns its path."""
+        restored = None
+        for path in reversed(self._checkpoints()):
+            with open(path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if tuple(checkpoint['watermark']) < order:
+                restored = path
+                self.ratings = checkpoint['ratings']
+                self.watermark = tuple(checkpoint['watermark'])
+                self.applied = checkpoint['applied']
+                break
+            # Checkpoints after the late match no longer match history
+            os.remove(path)
+
+        if restored is None:
+            self.ratings = {'team': {}, 'player': {}}
+            self.watermark = None
+            self.applied = 0
+        return restored
+
+    def _journal_after(self, order: Optional[Tuple[str, str]]) -> List[Dict]:
+        rows = []
+        if not os.path.exists(self.journal_file):
+            return rows
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if order is None or _order(row) > order:
+                    rows.append(row)
+        return rows
+
+    def apply(self, matches: Iterable[Dict]) -> Dict:
+        """Apply matches not seen before. Returns counts of applied, late and replayed matches."""
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            self._sync_index(connection)
+            new_rows: Dict[str, Dict] = {}
+            for match in matches:
+                row = journal_row(match)
+                if row and row['id'] not in new_rows and self._is_new(connection, row):
+                    new_rows[row['id']] = row
+            rows = sorted(new_rows.values(), key=_order)
+            summary = {'applied': len(rows), 'late': 0, 'replayed': 0, 'checkpoint': None}
+            if not rows:
+                connection.execute('COMMIT')
+                return summary
+
+            if self.watermark is not None and _order(rows[0]) < tuple(self.watermark):
+                summary['late'] = sum(1 for row in rows if _order(row) < tuple(self.watermark))
+                summary['checkpoint'] = self._restore_before(_order(rows[0]))
+                replay = self._journal_after(self.watermark)
+                summary['replayed'] = len(replay)
+                rows = sorted(replay + rows, key=_order)
+                logger.info("%d late match(es); replaying %d matches from %s", summary['late'], len(rows),
+                            summary['checkpoint'] or 'the start')
+
+            for row in rows:
+                self._apply_row(row)
+
+            with open(self.journal_file, 'ab') as f:
+                for row in new_rows.values():
+                    connection.execute('INSERT OR REPLACE INTO applied (match_id, offset) VALUES (?, ?)',
+                                       (row['id'], f.tell()))
+                    f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+                    f.write(b'\n')
+                self.journal_size = f.tell()
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('indexed_size', ?)",
+                               (str(self.journal_size),))
+            connection.execute('COMMIT')
+        return summary
+
+    def top(self, kind: str = 'team', limit: int = 20) -> List[Dict]:
+        """Highest-rated entities of a kind."""
+        ranked = sorted(self.ratings[kind].values(), key=lambda state: state['rating'], reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def rating(self, kind: str, name: str) -> Optional[Dict]:
+        """Current state of one team or player."""
+        return self.ratings[kind].get(_entity_key(name))
+
+    def reset(self) -> None:
+        """Forget all ratings, the journal and checkpoints."""
+        for path in self._checkpoints():
+            os.remove(path)
+        for path in (self.journal_file, self.index_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self.ratings = {'team': {}, 'player': {}}
+        self.watermark = None
+        self.applied = 0
+        self.journal_size = 0
+
+    @classmethod
+    def load(cls, state_dir: str = DEFAULT_RATINGS_DIR, model=None, **options) -> 'RatingEngine':
+        """Load saved state, or start empty with the given (or default Elo) model."""
+        engine = cls(model or EloModel(), state_dir, **options)
+        try:
+            with open(engine.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return engine
+        except json.JSONDecodeError as e:
+            logger.warning("Ratings state '%s' is corrupt (%s); run --rebuild to restore it", engine.state_file, e)
+            return engine
+
+        if data.get('version') != RATINGS_VERSION:
+            logger.warning("Ratings state '%s' has an unknown version; run --rebuild to restore it", engine.state_file)
+            return engine
+
+        stored = create_model(data['model'], **data.get('params', {}))
+        if model is not None and (model.name, model.params()) != (stored.name, stored.params()):
+            raise ValueError(f"Ratings in {state_dir} use {stored.name} {stored.params()}; "
+                             f"rebuild them to switch models")
+        engine.model = stored
+        engine.ratings = data.get('ratings', engine.ratings)
+        engine.watermark = tuple(data['watermark']) if data.get('watermark') else None
+        engine.applied = data.get('applied', 0)
+        # States written before journal_size was recorded cover the whole journal
+        engine.journal_size = data.get('journal_size')
+        return engine
+
+    def _saved_journal_size(self) -> int:
+        if self.journal_size is not None:
+            return self.journal_size
+        return os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+
+    def save(self) -> None:
+        """Write the current state to disk."""
+        _write_atomic(self.state_file, {
+            'version': RATINGS_VERSION,
+            'updated_at': datetime.now().isoformat(),
+            'model': self.model.name,
+            'params': self.model.params(),
+            'watermark': list(self.watermark) if self.watermark else None,
+            'applied': self.applied,
+            'journal_size': self._saved_journal_size(),
+            'ratings': self.ratings,
+        })
+
+
+def _write_atomic(path: str, data: Dict) -> None:
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def update_ratings(matches: Iterable[Dict], ratings_dir: str = DEFAULT_RATINGS_DIR) -> int:
+    """Apply newly fetched matches to the saved ratings. Returns the number applied."""
+    try:
+        engine = RatingEngine.load(ratings_dir)
+        summary = engine.apply(matches)
+        if summary['applied']:
+            engine.save()
+    except (OSError, ValueError) as e:
+        logger.error("Error updating ratings in '%s': %s", ratings_dir, e)
+        return 0
+    logger.debug("Ratings: %d new matches applied (%d late) in %s",
+                 summary['applied'], summary['late'], ratings_dir)
+    return summary['applied']
+
+
+def main():
+    """Show, apply or rebuild ratings."""
+    parser = argparse.ArgumentParser(
+        description='Incremental Elo/Glicko ratings for teams and players',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python ratings.py --top 20 --kind player
+  python ratings.py --name VELOCITY RAZE --kind player
+  python ratings.py --apply h2hggl_data/completed_matches.json
+  python ratings.py --rebuild h2hggl_data/completed_matches*.json --model glicko --no-mov
+        """
+    )
+
+    parser.add_argument('--ratings-dir', default=DEFAULT_RATINGS_DIR,
+                        help=f'Ratings state directory (default: {DEFAULT_RATINGS_DIR})')
+    parser.add_argument('--kind', choices=['team', 'player'], default='team', help='Entities to show (default: team)')
+    parser.add_argument('--top', type=int, default=20, help='Show the N highest ratings (default: 20)')
+    parser.add_argument('--name', nargs='+', help='Show these teams or players')
+    parser.add_argument('--apply', nargs='+', metavar='FILE', help='Apply new matches from completed matches files')
+    parser.add_argument('--rebuild', nargs='+', metavar='FILE',
+                        help='Discard saved ratings and rebuild from completed matches files')
+    parser.add_argument('--model', choices=sorted(MODELS), default='elo', help='Rating model for --rebuild (default: elo)')
+    parser.add_argument('--k', type=float, default=20.0, help='Elo K-factor for --rebuild (default: 20)')
+    parser.add_argument('--no-mov', action='store_true', help='Disable margin-of-victory weighting for --rebuild')
+    parser.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                        help=f'Matches between checkpoints (default: {DEFAULT_CHECKPOINT_EVERY})')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    options = {'checkpoint_every': args.checkpoint_every}
+    try:
+        if args.rebuild:
+            params = {'k': args.k} if args.model == 'elo' else {}
+            model = create_model(args.model, mov=not args.no_mov, **params)
+            engine = RatingEngine(model, args.ratings_dir, **options)
+            engine.reset()
+            files = args.rebuild
+        else:
+            engine = RatingEngine.load(args.ratings_dir, **options)
+            files = args.apply or []
+    except ValueError as e:
+        logger.error("Error: %s", e)
+        return 1
+
+    if files:
+        matches = []
+        for path in files:
+            try:
+                matches.extend(iter_matches(path))
+            except (OSError, ValueError) as e:
+                logger.error("Error reading '%s': %s", path, e)
+                return 1
+        summary = engine.apply(matches)
+        engine.save()
+        logger.info(
+            "Applied %d matches (%d late, %d replayed); %d rated in total",
+            summary['applied'], summary['late'], summary['replayed'], engine.applied,
+            extra={'fields': {'event': 'ratings_updated', **summary, 'total': engine.applied}}
+        )
+
+    if args.name:
+        states = [(name, engine.rating(args.kind, name)) for name in args.name]
+    else:
+        states = [(state['name'], state) for state in engine.top(args.kind, args.top)]
+
+    if not states:
+        logger.info("No %s ratings yet in %s", args.kind, args.ratings_dir)
+    for name, state in states:
+        if state is None:
+            print(f"{name:<30} not rated")
+            continue
+        deviation = f" ±{state['rd']:.0f}" if 'rd' in state else ''
+        print(f"{name:<30} {state['rating']:8.1f}{deviation}  ({state['games']} games)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Statistics Validation and Refetch Queue
+
+This script keeps a persistent queue of matches whose statistics need to
+be fetched again, so data gaps are fixed with a few requests instead of
+re-running a whole window:
+
+    failed       the fetch returned nothing (network error, 404, ...)
+    incomplete   a period is missing (quarter1-4, endMatch) or a core
+                 box-score field (points, field goals, 3-pointers, free
+                 throws, rebounds, assists, steals, blocks, turnovers) is
+                 missing or null for either side
+
+fetch_match_stats.py validates every payload it fetches and queues the
+failed and incomplete ones. A later fetch that returns complete data
+removes the match from the queue. The 'run' command fetches only the
+queued matches that are due; each unsuccessful attempt doubles the wait
+before the next one (from --base-delay up to --max-delay), and after
+--max-attempts the match is parked as gave_up until 'retry-gave-up'.
+
+Complete refetched statistics are written to one file per run in
+h2hggl_data/refetch/ and registered in the match ID index, so later runs
+use them instead of the incomplete copy; compact_data.py prefers them as
+they are newer.
+
+Usage:
+    python refetch.py status
+    python refetch.py run
+    python refetch.py run --all --limit 20
+    python refetch.py scan h2hggl_data/*_statistics.json
+    python refetch.py list --json
+
+Requires:
+    - requests library for HTTP requests (for 'run')
+    - Valid API authentication (automatically refreshed)
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from data_io import add_compression_arguments, iter_file_records, with_compression_extension
+from http_transport import add_transport_arguments
+from logging_utils import ProgressReporter, add_logging_arguments, setup_logging_from_args
+from match_ids import DEFAULT_ID_INDEX_FILE, MatchIdIndex
+from match_metrics import enrich_batch
+from matchup_index import match_id_of
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFETCH_DB = 'h2hggl_data/refetch.db'
+DEFAULT_OUTPUT_DIR = 'h2hggl_data/refetch'
+DEFAULT_BASE_DELAY = 300
+DEFAULT_MAX_DELAY = 86400
+DEFAULT_MAX_ATTEMPTS = 6
+
+EXPECTED_PERIODS = ('quarter1', 'quarter2', 'quarter3', 'quarter4', 'endMatch')
+CORE_FIELDS = (
+    'Points', 'FieldGoalsScored', 'FieldGoalsAttempted', '3PointersScored', '3PointersAttempted',
+    'FreeThrowsScored', 'FreeThrowsAttempted', 'OffensiveRebounds', 'DefensiveRebounds',
+    'Assists', 'Steals', 'Blocks', 'Turnovers',
+)
+
+# Reasons and states
+FAILED = 'failed'
+INCOMPLETE = 'incomplete'
+PENDING = 'pending'
+GAVE_UP = 'gave_up'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS refetch (
+    match_id     TEXT PRIMARY KEY,
+    match_info   TEXT,
+    reason       TEXT NOT NULL,
+    problems     TEXT,
+    status       TEXT NOT NULL DEFAULT 'pending',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    first_seen   REAL NOT NULL,
+    updated_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refetch_due ON refetch (status, next_attempt);
+"""
+
+
+def validate_stats(statistics: Optional[Dict]) -> List[str]:
+    """Problems that make a statistics payload incomplete; empty if it is complete."""
+    if not statistics:
+        return ['no statistics']
+    problems = []
+    for period in EXPECTED_PERIODS:
+        values = statistics.get(period)
+        if not isinstance(values, dict) or not values:
+            problems.append(f'missing period {period}')
+            continue
+        for field in CORE_FIELDS:
+            for side in ('home', 'away'):
+                name = f'{side}{field}'
+                if name not in values:
+                    problems.append(f'{period}.{name} missing')
+                elif values[name] is None:
+                    problems.append(f'{period}.{name} is null')
+    return problems
+
+
+def backoff_delay(attempts: int, base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY) -> float:
+    """Seconds to wait after the given number of unsuccessful attempts."""
+    return min(base_delay * 2 ** max(attempts - 1, 0), max_delay)
+
+
+class RefetchQueue:
+    """SQLite-backed queue of matches to refetch, with exponential backoff."""
+
+    def __init__(self, db_file: str = DEFAULT_REFETCH_DB, busy_timeout: float = 60):
+        self.db_file = db_file
+        self.busy_timeout = busy_timeout
+
+        db_dir = os.path.dirname(db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_file, timeout=self.busy_timeout, isolation_level=None)
+
+    def add(self, entries: Iterable[Tuple[str, Optional[Dict], str, List[str]]]) -> int:
+        """Queue (match_id, match_info, reason, problems) entries, due at once. Returns how many are new.
+
+        Matches already queued keep their attempts and backoff; only their
+        reason, problems and match_info are refreshed.
+        """
+        now = time.time()
+        added = 0
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            for match_id, match_info, reason, problems in entries:
+                match_info_json = json.dumps(match_info, ensure_ascii=False) if match_info else None
+                problems_json = json.dumps(problems, ensure_ascii=False)
+                inserted = connection.execute(
+                    'INSERT OR IGNORE INTO refetch (match_id, match_info, reason, problems, next_attempt, first_seen, '
+                    'updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (match_id, match_info_json, reason, problems_json, now, now, now)
+                ).rowcount
+                if inserted:
+                    added += 1
+                    continue
+                connection.execute(
+                    'UPDATE refetch SET reason = ?, problems = ?, match_info = COALESCE(?, match_info), updated_at = ? '
+                    'WHERE match_id = ?',
+                    (reason, problems_json, match_info_json, now, match_id)
+                )
+            connection.execute('COMMIT')
+        return added
+
+    def record_attempt(self, match_id: str, reason: str, problems: List[str],
+                       max_attempts: int = DEFAULT_MAX_ATTEMPTS, base_delay: float = DEFAULT_BASE_DELAY,
+                       max_delay: float = DEFAULT_MAX_DELAY) -> str:
+        """Count an unsuccessful refetch and schedule the next one. Returns the match's new status."""
+        now = time.time()
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT attempts FROM refetch WHERE match_id = ?', (match_id,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            status = GAVE_UP if attempts >= max_attempts else PENDING
+            connection.execute(
+                'UPDATE refetch SET attempts = ?, status = ?, reason = ?, problems = ?, next_attempt = ?, '
+                'updated_at = ? WHERE match_id = ?',
+                (attempts, status, reason, json.dumps(problems, ensure_ascii=False),
+                 now + backoff_delay(attempts, base_delay, max_delay), now, match_id)
+            )
+            connection.execute('COMMIT')
+        return status
+
+    def resolve(self, match_ids: Iterable[str]) -> int:
+        """Remove matches whose statistics are now complete. Returns how many were queued."""
+        match_ids = [(match_id,) for match_id in match_ids]
+        if not match_ids:
+            return 0
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            before = connection.total_changes
+            connection.executemany('DELETE FROM refetch WHERE match_id = ?', match_ids)
+            removed = connection.total_changes - before
+            connection.execute('COMMIT')
+        return removed
+
+    def entries(self, status: Optional[str] = None, due_only: bool = False, limit: Optional[int] = None) -> List[Dict]:
+        """Queued matches, soonest due first."""
+        clauses, parameters = [], []
+        if status:
+            clauses.append('status = ?')
+            parameters.append(status)
+        if due_only:
+            clauses.append('next_attempt <= ?')
+            parameters.append(time.time())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        query = f'SELECT * FROM refetch {where} ORDER BY next_attempt, match_id'
+        if limit:
+            query += f' LIMIT {int(limit)}'
+        with closing(self._connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            rows = [dict(row) for row in connection.execute(query, parameters)]
+        for row in rows:
+            row['match_info'] = json.loads(row['match_info']) if row['match_info'] else None
+            row['problems'] = json.loads(row['problems']) if row['problems'] else []
+        return rows
+
+    def match_ids(self) -> Set[str]:
+        """IDs of every queued match, parked ones included."""
+        with closing(self._connect()) as connection:
+            return {row[0] for row in connection.execute('SELECT match_id FROM refetch')}
+
+    def due(self, limit: Optional[int] = None, ignore_backoff: bool = False) -> List[Dict]:
+        """Pending matches whose backoff has elapsed (or all pending ones)."""
+        return self.entries(PENDING, due_only=not ignore_backoff, limit=limit)
+
+    def retry_gave_up(self) -> int:
+        """Put every parked match back in the queue with a fresh attempt count."""
+        now = time.time()
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            count = connection.execute(
+                'UPDATE refetch SET status = ?, attempts = 0, next_attempt = ?, updated_at = ? WHERE status = ?',
+                (PENDING, now, now, GAVE_UP)
+            ).rowcount
+            connection.execute('COMMIT')
+        return count
+
+    def counts(self) -> Dict[str, int]:
+        """Matches due now, waiting for their backoff, and parked, plus a count per reason."""
+        now = time.time()
+        with closing(self._connect()) as connection:
+            due, waiting, gave_up = connection.execute(
+                'SELECT COALESCE(SUM(status = ? AND next_attempt <= ?), 0), '
+                'COALESCE(SUM(status = ? AND next_attempt > ?), 0), COALESCE(SUM(status = ?), 0) FROM refetch',
+                (PENDING, now, PENDING, now, GAVE_UP)
+            ).fetchone()
+            reasons = dict(connection.execute('SELECT reason, COUNT(*) FROM refetch GROUP BY reason').fetchall())
+        return {'due': due, 'waiting': waiting, GAVE_UP: gave_up,
+                FAILED: reasons.get(FAILED, 0), INCOMPLETE: reasons.get(INCOMPLETE, 0)}
+
+
+def _failed_entry(match) -> Optional[Tuple[str, Optional[Dict], str, List[str]]]:
+    if isinstance(match, dict):
+        match_id = match_id_of(match)
+        return (match_id, match, FAILED, ['no statistics returned']) if match_id else None
+    return (str(match), None, FAILED, ['no statistics returned']) if match not in (None, '') else None
+
+
+def update_refetch_queue(db_file: str = DEFAULT_REFETCH_DB, statistics: Optional[Dict[str, Dict]] = None,
+                         failed: Optional[Iterable] = None) -> Tuple[int, int]:
+    """Queue failed matches and incomplete statistics records; drop complete ones from the queue.
+
+    failed holds schedule rows or match IDs. Returns (newly queued, resolved).
+    """
+    entries, complete = [], []
+    for match_id, record in (statistics or {}).items():
+        problems = validate_stats(record.get('statistics'))
+        if problems:
+            entries.append((str(match_id), record.get('match_info'), INCOMPLETE, problems))
+        else:
+            complete.append(str(match_id))
+    entries += [entry for entry in (_failed_entry(match) for match in failed or []) if entry]
+
+    try:
+        queue = RefetchQueue(db_file)
+        added = queue.add(entries)
+        resolved = queue.resolve(complete)
+    except (OSError, sqlite3.Error) as e:
+        logger.error("Error updating refetch queue '%s': %s", db_file, e)
+        return 0, 0
+
+    if entries:
+        logger.info(
+            "%d match(es) with failed or incomplete statistics in the refetch queue (%d new)", len(entries), added,
+            extra={'fields': {'event': 'refetch_queued', 'count': len(entries), 'new': added}}
+        )
+    logger.debug("Refetch queue: %d resolved", resolved)
+    return added, resolved
+
+
+def run_refetch(queue: RefetchQueue, fetcher, entries: List[Dict], output_dir: str = DEFAULT_OUTPUT_DIR,
+                id_index_file: Optional[str] = DEFAULT_ID_INDEX_FILE, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                compress: Optional[str] = None, compress_level: Optional[int] = None,
+                verbose: bool = False) -> Dict:
+    """Refetch the given queue entries, save complete results and reschedule the rest."""
+    totals = {'fetched': 0, 'resolved': 0, 'failed': 0, 'incomplete': 0, 'gave_up': 0, 'output': None}
+    complete: Dict[str, Dict] = {}
+    progress = ProgressReporter(total=len(entries), label="Refetching", unit="matches")
+
+    for entry in entries:
+        match_id = entry['match_id']
+        stats = fetcher.fetch_match_stats(match_id, verbose=verbose)
+        progress.update()
+        totals['fetched'] += 1
+        problems = validate_stats(stats)
+        if not problems:
+            complete[match_id] = {'match_info': entry['match_info'] or {'matchId': match_id}, 'statistics': stats}
+            continue
+
+        reason = FAILED if not stats else INCOMPLETE
+        totals[reason] += 1
+        status = queue.record_attempt(match_id, reason, problems, max_attempts, base_delay, max_delay)
+        if status == GAVE_UP:
+            totals['gave_up'] += 1
+            logger.warning("Giving up on match %s after %d attempts: %s", match_id, max_attempts, problems[0])
+        else:
+            logger.debug("Match %s still %s: %s", match_id, reason, ', '.join(problems[:3]))
+    progress.close()
+
+    if complete:
+        enrich_batch(complete)
+        stamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        output_file = with_compression_extension(os.path.join(output_dir, f'stats_{stamp}.json'), compress)
+        fetcher.save_stats_to_file(complete, output_file, compress=compress, compress_level=compress_level)
+        totals['output'] = output_file
+
+        if id_index_file:
+            id_index = MatchIdIndex.load(id_index_file)
+            for match_id, record in complete.items():
+                id_index.add_statistics(record['statistics'], stats_file=output_file,
+                                        stats_key=match_id, requested_id=match_id)
+            id_index.save(id_index_file)
+        totals['resolved'] = queue.resolve(complete)
+
+    return totals
+
+
+def scan_files(paths: List[str]) -> Tuple[Dict[str, Dict], int]:
+    """Statistics records from output files, newest copy per match. Returns (records, files read)."""
+    newest: Dict[str, Tuple[str, Dict]] = {}
+    for path in paths:
+        for kind, match_id, fetched_at, record in iter_file_records(path):
+            if kind == 'statistics' and (match_id not in newest or fetched_at >= newest[match_id][0]):
+                newest[match_id] = (fetched_at, record)
+    return {match_id: record for match_id, (_, record) in newest.items()}, len(paths)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(
+        description='Refetch matches with failed or incomplete statistics',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python refetch.py status
+  python refetch.py run
+  python refetch.py run --all --limit 20
+  python refetch.py scan h2hggl_data/*_statistics.json
+  python refetch.py list --json
+        """
+    )
+
+    parser.add_argument(
+        'command',
+        choices=['run', 'status', 'list', 'scan', 'retry-gave-up'],
+        help='run: refetch due matches; status: show counts; list: show queued matches; '
+             'scan: validate statistics files and queue incomplete matches; retry-gave-up: re-queue parked matches'
+    )
+    parser.add_argument('files', nargs='*', metavar='FILE', help='scan: statistics files to validate')
+    parser.add_argument('--refetch-db', default=DEFAULT_REFETCH_DB,
+                        help=f'Refetch queue database (default: {DEFAULT_REFETCH_DB})')
+
+    # run
+    parser.add_argument('--limit', type=int, help='run/list: at most this many matches')
+    parser.add_argument('--all', action='store_true', help='run: ignore the backoff and refetch every pending match')
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f'run: attempts before a match is parked as gave_up (default: {DEFAULT_MAX_ATTEMPTS})')
+    parser.add_argument('--base-delay', type=float, default=DEFAULT_BASE_DELAY,
+                        help=f'run: seconds before the second attempt, doubled each time (default: {DEFAULT_BASE_DELAY})')
+    parser.add_argument('--max-delay', type=float, default=DEFAULT_MAX_DELAY,
+                        help=f'run: longest wait between attempts in seconds (default: {DEFAULT_MAX_DELAY})')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help=f'run: directory for refetched statistics (default: {DEFAULT_OUTPUT_DIR})')
+    parser.add_argument('--id-index', default=DEFAULT_ID_INDEX_FILE,
+                        help=f'run: match ID index pointed at the refetched statistics (default: {DEFAULT_ID_INDEX_FILE})')
+    parser.add_argument('--no-id-index', action='store_true', help='run: do not update the match ID index')
+
+    # list
+    parser.add_argument('--status', choices=[PENDING, GAVE_UP], help='list: only matches in this state')
+    parser.add_argument('--json', action='store_true', help='list: print entries as JSON lines')
+
+    parser.add_argument(
+        '--auth-token',
+        help='API authentication token (default: cached token from auth_token.json, refreshed if missing or expired)'
+    )
+
+    add_transport_arguments(parser)
+
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+
+    add_logging_arguments(parser)
+    add_compression_arguments(parser)
+
+    return parser.parse_args()
+
+
+def main():
+    """Main function to execute a refetch command."""
+
+    args = parse_arguments()
+    setup_logging_from_args(args)
+
+    try:
+        queue = RefetchQueue(args.refetch_db)
+
+        if args.command == 'run':
+            entries = queue.due(limit=args.limit, ignore_backoff=args.all)
+            if not entries:
+                counts = queue.counts()
+                logger.info("Nothing due (%d waiting for backoff, %d given up)", counts['waiting'], counts[GAVE_UP])
+                return 0
+
+            # The fetcher is only needed when there is work
+            from fetch_match_stats import H2HMatchStatsFetcher
+
+            fetcher = H2HMatchStatsFetcher(transport=args.transport)
+            if args.auth_token:
+                fetcher.set_auth_token(args.auth_token)
+            totals = run_refetch(
+                queue, fetcher, entries, output_dir=args.output_dir,
+                id_index_file=None if args.no_id_index else args.id_index,
+                max_attempts=args.max_attempts, base_delay=args.base_delay, max_delay=args.max_delay,
+                compress=args.compress, compress_level=args.compress_level, verbose=args.verbose
+            )
+            logger.info(
+                "\nRefetch finished:\n"
+                "  Requests: %d\n"
+                "  Resolved: %d\n"
+                "  Still failed: %d\n"
+                "  Still incomplete: %d\n"
+                "  Gave up: %d\n"
+                "  Output file: %s",
+                totals['fetched'], totals['resolved'], totals['failed'], totals['incomplete'], totals['gave_up'],
+                totals['output'] or '-',
+                extra={'fields': {'event': 'refetch_finished', **totals}}
+            )
+
+        elif args.command == 'status':
+            counts = queue.counts()
+            logger.info(
+                "Refetch queue %s:\n"
+                "  Due now: %d\n"
+                "  Waiting for backoff: %d\n"
+                "  Gave up: %d\n"
+                "  Failed fetches: %d\n"
+                "  Incomplete statistics: %d",
+                args.refetch_db, counts['due'], counts['waiting'], counts[GAVE_UP], counts[FAILED], counts[INCOMPLETE],
+                extra={'fields': {'event': 'refetch_status', **counts}}
+            )
+
+        elif args.command == 'list':
+            for entry in queue.entries(args.status, limit=args.limit):
+                if args.json:
+                    print(json.dumps(entry, ensure_ascii=False))
+                    continue
+                next_attempt = datetime.fromtimestamp(entry['next_attempt']).strftime('%Y-%m-%d %H:%M')
+                problems = entry['problems']
+                summary = problems[0] + (f' (+{len(problems) - 1} more)' if len(problems) > 1 else '') if problems else ''
+                print(f"{entry['match_id']:<14} {entry['status']:<8} {entry['reason']:<11} "
+                      f"attempts {entry['attempts']:<3} next {next_attempt}  {summary}")
+
+        elif args.command == 'scan':
+            if not args.files:
+                logger.error("Error: scan needs one or more statistics files")
+                return 1
+            records, files = scan_files(args.files)
+            added, resolved = update_refetch_queue(args.refetch_db, statistics=records)
+            logger.info("Scanned %d statistics records in %d file(s): %d newly queued, %d resolved",
+                        len(records), files, added, resolved)
+
+        else:
+            logger.info("Re-queued %d matches", queue.retry_gave_up())
+
+    except KeyboardInterrupt:
+        logger.warning("\nOperation cancelled by user.")
+    except (sqlite3.Error, ValueError, OSError) as e:
+        logger.error("Error: %s", e, exc_info=args.verbose)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - HTTP Response Cache
+
+This module provides a two-level (in-memory plus on-disk) TTL cache for
+decoded JSON API responses. Entries remember the ETag and Last-Modified
+validators returned by the server so stale entries can be revalidated
+with a conditional request instead of downloading the body again.
+
+Usage:
+    cache = ResponseCache('h2hggl_data/cache')
+    entry = cache.get(url)
+    if entry and cache.is_fresh(entry, ttl=60):
+        data = entry['body']
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = 'h2hggl_data/cache'
+
+
+def cache_key(url: str, params: Optional[Dict] = None) -> str:
+    """Build a stable cache key from a URL and its query parameters."""
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted(params.items()))}"
+
+
+class ResponseCache:
+    """In-memory plus on-disk cache of JSON responses with HTTP validators."""
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, max_memory_entries: int = 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self._memory: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached entry for a key, loading it from disk if needed."""
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None or not self.cache_dir:
+            return entry
+
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # Guard against digest collisions
+        if entry.get('key') != key:
+            return None
+
+        self._remember(key, entry)
+        return entry
+
+    @staticmethod
+    def is_fresh(entry: Dict, ttl: float) -> bool:
+        """Whether an entry is younger than ttl seconds."""
+        return time.time() - entry.get('stored_at', 0) < ttl
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        """Request headers for revalidating a cached entry."""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, key: str, body, response_headers=None) -> Dict:
+        """Store a decoded response body with its validators."""
+        response_headers = response_headers or {}
+        entry = {
+            'key': key,
+            'stored_at': time.time(),
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+            'body': body,
+        }
+        self._remember(key, entry)
+        self._write(key, entry)
+        return entry
+
+    def touch(self, key: str, entry: Dict) -> Dict:
+        """Mark an entry as fresh again after a 304 Not Modified."""
+        entry = dict(entry, stored_at=time.time())
+        self._remember(key, entry)
+        self._write(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: Dict) -> None:
+        with self._lock:
+            if key not in self._memory and len(self._memory) >= self.max_memory_entries:
+                # Evict the oldest inserted entry; the disk copy remains
+                self._memory.pop(next(iter(self._memory)))
+            self._memory[key] = entry
+
+    def _write(self, key: str, entry: Dict) -> None:
+        if not self.cache_dir:
+            return
+
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, path)
+        except IOError as e:
+            logger.warning("Error writing cache entry: %s", e)
+
+    def record(self, outcome: str) -> None:
+        """Count a lookup outcome ('hits', 'revalidated' or 'misses'); safe to call from worker threads."""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/revalidation/miss counters for this process."""
+        with self._lock:
+            return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses}
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Daily Rollups
+
+This module maintains per-league-day aggregates that reporting queries
+read instead of scanning raw statistics:
+
+    team_daily         one row per league day, tournament and team:
+                       matches, wins/losses/draws, points for/against,
+                       and from statistics field goals, FG%, points in
+                       the paint and fast-break points
+    tournament_daily   one row per league day and tournament with the
+                       same totals over both sides
+
+League days start at 04:00 UTC, as in partitions.py. Rows only hold sums
+and counts, so every match is a pure addition and averages are computed
+when read. The schedule fetcher adds results; the statistics fetcher adds
+results (if not already counted) and box-score totals. Each match is
+counted once per stream, so re-fetching is harmless, but a corrected
+score is not: use --rebuild after correcting or importing old files.
+
+The rollups live in a SQLite database (default h2hggl_data/rollups.db).
+
+Usage:
+    python rollups.py --team "Los Angeles Lakers" --from 2025-06-01 --to 2025-06-07
+    python rollups.py --tournament 1 --day 2025-06-03 --by-tournament
+    python rollups.py --rebuild h2hggl_data/completed_matches.json h2hggl_data/*_statistics.json
+
+    store = RollupStore('h2hggl_data/rollups.db')
+    store.add(matches=matches, statistics=all_stats)
+    store.team_days(team='Los Angeles Lakers', start_day='2025-06-01')
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+from contextlib import closing
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from data_io import iter_file_records
+from logging_utils import add_logging_arguments, setup_logging_from_args
+from matchup_index import match_id_of, match_scores, match_sides
+from partitions import league_day
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROLLUP_DB = 'h2hggl_data/rollups.db'
+REBUILD_BATCH = 5000
+
+QUARTERS = ('quarter1', 'quarter2', 'quarter3', 'quarter4')
+
+# Streams each match feeds, counted once per stream
+RESULTS = 'results'
+BOX_SCORE = 'box_score'
+
+RESULT_COLUMNS = ('matches', 'wins', 'losses', 'draws', 'points_for', 'points_against')
+BOX_SCORE_COLUMNS = ('stat_matches', 'fg_scored', 'fg_attempted', 'fg_pct_sum', 'paint_points', 'fast_break_points')
+TOURNAMENT_COLUMNS = ('matches', 'home_wins', 'away_wins', 'draws', 'points',
+                      'stat_matches', 'fg_scored', 'fg_attempted', 'fg_pct_sum', 'paint_points', 'fast_break_points')
+
+# Box-score fields summed per side, by rollup column
+_BOX_SCORE_FIELDS = {
+    'fg_scored': 'FieldGoalsScored',
+    'fg_attempted': 'FieldGoalsAttempted',
+    'paint_points': 'PointsInThePaint',
+    'fast_break_points': 'FastBreakPoints',
+}
+
+_TEAM_COLUMNS = RESULT_COLUMNS + BOX_SCORE_COLUMNS
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS team_daily (
+    day        TEXT NOT NULL,
+    tournament TEXT NOT NULL,
+    team       TEXT NOT NULL,
+    {', '.join(f'{column} REAL NOT NULL DEFAULT 0' for column in _TEAM_COLUMNS)},
+    PRIMARY KEY (day, tournament, team)
+);
+CREATE INDEX IF NOT EXISTS team_daily_team ON team_daily (team, day);
+CREATE TABLE IF NOT EXISTS tournament_daily (
+    day        TEXT NOT NULL,
+    tournament TEXT NOT NULL,
+    {', '.join(f'{column} REAL NOT NULL DEFAULT 0' for column in TOURNAMENT_COLUMNS)},
+    PRIMARY KEY (day, tournament)
+);
+CREATE TABLE IF NOT EXISTS applied (
+    match_id TEXT NOT NULL,
+    stream   TEXT NOT NULL,
+    PRIMARY KEY (match_id, stream)
+);
+"""
+
+
+def _team_key(name) -> str:
+    return ' '.join(str(name).split())
+
+
+def _tournament_key(match: Dict) -> str:
+    for field in ('tournamentId', 'tournamentName'):
+        value = match.get(field)
+        if value not in (None, ''):
+            return str(value)
+    return 'unknown'
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def box_score(statistics: Dict) -> Optional[Tuple[Dict[str, float], Dict[str, float]]]:
+    """Home and away totals of the rolled-up box-score fields, or None without statistics.
+
+    Uses the endMatch period, or the sum of the quarters when it is missing.
+    FG% is the period's own figure, or scored/attempted for summed quarters.
+    """
+    statistics = statistics or {}
+    periods = [statistics['endMatch']] if statistics.get('endMatch') else \
+        [statistics[quarter] for quarter in QUARTERS if statistics.get(quarter)]
+    if not periods:
+        return None
+
+    sides = []
+    for side in ('home', 'away'):
+        totals = {column: 0.0 for column in _BOX_SCORE_FIELDS}
+        for period in periods:
+            for column, field in _BOX_SCORE_FIELDS.items():
+                totals[column] += _number(period.get(f'{side}{field}')) or 0.0
+        percent = _number(periods[0].get(f'{side}FieldGoalsPercent')) if len(periods) == 1 else None
+        if percent is None and totals['fg_attempted']:
+            percent = totals['fg_scored'] / totals['fg_attempted'] * 100
+        totals['fg_pct_sum'] = percent or 0.0
+        totals['stat_matches'] = 1.0
+        sides.append(totals)
+    return sides[0], sides[1]
+
+
+class RollupStore:
+    """Add-only daily aggregates per team and tournament in SQLite."""
+
+    def __init__(self, db_file: str = DEFAULT_ROLLUP_DB, busy_timeout: float = 60):
+        self.db_file = db_file
+        self.busy_timeout = busy_timeout
+
+        db_dir = os.path.dirname(db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_file, timeout=self.busy_timeout, isolation_level=None)
+
+    @staticmethod
+    def _match_key(match: Dict) -> Optional[Tuple[str, str, str, str, str]]:
+        """(match_id, day, tournament, home team, away team), or None if the match can't be placed."""
+        match_id = match_id_of(match)
+        home, away = match_sides(match)['team']
+        if not match_id or not match.get('startDate') or home is None or away is None:
+            return None
+        return match_id, league_day(match['startDate']), _tournament_key(match), _team_key(home), _team_key(away)
+
+    def _events(self, matches: Iterable[Dict], statistics: Dict[str, Dict]) -> List[Tuple[str, Tuple, object]]:
+        events = []
+
+        def result_event(match: Dict):
+            key = self._match_key(match)
+            home_score, away_score = (_number(score) for score in match_scores(match))
+            if key and home_score is not None and away_score is not None:
+                events.append((RESULTS, key, (home_score, away_score)))
+            return key
+
+        for match in matches:
+            result_event(match)
+        for record in statistics.values():
+            match_info = record.get('match_info') or {}
+            key = result_event(match_info)
+            totals = box_score(record.get('statistics'))
+            if key and totals:
+                events.append((BOX_SCORE, key, totals))
+        return events
+
+    def add(self, matches: Optional[Iterable[Dict]] = None, statistics: Optional[Dict[str, Dict]] = None) -> int:
+        """Add schedule rows and/or statistics records. Returns the number of new events."""
+        events = self._events(matches or [], statistics or {})
+        team_rows: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+        tournament_rows: Dict[Tuple[str, str], Dict[str, float]] = {}
+        applied = 0
+
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            for stream, (match_id, day, tournament, home, away), payload in events:
+                inserted = connection.execute(
+                    'INSERT OR IGNORE INTO applied (match_id, stream) VALUES (?, ?)', (match_id, stream)
+                ).rowcount
+                if not inserted:
+                    continue
+                applied += 1
+
+                sides = ((home, 0), (away, 1))
+                tournament_row = tournament_rows.setdefault((day, tournament), dict.fromkeys(TOURNAMENT_COLUMNS, 0.0))
+                if stream == RESULTS:
+                    scores = payload
+                    for team, side in sides:
+                        row = team_rows.setdefault((day, tournament, team), dict.fromkeys(_TEAM_COLUMNS, 0.0))
+                        points_for, points_against = scores[side], scores[1 - side]
+                        row['matches'] += 1
+                        row['wins'] += points_for > points_against
+                        row['losses'] += points_for < points_against
+                        row['draws'] += points_for == points_against
+                        row['points_for'] += points_for
+                        row['points_against'] += points_against
+                    tournament_row['matches'] += 1
+                    tournament_row['home_wins'] += scores[0] > scores[1]
+                    tournament_row['away_wins'] += scores[0] < scores[1]
+                    tournament_row['draws'] += scores[0] == scores[1]
+                    tournament_row['points'] += scores[0] + scores[1]
+                else:
+                    for team, side in sides:
+                        row = team_rows.setdefault((day, tournament, team), dict.fromkeys(_TEAM_COLUMNS, 0.0))
+                        for column in BOX_SCORE_COLUMNS:
+                            row[column] += payload[side][column]
+                    tournament_row['stat_matches'] += 1
+                    for column in BOX_SCORE_COLUMNS[1:]:
+                        tournament_row[column] += payload[0][column] + payload[1][column]
+
+            self._upsert(connection, 'team_daily', ('day', 'tournament', 'team'), _TEAM_COLUMNS, team_rows)
+            self._upsert(connection, 'tournament_daily', ('day', 'tournament'), TOURNAMENT_COLUMNS, tournament_rows)
+            connection.execute('COMMIT')
+        return applied
+
+    @staticmethod
+    def _upsert(connection: sqlite3.Connection, table: str, keys: Tuple[str, ...], columns: Tuple[str, ...],
+                rows: Dict[Tuple, Dict[str, float]]) -> None:
+        if not rows:
+            return
+        connection.executemany(
+            f"INSERT INTO {table} ({', '.join(keys + columns)}) VALUES ({', '.join('?' * len(keys + columns))}) "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+            f"{', '.join(f'{column} = {column} + excluded.{column}' for column in columns)}",
+            [key + tuple(row[column] for column in columns) for key, row in rows.items()]
+        )
+
+    def add_matches(self, matches: Iterable[Dict]) -> int:
+        """Add schedule rows (or match_info records). Returns the number of new results."""
+        return self.add(matches=matches)
+
+    def add_statistics(self, statistics: Dict[str, Dict]) -> int:
+        """Add {match_id: {'match_info', 'statistics'}} records: results and box-score totals."""
+        return self.add(statistics=statistics)
+
+    def _select(self, table: str, keys: Tuple[str, ...], filters: Dict[str, Optional[List[str]]],
+                start_day: Optional[str], end_day: Optional[str]) -> List[Dict]:
+        clauses, parameters = [], []
+        for column, values in filters.items():
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                parameters += values
+        if start_day:
+            clauses.append('day >= ?')
+            parameters.append(start_day)
+        if end_day:
+            clauses.append('day <= ?')
+            parameters.append(end_day)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with closing(self._connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute(f"SELECT * FROM {table} {where} ORDER BY {', '.join(keys)}", parameters)
+            return [dict(row) for row in rows]
+
+    def team_days(self, team: Optional[List[str]] = None, tournament: Optional[List[str]] = None,
+                  start_day: Optional[str] = None, end_day: Optional[str] = None) -> List[Dict]:
+        """Team rows between two league days (inclusive), with averages."""
+        rows = self._select('team_daily', ('day', 'tournament', 'team'),
+                            {'team': [_team_key(name) for name in team or []], 'tournament': tournament},
+                            start_day, end_day)
+        return [_with_averages(row) for row in rows]
+
+    def tournament_days(self, tournament: Optional[List[str]] = None, start_day: Optional[str] = None,
+                        end_day: Optional[str] = None) -> List[Dict]:
+        """Tournament rows between two league days (inclusive), with per-team averages."""
+        rows = self._select('tournament_daily', ('day', 'tournament'), {'tournament': tournament},
+                            start_day, end_day)
+        return [_with_averages(row) for row in rows]
+
+    def reset(self) -> None:
+        """Remove all rollups."""
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            for table in ('team_daily', 'tournament_daily', 'applied'):
+                connection.execute(f'DELETE FROM {table}')
+            connection.execute('COMMIT')
+
+
+def _ratio(numerator: float, denominator: float) -> Optional[float]:
+    return round(numerator / denominator, 2) if denominator else None
+
+
+def _with_averages(row: Dict) -> Dict:
+    """Turn sums into ints and add averages; tournament figures are per team per match."""
+    row = {key: int(value) if isinstance(value, float) and value.is_integer() else value
+           for key, value in row.items()}
+    sides = 1 if 'team' in row else 2
+    if sides == 1:
+        row['avg_points'] = _ratio(row['points_for'], row['matches'])
+        row['avg_points_against'] = _ratio(row['points_against'], row['matches'])
+    else:
+        row['avg_points'] = _ratio(row['points'], row['matches'] * 2)
+    row['avg_fg_pct'] = _ratio(row['fg_pct_sum'], row['stat_matches'] * sides)
+    row['fg_pct'] = _ratio(row['fg_scored'] * 100, row['fg_attempted'])
+    row['avg_paint_points'] = _ratio(row['paint_points'], row['stat_matches'] * sides)
+    row['avg_fast_break_points'] = _ratio(row['fast_break_points'], row['stat_matches'] * sides)
+    return row
+
+
+def update_rollups(db_file: str = DEFAULT_ROLLUP_DB, matches: Optional[Iterable[Dict]] = None,
+                   statistics: Optional[Dict[str, Dict]] = None) -> int:
+    """Feed freshly fetched matches or statistics to the rollup database. Returns the number of new events."""
+    try:
+        added = RollupStore(db_file).add(matches=matches, statistics=statistics)
+    except (OSError, sqlite3.Error) as e:
+        logger.error("Error updating daily rollups in '%s': %s", db_file, e)
+        return 0
+    logger.debug("Daily rollups: %d new events in %s", added, db_file)
+    return added
+
+
+def rebuild(store: RollupStore, paths: List[str]) -> int:
+    """Reset the store and add every match in the given files, a batch at a time."""
+    store.reset()
+    added = 0
+    for path in paths:
+        records = iter_file_records(path)
+        while True:
+            batch = list(islice(records, REBUILD_BATCH))
+            if not batch:
+                break
+            matches = [record for kind, _, _, record in batch if kind == 'matches']
+            statistics = {match_id: record for kind, match_id, _, record in batch if kind == 'statistics'}
+            added += store.add(matches=matches, statistics=statistics)
+    return added
+
+
+def _print_rows(rows: List[Dict], by_tournament: bool) -> None:
+    if by_tournament:
+        print(f"{'day':<11} {'tournament':<12} {'matches':>7} {'home W':>7} {'away W':>7} "
+              f"{'avg pts':>8} {'FG%':>6} {'paint':>6} {'fast br':>7}")
+    else:
+        print(f"{'day':<11} {'tournament':<12} {'team':<28} {'matches':>7} {'W-L':>7} "
+              f"{'avg pts':>8} {'FG%':>6} {'paint':>6} {'fast br':>7}")
+
+    def show(value) -> str:
+        return '-' if value is None else f'{value:g}'
+
+    for row in rows:
+        metrics = (f"{show(row['avg_points']):>8} {show(row['avg_fg_pct']):>6} "
+                   f"{show(row['avg_paint_points']):>6} {show(row['avg_fast_break_points']):>7}")
+        if by_tournament:
+            print(f"{row['day']:<11} {row['tournament'][:12]:<12} {row['matches']:>7} {row['home_wins']:>7} "
+                  f"{row['away_wins']:>7} {metrics}")
+        else:
+            record = f"{row['wins']}-{row['losses']}"
+            print(f"{row['day']:<11} {row['tournament'][:12]:<12} {row['team'][:28]:<28} {row['matches']:>7} "
+                  f"{record:>7} {metrics}")
+
+
+def main():
+    """Show or rebuild daily rollups."""
+    parser = argparse.ArgumentParser(
+        description='Daily per-team and per-tournament rollups',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python rollups.py --team "Los Angeles Lakers" --from 2025-06-01 --to 2025-06-07
+  python rollups.py --tournament 1 --day 2025-06-03 --by-tournament
+  python rollups.py --rebuild h2hggl_data/completed_matches.json h2hggl_data/*_statistics.json
+        """
+    )
+
+    parser.add_argument('--rollup-db', default=DEFAULT_ROLLUP_DB,
+                        help=f'Rollup database (default: {DEFAULT_ROLLUP_DB})')
+    parser.add_argument('--team', nargs='+', help='Only these teams')
+    parser.add_argument('--tournament', nargs='+', help='Only these tournaments (ID, or name where no ID was known)')
+    parser.add_argument('--from', dest='start_day', metavar='DAY', help='First league day (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end_day', metavar='DAY', help='Last league day (YYYY-MM-DD)')
+    parser.add_argument('--day', help='A single league day (YYYY-MM-DD)')
+    parser.add_argument('--by-tournament', action='store_true', help='Show tournament totals instead of teams')
+    parser.add_argument('--rebuild', nargs='+', metavar='FILE',
+                        help='Discard the rollups and rebuild them from completed matches and statistics files')
+    parser.add_argument('--json', action='store_true', help='Print rows as JSON lines')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    store = RollupStore(args.rollup_db)
+    if args.rebuild:
+        try:
+            added = rebuild(store, args.rebuild)
+        except (OSError, ValueError) as e:
+            logger.error("Error rebuilding rollups: %s", e)
+            return 1
+        logger.info("Rebuilt daily rollups from %d file(s): %d events", len(args.rebuild), added,
+                    extra={'fields': {'event': 'rollups_rebuilt', 'events': added}})
+        if not (args.team or args.tournament or args.day or args.start_day or args.end_day):
+            return 0
+
+    start_day, end_day = (args.day, args.day) if args.day else (args.start_day, args.end_day)
+    if args.by_tournament:
+        rows = store.tournament_days(args.tournament, start_day, end_day)
+    else:
+        rows = store.team_days(args.team, args.tournament, start_day, end_day)
+
+    if args.json:
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+    elif rows:
+        _print_rows(rows, args.by_tournament)
+    else:
+        print("No rollups match")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Batch Job Runner
+
+This script runs a list of fetch jobs from one JSON or YAML spec file in
+a single process. Compared with running each fetch script on its own, it
+starts the interpreter once, keeps one connection pool and one token for
+the schedule and statistics API, shares one response cache between
+league jobs, and loads the match ID index once. Jobs that do not depend
+on each other run concurrently (--max-concurrent).
+
+Job types:
+
+    matches   schedule rows for a date range and tournaments, like
+              fetch_completed_matches.py
+    stats     statistics for match IDs, a matches file, the matches of an
+              earlier job (matches_from), or a date range (a backfill);
+              matches whose statistics are already stored are skipped
+              unless refetch is set
+    league    standings, upcoming, player or compare, like
+              fetch_league_data.py
+
+Spec format (JSON shown; YAML needs PyYAML):
+
+    {
+      "max_concurrent": 4,
+      "defaults": {"compress": "gzip"},
+      "jobs": [
+        {"name": "yesterday", "type": "matches", "days": 1, "tournament_ids": "all"},
+        {"name": "yesterday-stats", "type": "stats", "matches_from": "yesterday"},
+        {"name": "june-backfill", "type": "stats", "from": "2025-06-01 04:00", "to": "2025-06-08 03:59",
+         "tournament_ids": [1, 2], "max_workers": 8},
+        {"name": "picks", "type": "stats", "match_ids": ["233333", "NB052120625"]},
+        {"name": "standings", "type": "league", "endpoint": "standings"}
+      ]
+    }
+
+A job waits for the jobs listed in "after" (and for its matches_from job),
+and is skipped if one of them failed. Outputs default to
+h2hggl_data/jobs/<name>.json. The match ID, matchup, partition, rating,
+form, rollup and refetch side outputs are updated as by the fetch
+scripts, one job at a time.
+
+Usage:
+    python run_jobs.py nightly.json
+    python run_jobs.py nightly.yaml --max-concurrent 8
+    python run_jobs.py nightly.json --list
+
+Requires:
+    - requests library for HTTP requests
+    - PyYAML for .yaml/.yml spec files
+    - Valid API authentication (automatically refreshed)
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from data_io import add_compression_arguments, iter_matches, with_compression_extension
+from fetch_completed_matches import KNOWN_TOURNAMENT_IDS, H2HMatchFetcher
+from fetch_league_data import H2HLeagueClient
+from fetch_match_stats import H2HMatchStatsFetcher, match_info_from_schedule
+from form_stats import DEFAULT_FORM_DB, update_form
+from http_transport import add_transport_arguments, set_pool_size
+from logging_utils import ProgressReporter, add_logging_arguments, setup_logging_from_args
+from match_ids import DEFAULT_ID_INDEX_FILE, MatchIdIndex
+from match_metrics import enrich_batch
+from matchup_index import DEFAULT_INDEX_FILE, update_matchup_index
+from partitions import DEFAULT_PARTITION_DIR, update_partitions
+from ratings import DEFAULT_RATINGS_DIR, update_ratings
+from refetch import DEFAULT_REFETCH_DB, update_refetch_queue
+from response_cache import DEFAULT_CACHE_DIR, ResponseCache
+from rollups import DEFAULT_ROLLUP_DB, update_rollups
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPES = ('matches', 'stats', 'league')
+LEAGUE_ENDPOINTS = ('standings', 'upcoming', 'player', 'compare')
+DEFAULT_JOBS_DIR = 'h2hggl_data/jobs'
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_DAYS = 30
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+# Job results
+OK = 'ok'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+def _require_yaml():
+    """Import the optional PyYAML package on first use."""
+    try:
+        import yaml
+    except ImportError:
+        raise RuntimeError("YAML job specs require the PyYAML library. Install with: pip install pyyaml")
+    return yaml
+
+
+def load_job_spec(path: str) -> Dict:
+    """Read a job spec file; a bare list is taken as the jobs."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if path.lower().endswith(('.yaml', '.yml')):
+        spec = _require_yaml().safe_load(text)
+    else:
+        spec = json.loads(text)
+
+    if isinstance(spec, list):
+        spec = {'jobs': spec}
+    if not isinstance(spec, dict) or not isinstance(spec.get('jobs'), list):
+        raise ValueError(f"{path}: expected a list of jobs or an object with a 'jobs' list")
+    return spec
+
+
+def normalize_jobs(spec: Dict) -> List[Dict]:
+    """Apply defaults, name unnamed jobs and check types and dependencies."""
+    defaults = spec.get('defaults') or {}
+    jobs: List[Dict] = []
+    for number, raw in enumerate(spec['jobs'], 1):
+        if not isinstance(raw, dict):
+            raise ValueError(f"job {number}: expected an object, got {type(raw).__name__}")
+        job = dict(defaults, **raw)
+        job['name'] = str(job.get('name') or f'job{number}')
+
+        if job.get('type') not in JOB_TYPES:
+            raise ValueError(f"job '{job['name']}': type must be one of {', '.join(JOB_TYPES)}")
+        if job['type'] == 'league' and job.get('endpoint') not in LEAGUE_ENDPOINTS:
+            raise ValueError(f"job '{job['name']}': endpoint must be one of {', '.join(LEAGUE_ENDPOINTS)}")
+        if job['type'] == 'stats' and not any(
+                key in job for key in ('match_ids', 'matches_file', 'matches_from', 'from', 'days')):
+            raise ValueError(f"job '{job['name']}': needs match_ids, matches_file, matches_from or a date range")
+
+        after = job.get('after') or []
+        after = [after] if isinstance(after, str) else list(after)
+        if job.get('matches_from') and job['matches_from'] not in after:
+            after.append(job['matches_from'])
+        job['after'] = [str(name) for name in after]
+        jobs.append(job)
+
+    names = [job['name'] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate job names: {', '.join(duplicates)}")
+    by_name = {job['name']: job for job in jobs}
+    for job in jobs:
+        for dependency in job['after']:
+            if dependency not in by_name:
+                raise ValueError(f"job '{job['name']}': unknown dependency '{dependency}'")
+        if job.get('matches_from') and by_name[job['matches_from']]['type'] != 'matches':
+            raise ValueError(f"job '{job['name']}': matches_from must name a matches job")
+
+    # Every job must become runnable at some point
+    done = set()
+    remaining = list(jobs)
+    while remaining:
+        ready = [job for job in remaining if all(dependency in done for dependency in job['after'])]
+        if not ready:
+            raise ValueError(f"dependency cycle between jobs: {', '.join(job['name'] for job in remaining)}")
+        done.update(job['name'] for job in ready)
+        remaining = [job for job in remaining if job['name'] not in done]
+    return jobs
+
+
+def job_date_range(job: Dict) -> Tuple[str, str]:
+    """The job's (from, to) range; 'days' counts back from now."""
+    now = datetime.now()
+    if 'days' in job:
+        return (now - timedelta(days=float(job['days']))).strftime(DATE_FORMAT), now.strftime(DATE_FORMAT)
+    return (job.get('from') or (now - timedelta(days=DEFAULT_DAYS)).strftime(DATE_FORMAT),
+            job.get('to') or now.strftime(DATE_FORMAT))
+
+
+def job_tournament_ids(job: Dict) -> List[int]:
+    """The job's tournaments: an ID, a list of IDs, or 'all'."""
+    value = job.get('tournament_ids', job.get('tournament_id', 1))
+    values = value if isinstance(value, list) else [value]
+    if any(str(item).lower() == 'all' for item in values):
+        return list(KNOWN_TOURNAMENT_IDS)
+    try:
+        return list(dict.fromkeys(int(item) for item in values))
+    except ValueError:
+        raise ValueError(f"job '{job['name']}': tournament_ids expects integer IDs or \"all\"")
+
+
+class JobRunner:
+    """Runs jobs concurrently over shared clients, token, cache and match ID index."""
+
+    def __init__(self, auth_token: Optional[str] = None, transport: Optional[str] = None,
+                 max_concurrent: int = DEFAULT_MAX_CONCURRENT, max_workers: int = DEFAULT_MAX_WORKERS,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR, id_index_file: Optional[str] = DEFAULT_ID_INDEX_FILE,
+                 side_outputs: bool = True, output_dir: str = DEFAULT_JOBS_DIR,
+                 compress: Optional[str] = None, compress_level: Optional[int] = None, verbose: bool = False):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_workers = max(1, max_workers)
+        self.transport = transport
+        self.side_outputs = side_outputs
+        self.output_dir = output_dir
+        self.compress = compress
+        self.compress_level = compress_level
+        self.verbose = verbose
+
+        # Every client uses one token manager: the token is resolved on the first request,
+        # and a 401 from any job refreshes it once for all of them
+        self.match_fetcher = H2HMatchFetcher(transport=transport)
+        self.tokens = self.match_fetcher.tokens
+        if auth_token:
+            self.tokens.set(auth_token)
+        # The schedule and statistics endpoints share one session and connection pool
+        self.stats_fetcher = H2HMatchStatsFetcher(transport=transport, session=self.match_fetcher.session,
+                                                  tokens=self.tokens)
+        set_pool_size(self.match_fetcher.session, self.max_concurrent * self.max_workers)
+
+        self.cache = ResponseCache(cache_dir)
+        self._league_client: Optional[H2HLeagueClient] = None
+        self._league_lock = threading.Lock()
+
+        self.id_index_file = id_index_file
+        self.id_index = MatchIdIndex.load(id_index_file) if id_index_file else None
+        self._id_index_changed = False
+        # Side outputs are read-modify-write files; jobs update them one at a time
+        self._index_lock = threading.Lock()
+
+        self._job_matches: Dict[str, List[Dict]] = {}
+
+    @property
+    def league_client(self) -> H2HLeagueClient:
+        """The league API client, created on first use with the shared cache and token."""
+        with self._league_lock:
+            if self._league_client is None:
+                self._league_client = H2HLeagueClient(cache=self.cache, transport=self.transport, tokens=self.tokens)
+            return self._league_client
+
+    def _output(self, job: Dict, suffix: str = '') -> str:
+        path = job.get('output') or os.path.join(self.output_dir, f"{job['name']}{suffix}.json")
+        return with_compression_extension(path, job.get('compress', self.compress))
+
+    def _save_options(self, job: Dict) -> Dict:
+        return {'compress': job.get('compress', self.compress),
+                'compress_level': job.get('compress_level', self.compress_level)}
+
+    def run(self, jobs: List[Dict]) -> Dict[str, Dict]:
+        """Run jobs once their dependencies have succeeded. Returns a result per job name."""
+        results: Dict[str, Dict] = {}
+        pending = {job['name']: job for job in jobs}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='job') as executor:
+            while pending or running:
+                for name, job in list(pending.items()):
+                    if not all(dependency in results for dependency in job['after']):
+                        continue
+                    del pending[name]
+                    failed = [dependency for dependency in job['after'] if results[dependency]['status'] != OK]
+                    if failed:
+                        logger.warning("Skipping job '%s': '%s' did not succeed", name, failed[0])
+                        results[name] = {'status': SKIPPED, 'count': 0, 'output': None, 'seconds': 0.0}
+                        continue
+                    running[executor.submit(self._run_job, job)] = name
+
+                if not running:
+                    # Only skips happened; they may have settled other jobs' dependencies
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+        if self.id_index is not None and self._id_index_changed:
+            self.id_index.save(self.id_index_file)
+        return {job['name']: results[job['name']] for job in jobs}
+
+    def _run_job(self, job: Dict) -> Dict:
+        started = time.monotonic()
+        logger.info("Starting job '%s' (%s)", job['name'], job['type'])
+        try:
+            handler = {'matches': self._run_matches, 'stats': self._run_stats, 'league': self._run_league}
+            result = dict(handler[job['type']](job), status=OK)
+        except Exception as e:
+            logger.error("Job '%s' failed: %s", job['name'], e, exc_info=self.verbose)
+            result = {'status': FAILED, 'count': 0, 'output': None, 'error': str(e)}
+        result['seconds'] = time.monotonic() - started
+
+        logger.info(
+            "Job '%s' %s: %d items in %.1fs", job['name'], result['status'], result['count'], result['seconds'],
+            extra={'fields': {'event': 'job_finished', 'job': job['name'], 'type': job['type'], **result}}
+        )
+        return result
+
+    def _fetch_schedule(self, job: Dict) -> List[Dict]:
+        from_date, to_date = job_date_range(job)
+        matches = []
+        for tournament_id in job_tournament_ids(job):
+            tournament_matches = self.match_fetcher.fetch_all_matches(from_date, to_date, tournament_id,
+                                                                      verbose=self.verbose)
+            for match in tournament_matches:
+                match.setdefault('tournamentId', tournament_id)
+            matches.extend(tournament_matches)
+        # Keep the API's newest-first order across tournaments
+        matches.sort(key=lambda match: match.get('startDate') or '', reverse=True)
+        return matches
+
+    def _run_matches(self, job: Dict) -> Dict:
+        matches = self._fetch_schedule(job)
+        self._job_matches[job['name']] = matches
+        if not matches:
+            logger.warning("Job '%s': no matches found", job['name'])
+            return {'count': 0, 'output': None}
+
+        output = self._output(job)
+        self.match_fetcher.save_matches_to_file(matches, output, tournament_ids=job_tournament_ids(job),
+                                                **self._save_options(job))
+
+        with self._index_lock:
+            if self.id_index is not None:
+                self.id_index.add_schedule(matches, matches_file=output)
+                self._id_index_changed = True
+            if self.side_outputs:
+                update_matchup_index(matches, DEFAULT_INDEX_FILE)
+                update_partitions(DEFAULT_PARTITION_DIR, matches=matches, **self._save_options(job))
+                update_ratings(matches, DEFAULT_RATINGS_DIR)
+                update_form(DEFAULT_FORM_DB, matches=matches)
+                update_rollups(DEFAULT_ROLLUP_DB, matches=matches)
+        return {'count': len(matches), 'output': output}
+
+    def _stats_rows(self, job: Dict) -> List[Dict]:
+        """Schedule rows (or bare {'matchId': ...} rows for ID lists) whose statistics the job wants."""
+        if 'match_ids' in job:
+            match_ids = job['match_ids'] if isinstance(job['match_ids'], list) else [job['match_ids']]
+            return [{'matchId': str(match_id)} for match_id in match_ids]
+        if 'matches_from' in job:
+            return self._job_matches.get(job['matches_from'], [])
+        if 'matches_file' in job:
+            paths = job['matches_file'] if isinstance(job['matches_file'], list) else [job['matches_file']]
+            return [match for path in paths for match in iter_matches(path)]
+        return self._fetch_schedule(job)
+
+    def _run_stats(self, job: Dict) -> Dict:
+        rows = []
+        seen = set()
+        for row in self._stats_rows(job):
+            match_id = row.get('matchId')
+            if match_id not in (None, '') and str(match_id) not in seen:
+                seen.add(str(match_id))
+                rows.append(row)
+        match_ids = [str(row['matchId']) for row in rows]
+
+        stored: Dict[str, Dict] = {}
+        if self.id_index is not None and not job.get('refetch'):
+            with self._index_lock:
+                stored = self.id_index.load_statistics(match_ids)
+        if stored:
+            logger.info("Job '%s': using stored statistics for %d matches", job['name'], len(stored))
+
+        to_fetch = [match_id for match_id in match_ids if match_id not in stored]
+        workers = max(1, min(int(job.get('max_workers', self.max_workers)), len(to_fetch) or 1))
+        fetched: Dict[str, Optional[Dict]] = {}
+        progress = ProgressReporter(total=len(to_fetch), label=f"Fetching stats ({job['name']})", unit="matches")
+
+        def fetch(match_id: str) -> Optional[Dict]:
+            return self.stats_fetcher.fetch_match_stats(match_id, verbose=self.verbose)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"stats-{job['name']}") as executor:
+            for match_id, stats in zip(to_fetch, executor.map(fetch, to_fetch)):
+                fetched[match_id] = stats
+                progress.update()
+        progress.close()
+
+        all_stats: Dict[str, Dict] = {}
+        failed = []
+        for row, match_id in zip(rows, match_ids):
+            stats = stored.get(match_id) or fetched.get(match_id)
+            if stats:
+                all_stats[match_id] = {'match_info': match_info_from_schedule(row), 'statistics': stats}
+            else:
+                failed.append(row)
+        if failed:
+            logger.warning("Job '%s': no statistics for %d matches", job['name'], len(failed))
+
+        output = None
+        if all_stats:
+            enrich_batch(all_stats)
+            output = self._output(job, '_statistics')
+            self.stats_fetcher.save_stats_to_file(all_stats, output, **self._save_options(job))
+
+        with self._index_lock:
+            if self.id_index is not None and all_stats:
+                for match_id, record in all_stats.items():
+                    self.id_index.add_statistics(record['statistics'], stats_file=output,
+                                                 stats_key=match_id, requested_id=match_id)
+                self._id_index_changed = True
+            if self.side_outputs:
+                update_refetch_queue(DEFAULT_REFETCH_DB, statistics=all_stats, failed=failed)
+                if all_stats:
+                    update_matchup_index((record['match_info'] for record in all_stats.values()), DEFAULT_INDEX_FILE)
+                    update_partitions(DEFAULT_PARTITION_DIR, statistics=all_stats, **self._save_options(job))
+                    update_form(DEFAULT_FORM_DB, statistics=all_stats)
+                    update_rollups(DEFAULT_ROLLUP_DB, statistics=all_stats)
+        return {'count': len(all_stats), 'output': output, 'fetched': len(to_fetch), 'failed': len(failed)}
+
+    def _run_league(self, job: Dict) -> Dict:
+        client = self.league_client
+        endpoint = job['endpoint']
+        if endpoint == 'standings':
+            data = client.fetch_standings(verbose=self.verbose)
+        elif endpoint == 'upcoming':
+            data = client.fetch_upcoming(verbose=self.verbose)
+        elif endpoint == 'player':
+            data = client.fetch_players(job.get('player_ids') or [], max_workers=int(job.get('max_workers', 8)),
+                                        verbose=self.verbose)
+            if not any(data.values()):
+                data = None
+        else:
+            player_ids = job.get('player_ids') or []
+            if len(player_ids) != 2:
+                raise ValueError("compare needs exactly two player_ids")
+            data = client.compare_players(player_ids[0], player_ids[1], verbose=self.verbose)
+
+        if data is None:
+            raise ValueError(f"no {endpoint} data returned")
+        output = self._output(job)
+        client.save_league_data(data, output, endpoint, **self._save_options(job))
+        return {'count': len(data) if endpoint == 'player' else 1, 'output': output}
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(
+        description='Run a JSON/YAML list of fetch jobs in one process with a shared session, token and cache',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python run_jobs.py nightly.json
+  python run_jobs.py nightly.yaml --max-concurrent 8 --max-workers 8
+  python run_jobs.py nightly.json --list
+  python run_jobs.py nightly.json --no-side-outputs --compress gzip
+        """
+    )
+
+    parser.add_argument('spec', help='Job spec file (.json, or .yaml/.yml with PyYAML installed)')
+    parser.add_argument('--list', action='store_true', help='Print the jobs and their dependencies without running them')
+    parser.add_argument(
+        '--max-concurrent',
+        type=int,
+        help=f'Jobs run at the same time (default: the spec\'s max_concurrent, else {DEFAULT_MAX_CONCURRENT})'
+    )
+    parser.add_argument(
+        '--max-workers',
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f'Concurrent statistics requests per stats job, unless the job sets max_workers (default: {DEFAULT_MAX_WORKERS})'
+    )
+    parser.add_argument(
+        '--output-dir',
+        default=DEFAULT_JOBS_DIR,
+        help=f'Directory for outputs of jobs without an output path (default: {DEFAULT_JOBS_DIR})'
+    )
+    parser.add_argument(
+        '--id-index',
+        default=DEFAULT_ID_INDEX_FILE,
+        help=f'Match ID index consulted for stored statistics and updated once at the end (default: {DEFAULT_ID_INDEX_FILE})'
+    )
+    parser.add_argument('--no-id-index', action='store_true', help='Neither consult nor update the match ID index')
+    parser.add_argument(
+        '--no-side-outputs',
+        action='store_true',
+        help='Do not update the matchup index, partitions, ratings, form, rollups or refetch queue'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=DEFAULT_CACHE_DIR,
+        help=f'Response cache shared by league jobs (default: {DEFAULT_CACHE_DIR})'
+    )
+    parser.add_argument(
+        '--auth-token',
+        help='API authentication token (default: cached token from auth_token.json, refreshed if missing or expired)'
+    )
+
+    add_transport_arguments(parser)
+
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+
+    add_logging_arguments(parser)
+    add_compression_arguments(parser)
+
+    return parser.parse_args()
+
+
+def main():
+    """Main function to run a job spec."""
+
+    args = parse_arguments()
+    setup_logging_from_args(args)
+
+    try:
+        spec = load_job_spec(args.spec)
+        jobs = normalize_jobs(spec)
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.error("Error reading job spec '%s': %s", args.spec, e)
+        return 1
+
+    if args.list:
+        for job in jobs:
+            after = f"  after {', '.join(job['after'])}" if job['after'] else ''
+            print(f"{job['name']:<24} {job['type']:<8}{after}")
+        return 0
+
+    started = time.monotonic()
+    try:
+        runner = JobRunner(
+            auth_token=args.auth_token, transport=args.transport,
+            max_concurrent=args.max_concurrent or int(spec.get('max_concurrent', DEFAULT_MAX_CONCURRENT)),
+            max_workers=args.max_workers, cache_dir=args.cache_dir,
+            id_index_file=None if args.no_id_index else args.id_index,
+            side_outputs=not args.no_side_outputs, output_dir=args.output_dir,
+            compress=args.compress, compress_level=args.compress_level, verbose=args.verbose
+        )
+        results = runner.run(jobs)
+    except KeyboardInterrupt:
+        logger.warning("\nOperation cancelled by user.")
+        return 1
+
+    lines = [f"  {name:<24} {result['status']:<8} {result['count']:>7} items {result['seconds']:>7.1f}s  "
+             f"{result.get('output') or '-'}" for name, result in results.items()]
+    counts = {status: sum(1 for result in results.values() if result['status'] == status)
+              for status in (OK, FAILED, SKIPPED)}
+    cache_stats = runner.cache.stats()
+    logger.info(
+        "\nJobs finished in %.1fs:\n%s\n"
+        "  Succeeded: %d, failed: %d, skipped: %d\n"
+        "  League cache: %d hits, %d revalidated, %d fetched",
+        time.monotonic() - started, '\n'.join(lines), counts[OK], counts[FAILED], counts[SKIPPED],
+        cache_stats['hits'], cache_stats['revalidated'], cache_stats['misses'],
+        extra={'fields': {'event': 'jobs_finished', 'results': results, 'cache': cache_stats, **counts}}
+    )
+    return 0 if not counts[FAILED] and not counts[SKIPPED] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
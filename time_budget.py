@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Time Budget
+
+This module lets a fetch run finish within a fixed wall-clock slot, such
+as a cron interval, however slow the API is. Pending work is ordered by
+value:
+
+    new        matches with no stored statistics, newest startDate first
+    missing    matches in the refetch queue (failed or incomplete), newest first
+    refresh    matches whose complete statistics are already stored
+
+While requests run, the budget tracks a smoothed request duration and its
+variation, the way TCP estimates round-trip times. A new request is only
+started if it would be expected to finish before the fetch deadline,
+which is the budget minus a reserve for saving and updating the indexes.
+Whatever is left is written to a remainder file in the completed matches
+format, and the next run with a time budget picks it up first.
+
+Usage:
+    budget = TimeBudget(parse_duration('15m'))
+    for match in prioritize(matches, missing_ids, refresh_ids):
+        if not budget.can_dispatch():
+            remaining.append(match)
+            continue
+        with budget.request():
+            fetch(match)
+    save_remainder('h2hggl_data/completed_matches_statistics_remaining.json', remaining)
+"""
+
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from data_io import iter_matches, write_json
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_NEW = 0
+PRIORITY_MISSING = 1
+PRIORITY_REFRESH = 2
+
+# Share of the budget kept for saving and index updates unless set explicitly
+DEFAULT_RESERVE_FRACTION = 0.1
+# Expected request duration before the first one has been measured
+DEFAULT_INITIAL_ESTIMATE = 3.0
+
+# Smoothing of the duration estimate (RFC 6298 uses the same constants)
+_ALPHA = 0.125
+_BETA = 0.25
+_VARIATION_WEIGHT = 4
+
+_DURATION_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*$')
+_UNIT_SECONDS = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds in a duration such as '900', '90s', '15m' or '1.5h'."""
+    match = _DURATION_RE.match(str(text).lower())
+    if not match:
+        raise ValueError(f"invalid duration '{text}' (use seconds, or a number with s, m or h)")
+    return float(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+class TimeBudget:
+    """Wall-clock deadline with a running estimate of how long a request takes."""
+
+    def __init__(self, seconds: float, reserve: Optional[float] = None,
+                 initial_estimate: float = DEFAULT_INITIAL_ESTIMATE):
+        self.seconds = seconds
+        self.reserve = seconds * DEFAULT_RESERVE_FRACTION if reserve is None else min(reserve, seconds)
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds
+        self.fetch_deadline = self.deadline - self.reserve
+        self.requests = 0
+        self.request_time = 0.0
+        self._smoothed: Optional[float] = None
+        self._variation = 0.0
+        self._initial_estimate = initial_estimate
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        """Seconds left before requests must have finished."""
+        return self.fetch_deadline - time.monotonic()
+
+    def record(self, duration: float) -> None:
+        """Fold one request's duration into the estimate."""
+        self.requests += 1
+        self.request_time += duration
+        if self._smoothed is None:
+            self._smoothed = duration
+            self._variation = duration / 2
+        else:
+            self._variation += _BETA * (abs(duration - self._smoothed) - self._variation)
+            self._smoothed += _ALPHA * (duration - self._smoothed)
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """Time the enclosed request and record it."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(time.monotonic() - start)
+
+    def estimate(self) -> float:
+        """Conservative duration of the next request: smoothed mean plus four times its variation."""
+        if self._smoothed is None:
+            return self._initial_estimate
+        return self._smoothed + _VARIATION_WEIGHT * self._variation
+
+    def throughput(self) -> Optional[float]:
+        """Requests per second of request time so far."""
+        return self.requests / self.request_time if self.request_time > 0 else None
+
+    def can_dispatch(self) -> bool:
+        """Whether a new request is expected to finish before the fetch deadline."""
+        return self.remaining() >= self.estimate()
+
+    def expected_requests(self) -> int:
+        """How many more requests fit in the remaining time at the current estimate."""
+        return max(int(self.remaining() / self.estimate()), 0)
+
+
+def match_priority(match: Dict, missing_ids: Set[str], refresh_ids: Set[str]) -> int:
+    match_id = str(match.get('matchId'))
+    if match_id in missing_ids:
+        return PRIORITY_MISSING
+    if match_id in refresh_ids:
+        return PRIORITY_REFRESH
+    return PRIORITY_NEW
+
+
+def prioritize(matches: Iterable[Dict], missing_ids: Set[str] = frozenset(),
+               refresh_ids: Set[str] = frozenset()) -> List[Dict]:
+    """Order schedule rows new first, then queued for refetch, then refreshes; newest first within each."""
+    # Two stable sorts: by startDate descending, then by priority class
+    ordered = sorted(matches, key=lambda match: match.get('startDate') or '', reverse=True)
+    ordered.sort(key=lambda match: match_priority(match, missing_ids, refresh_ids))
+    return ordered
+
+
+def merge_matches(matches: List[Dict], carried_over: Iterable[Dict]) -> List[Dict]:
+    """Matches followed by carried-over rows not already among them."""
+    seen = {str(match.get('matchId')) for match in matches}
+    merged = list(matches)
+    for match in carried_over:
+        match_id = str(match.get('matchId'))
+        if match_id not in seen:
+            seen.add(match_id)
+            merged.append(match)
+    return merged
+
+
+def default_remainder_file(output_file: str) -> str:
+    return f"{os.path.splitext(output_file)[0]}_remaining.json"
+
+
+def load_remainder(path: str) -> List[Dict]:
+    """Schedule rows left over by an earlier run, or an empty list."""
+    if not os.path.exists(path):
+        return []
+    try:
+        return list(iter_matches(path))
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable remainder file '%s': %s", path, e)
+        return []
+
+
+def save_remainder(path: str, matches: List[Dict], budget: Optional[TimeBudget] = None) -> None:
+    """Write the rows a run had no time for, or remove the file if there are none."""
+    if not matches:
+        if os.path.exists(path):
+            os.remove(path)
+            logger.debug("All carried-over matches fetched; removed %s", path)
+        return
+
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    metadata = {
+        'saved_at': datetime.now().isoformat(),
+        'total_matches': len(matches),
+    }
+    if budget is not None:
+        metadata['time_budget_seconds'] = budget.seconds
+        metadata['estimated_request_seconds'] = round(budget.estimate(), 3)
+
+    try:
+        write_json({'metadata': metadata, 'matches': matches}, path)
+        logger.info("%d matches left for the next run saved to %s", len(matches), path,
+                    extra={'fields': {'event': 'time_budget_remainder', 'count': len(matches), 'path': path}})
+    except IOError as e:
+        logger.error("Error saving remainder file: %s", e)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+H2H GG League - Cached Authentication Token
+
+This module reads the token saved by fetch_auth_token.py and checks its
+expiry locally, so a run with a valid cached token goes straight to its
+first API call instead of starting from a placeholder token that is
+rejected and refreshed.
+
+The site token is a JWT; its 'exp' claim is read without verifying the
+signature (the API does that). Tokens without a readable expiry are
+treated as valid until the API rejects them.
+
+TokenManager holds the current token of a run for every client that
+uses it. The token is resolved on the first API request, so a run that
+is served entirely from disk never starts the browser, and refreshes
+after a 401 happen one at a time: a client whose rejected token has
+already been replaced retries with the new one, and a token whose
+refresh failed is not refreshed again.
+
+Usage:
+    tokens = TokenManager(fetcher.refresh_auth_token, explicit=args.auth_token)
+    token = tokens.get()
+    response = session.get(url, headers={'Authorization': f'Bearer {token}'})
+    if response.status_code == 401 and tokens.refresh_after_rejection(token, response.text):
+        ...  # retry once
+"""
+
+import base64
+import binascii
+import json
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_FILE = 'auth_token.json'
+
+# Tokens expiring within this many seconds are refreshed before they are used
+EXPIRY_MARGIN = 60
+
+# Placeholder sent when no token can be obtained; the API rejects it
+PLACEHOLDER_TOKEN = 'test'
+
+# Phrases in a 401 body that mean the token was rejected
+_AUTH_ERROR_PHRASES = ('unauthenticated', 'authentication', 'api key')
+
+
+def read_token_file(token_file: str = TOKEN_FILE) -> Optional[str]:
+    """Return the token stored by fetch_auth_token.py, if any."""
+    try:
+        with open(token_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('token') or None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """Return a JWT's 'exp' claim as a Unix timestamp, or None if it has none."""
+    parts = token.split('.')
+    if len(parts) != 3:
+        return None
+    payload = parts[1]
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp'])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+
+def load_cached_token(token_file: str = TOKEN_FILE, margin: float = EXPIRY_MARGIN) -> Optional[str]:
+    """Return the cached token unless it is missing or about to expire."""
+    token = read_token_file(token_file)
+    if not token:
+        return None
+
+    expires_at = token_expiry(token)
+    if expires_at is not None and expires_at - margin <= time.time():
+        logger.debug("Cached token in %s has expired", token_file)
+        return None
+    return token
+
+
+def is_auth_error(text: str) -> bool:
+    """Whether a 401 response body says the token was rejected (an empty body counts)."""
+    text = (text or '').lower()
+    return not text.strip() or any(phrase in text for phrase in _AUTH_ERROR_PHRASES)
+
+
+class TokenManager:
+    """The current API token of a run, shared by every client and thread that uses it."""
+
+    def __init__(self, refresh: Callable[[], Optional[str]], explicit: Optional[str] = None,
+                 token_file: str = TOKEN_FILE):
+        self._refresh = refresh
+        self.token_file = token_file
+        self._token: Optional[str] = explicit or None
+        self._lock = threading.Lock()
+        # The token a refresh already failed for; it is not refreshed again
+        self._failed_refresh_for: Optional[str] = None
+
+    def set(self, token: str) -> None:
+        """Use this token from now on."""
+        with self._lock:
+            self._token = token
+            self._failed_refresh_for = None
+
+    def get(self) -> str:
+        """The current token: the explicit one, else a valid cached one, else a fresh one."""
+        with self._lock:
+            if self._token is None:
+                token = load_cached_token(self.token_file)
+                if token:
+                    logger.debug("Using cached token from %s", self.token_file)
+                else:
+                    logger.debug("No valid cached token; fetching a new one")
+                    token = self._refresh()
+                    if not token:
+                        token = self._failed_refresh_for = PLACEHOLDER_TOKEN
+                self._token = token
+            return self._token
+
+    def refresh_after_rejection(self, rejected: str, response_text: str = '') -> Optional[str]:
+        """Token to retry a request with after the API rejected `rejected` with a 401, or None.
+
+        Only one client refreshes at a time; the others pick up its result.
+        """
+        if not is_auth_error(response_text):
+            return None
+        with self._lock:
+            if self._token is not None and self._token != rejected:
+                # Another client already refreshed the token while this request was in flight
+                return self._token
+            if self._failed_refresh_for == rejected:
+                # Refreshing already failed for this token; don't launch the browser again
+                return None
+
+            logger.warning("Authentication failed. Attempting to fetch new token...")
+            token = self._refresh()
+            if token:
+                self._token = token
+                return token
+            self._failed_refresh_for = rejected
+            logger.error("Failed to obtain new authentication token.")
+            return None